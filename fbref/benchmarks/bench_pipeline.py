@@ -0,0 +1,295 @@
+"""Script used to benchmark each stage of the fbref cleaning pipeline on
+synthetic data, store the timings as JSON and compare them with a baseline.
+
+Run from the fbref folder e.g
+    python -m benchmarks.bench_pipeline --leagues 2 --seasons 10 \
+        --output results.json --baseline benchmarks/baseline.json
+
+Stages slower than the baseline by more than their threshold are reported
+and the script exits with status 1.
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import get_synthetic_leagues_dict
+from src.etl.clean import (
+    clean_fixtures_df,
+    clean_league_table_df,
+)
+from src.etl.fetch import (
+    get_category_data_across_seasons,
+    get_seasons_comparison_dict,
+    get_data_category_season_comparison_df,
+    get_ranking_df,
+    get_grouped_ranking_df,
+)
+from src.etl.warehouse import (
+    CLEANING_FUNCTION_DICT,
+    DATA_CATEGORY_LIST,
+    SIDE_DICT,
+)
+
+# allowed slow down compared with the baseline before a stage fails
+DEFAULT_THRESHOLD = 0.25
+STAGE_THRESHOLDS = {
+    "get_ranking_df": 0.5,
+    "get_grouped_ranking_df": 0.5,
+}
+
+
+def run_clean_tables(leagues_dict, _):
+    """Stage cleaning every category table, league table and fixtures"""
+    for seasons_dict in leagues_dict.values():
+        for season_dict in seasons_dict.values():
+            data_dict = season_dict["data"]
+            clean_league_table_df(data_dict["league_table"])
+            clean_fixtures_df(season_dict["fixtures"])
+            for data_type in SIDE_DICT:
+                for data_category, category_df in data_dict[data_type].items():
+                    CLEANING_FUNCTION_DICT[data_category](category_df)
+
+
+def run_category_data_across_seasons(leagues_dict, _):
+    """Stage building the across seasons df of every category and side"""
+    for seasons_dict in leagues_dict.values():
+        for data_category in DATA_CATEGORY_LIST:
+            for opponent_data in (False, True):
+                get_category_data_across_seasons(
+                    seasons_dict, data_category, opponent_data=opponent_data
+                )
+
+
+def run_seasons_comparison_dict(leagues_dict, _):
+    """Stage building the season comparison dictionary of every league"""
+    for seasons_dict in leagues_dict.values():
+        get_seasons_comparison_dict(seasons_dict)
+
+
+def run_ranking_df(_, comparison_df_list):
+    """Stage ranking every comparison df"""
+    for comparison_df in comparison_df_list:
+        get_ranking_df(comparison_df)
+
+
+def run_grouped_ranking_df(_, comparison_df_list):
+    """Stage ranking every comparison df within each season"""
+    for comparison_df in comparison_df_list:
+        get_grouped_ranking_df(comparison_df)
+
+
+STAGE_FUNCTION_DICT = {
+    "clean_tables": run_clean_tables,
+    "get_category_data_across_seasons": run_category_data_across_seasons,
+    "get_seasons_comparison_dict": run_seasons_comparison_dict,
+    "get_ranking_df": run_ranking_df,
+    "get_grouped_ranking_df": run_grouped_ranking_df,
+}
+
+
+def get_comparison_df_list(leagues_dict):
+    """Function used to build the comparison dfs the ranking stages use"""
+    comparison_df_list = []
+    for seasons_dict in copy.deepcopy(leagues_dict).values():
+        season_comparison_dict = get_seasons_comparison_dict(seasons_dict)
+        for data_category in DATA_CATEGORY_LIST:
+            for opponent_data in (False, True):
+                comparison_df_list.append(
+                    get_data_category_season_comparison_df(
+                        season_comparison_dict, data_category, opponent_data
+                    )
+                )
+    return comparison_df_list
+
+
+def time_stage(stage_function, leagues_dict, comparison_df_list, repeat):
+    """Function used to time a stage, on a fresh copy of the data each run
+    as cleaning renames columns in place.
+
+    Returns:
+        timings (list): seconds taken by each run
+    """
+    timings = []
+    for _ in range(repeat):
+        leagues_dict_copy = copy.deepcopy(leagues_dict)
+        start_time = time.perf_counter()
+        stage_function(leagues_dict_copy, comparison_df_list)
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def run_benchmarks(n_leagues, n_seasons, n_squads, repeat, stage_list=None):
+    """Function used to time every stage of the pipeline.
+
+    Args:
+        n_leagues (int): leagues of synthetic data
+        n_seasons (int): seasons in each league
+        n_squads (int): squads in each season
+        repeat (int): runs of each stage
+        stage_list (list, optional): stages to run. Defaults to None which runs
+                                     every stage.
+
+    Returns:
+        results (dict): environment, data size and timings of each stage
+    """
+    if stage_list is None:
+        stage_list = list(STAGE_FUNCTION_DICT)
+
+    leagues_dict = get_synthetic_leagues_dict(
+        n_leagues=n_leagues, n_seasons=n_seasons, n_squads=n_squads
+    )
+    comparison_df_list = get_comparison_df_list(leagues_dict)
+
+    stages_dict = {}
+    for stage_name in stage_list:
+        timings = time_stage(
+            STAGE_FUNCTION_DICT[stage_name],
+            leagues_dict,
+            comparison_df_list,
+            repeat,
+        )
+        stages_dict[stage_name] = {
+            "min_seconds": min(timings),
+            "median_seconds": statistics.median(timings),
+            "timings": timings,
+        }
+
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "data": {
+            "leagues": n_leagues,
+            "seasons": n_seasons,
+            "squads": n_squads,
+            "repeat": repeat,
+        },
+        "stages": stages_dict,
+    }
+
+
+def compare_with_baseline(results, baseline, stage_thresholds=None):
+    """Function used to compare the best time of each stage with a baseline.
+
+    Args:
+        results (dict): output of run_benchmarks
+        baseline (dict): stored output of run_benchmarks
+        stage_thresholds (dict, optional): allowed slow down of each stage e.g
+                                           0.25 for 25%. Stages not given use
+                                           DEFAULT_THRESHOLD.
+
+    Returns:
+        comparison_list (list): stage, baseline and current seconds, ratio,
+                                threshold and whether the stage regressed
+    """
+    if stage_thresholds is None:
+        stage_thresholds = STAGE_THRESHOLDS
+
+    comparison_list = []
+    for stage_name, stage_results in results["stages"].items():
+        baseline_stage = baseline["stages"].get(stage_name)
+        if baseline_stage is None:
+            continue
+        threshold = stage_thresholds.get(stage_name, DEFAULT_THRESHOLD)
+        ratio = stage_results["min_seconds"] / baseline_stage["min_seconds"]
+        comparison_list.append(
+            {
+                "stage": stage_name,
+                "baseline_seconds": baseline_stage["min_seconds"],
+                "current_seconds": stage_results["min_seconds"],
+                "ratio": ratio,
+                "threshold": threshold,
+                "regressed": ratio > 1 + threshold,
+            }
+        )
+    return comparison_list
+
+
+def parse_stage_thresholds(threshold_list):
+    """Function used to parse stage=threshold command line arguments"""
+    stage_thresholds = dict(STAGE_THRESHOLDS)
+    for threshold_arg in threshold_list:
+        stage_name, threshold = threshold_arg.split("=")
+        if stage_name not in STAGE_FUNCTION_DICT:
+            raise SystemExit(f"Unknown stage {stage_name}")
+        stage_thresholds[stage_name] = float(threshold)
+    return stage_thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fbref cleaning pipeline on synthetic data"
+    )
+    parser.add_argument("--leagues", type=int, default=1)
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--squads", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--stage",
+        action="append",
+        choices=list(STAGE_FUNCTION_DICT),
+        help="stage to run, every stage by default",
+    )
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", help="results file to compare with")
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        help="allowed slow down of a stage e.g get_ranking_df=0.5",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.leagues, args.seasons, args.squads, args.repeat, args.stage
+    )
+    for stage_name, stage_results in results["stages"].items():
+        print(
+            f"{stage_name:<36} min {stage_results['min_seconds'] * 1000:9.1f} ms"
+            f"  median {stage_results['median_seconds'] * 1000:9.1f} ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if not args.baseline:
+        return
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    data_keys = ["leagues", "seasons", "squads"]
+    if any(
+        baseline["data"].get(key) != results["data"][key] for key in data_keys
+    ):
+        print("Warning: baseline was run on a different data size")
+
+    comparison_list = compare_with_baseline(
+        results, baseline, parse_stage_thresholds(args.threshold)
+    )
+    print()
+    for comparison in comparison_list:
+        status = "REGRESSED" if comparison["regressed"] else "ok"
+        print(
+            f"{comparison['stage']:<36} {comparison['ratio']:6.2f}x "
+            f"baseline (limit {1 + comparison['threshold']:.2f}x) {status}"
+        )
+    if any(comparison["regressed"] for comparison in comparison_list):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Script used to benchmark the FBref table extractor against pd.read_html.
+
+Run from the fbref folder on a folder of saved FBref pages e.g
+    python -m benchmarks.bench_table_parser saved_pages/ --repeat 5
+or on generated league stats pages, with over_header rows, commented _opp
+tables and thousands separators like the real ones e.g
+    python -m benchmarks.bench_table_parser --synthetic 10 --repeat 5
+
+The extractor was meant to be several times faster than pd.read_html. That
+holds on saved FBref pages (about 4-5x on the 2016/17 and 2017/18 Premier
+League stats and fixtures pages) but NOT on the synthetic pages, where it is
+only about 2x: they are almost all table, so lxml parsing the html (about a
+third of the time) and building the dataframes dominate, and pd.read_html
+skips the 11 _opp tables hidden in comments that the extractor also parses.
+"""
+
+import argparse
+import time
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic_data import get_synthetic_league_page_html
+from src.fbref.table_parser import (
+    find_tables,
+    parse_fbref_table,
+)
+from src.utility.functions import (
+    flatten_cols,
+    rename_unnamed_columns,
+)
+
+
+def parse_with_read_html(html):
+    """Function used to parse every table on a page the way FBref did before
+    the table extractor"""
+    tables = pd.read_html(StringIO(html))
+    for table in tables:
+        if isinstance(table.columns, pd.MultiIndex):
+            table = flatten_cols(table)
+            table = rename_unnamed_columns(table)
+    return tables
+
+
+def parse_with_table_parser(html):
+    """Function used to parse every table on a page with the table extractor"""
+    return [
+        parse_fbref_table(table_element)
+        for table_element in find_tables(html).values()
+    ]
+
+
+def time_parser(parser, html_list, repeat):
+    """Function used to get the best total time of a parser over the pages"""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for html in html_list:
+            parser(html)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "pages_dir", nargs="?", help="folder of saved FBref html pages"
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="number of generated league stats pages to add",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    html_list = []
+    if args.pages_dir:
+        html_list = [
+            page_path.read_text(encoding="utf-8")
+            for page_path in sorted(Path(args.pages_dir).glob("**/*.html"))
+        ]
+    html_list.extend(
+        get_synthetic_league_page_html(seed=seed)
+        for seed in range(args.synthetic)
+    )
+    if not html_list:
+        raise SystemExit("No pages, give a pages_dir or --synthetic N")
+
+    read_html_time = time_parser(parse_with_read_html, html_list, args.repeat)
+    table_parser_time = time_parser(
+        parse_with_table_parser, html_list, args.repeat
+    )
+
+    print(f"pages: {len(html_list)}")
+    print(
+        f"pd.read_html:  {read_html_time / len(html_list) * 1000:.1f} ms/page"
+    )
+    print(
+        f"table_parser:  {table_parser_time / len(html_list) * 1000:.1f} ms/page"
+    )
+    print(f"speed up:      {read_html_time / table_parser_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
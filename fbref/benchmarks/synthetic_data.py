@@ -0,0 +1,658 @@
+"""Script used to generate synthetic FBref shaped data for benchmarks.
+
+Raw tables are built the way pd.read_html returns FBref tables, with two level
+column headers and "vs " squads for the _opp tables, then flattened and merged
+by the FBref class so the seasons dictionaries have exactly the columns the
+cleaning specs in fbref_config expect. Any number of leagues, seasons and
+squads can be generated without touching the FBref site.
+"""
+
+import html
+
+import numpy as np
+import pandas as pd
+
+from src.fbref.fbref_class import FBref
+from src.utility.functions import (
+    flatten_cols,
+    rename_unnamed_columns,
+)
+
+# columns of each FBref table, (over header, columns) for grouped columns
+RAW_TABLE_SCHEMAS = {
+    "league_table": [
+        "Rk",
+        "Squad",
+        "MP",
+        "W",
+        "D",
+        "L",
+        "GF",
+        "GA",
+        "GD",
+        "Pts",
+        "Pts/MP",
+        "xG",
+        "xGA",
+        "xGD",
+        "xGD/90",
+        "Last 5",
+        "Attendance",
+        "Top Team Scorer",
+        "Goalkeeper",
+        "Notes",
+    ],
+    "league_table_home_away": [
+        "Rk",
+        "Squad",
+        (
+            "Home",
+            [
+                "MP",
+                "W",
+                "D",
+                "L",
+                "GF",
+                "GA",
+                "GD",
+                "Pts",
+                "Pts/MP",
+                "xG",
+                "xGA",
+                "xGD",
+                "xGD/90",
+            ],
+        ),
+        (
+            "Away",
+            [
+                "MP",
+                "W",
+                "D",
+                "L",
+                "GF",
+                "GA",
+                "GD",
+                "Pts",
+                "Pts/MP",
+                "xG",
+                "xGA",
+                "xGD",
+                "xGD/90",
+            ],
+        ),
+    ],
+    "standard_stats": [
+        "Squad",
+        "# Pl",
+        "Age",
+        "Poss",
+        ("Playing Time", ["MP", "Starts", "Min", "90s"]),
+        (
+            "Performance",
+            ["Gls", "Ast", "G+A", "G-PK", "PK", "PKatt", "CrdY", "CrdR"],
+        ),
+        ("Expected", ["xG", "npxG", "xAG", "npxG+xAG"]),
+        (
+            "Per 90 Minutes",
+            [
+                "Gls",
+                "Ast",
+                "G+A",
+                "G-PK",
+                "G+A-PK",
+                "xG",
+                "xAG",
+                "xG+xAG",
+                "npxG",
+                "npxG+xAG",
+            ],
+        ),
+    ],
+    "goalkeeping": [
+        "Squad",
+        "# Pl",
+        ("Playing Time", ["MP", "Starts", "Min", "90s"]),
+        (
+            "Performance",
+            [
+                "GA",
+                "GA90",
+                "SoTA",
+                "Saves",
+                "Save%",
+                "W",
+                "D",
+                "L",
+                "CS",
+                "CS%",
+            ],
+        ),
+        ("Penalty Kicks", ["PKatt", "PKA", "PKsv", "PKm", "Save%"]),
+    ],
+    "ad_goalkeeping": [
+        "Squad",
+        "# Pl",
+        "90s",
+        ("Goals", ["GA", "PKA", "FK", "CK", "OG"]),
+        ("Expected", ["PSxG", "PSxG/SoT", "PSxG+/-", "/90"]),
+        ("Launched", ["Cmp", "Att", "Cmp%"]),
+        ("Passes", ["Att", "Thr", "Launch%", "AvgLen"]),
+        ("Goal Kicks", ["Att", "Launch%", "AvgLen"]),
+        ("Crosses", ["Opp", "Stp", "Stp%"]),
+        ("Sweeper", ["#OPA", "#OPA/90", "AvgDist"]),
+    ],
+    "shooting": [
+        "Squad",
+        "# Pl",
+        "90s",
+        (
+            "Standard",
+            [
+                "Gls",
+                "Sh",
+                "SoT",
+                "SoT%",
+                "Sh/90",
+                "SoT/90",
+                "G/Sh",
+                "G/SoT",
+                "Dist",
+                "FK",
+                "PK",
+                "PKatt",
+            ],
+        ),
+        ("Expected", ["xG", "npxG", "npxG/Sh", "G-xG", "np:G-xG"]),
+    ],
+    "passing": [
+        "Squad",
+        "# Pl",
+        "90s",
+        ("Total", ["Cmp", "Att", "Cmp%", "TotDist", "PrgDist"]),
+        ("Short", ["Cmp", "Att", "Cmp%"]),
+        ("Medium", ["Cmp", "Att", "Cmp%"]),
+        ("Long", ["Cmp", "Att", "Cmp%"]),
+        "Ast",
+        "xAG",
+        "xA",
+        "A-xAG",
+        "KP",
+        "1/3",
+        "PPA",
+        "CrsPA",
+        "Prog",
+    ],
+    "pass_types": [
+        "Squad",
+        "# Pl",
+        "90s",
+        "Att",
+        ("Pass Types", ["Live", "Dead", "FK", "TB", "Sw", "Crs", "TI", "CK"]),
+        ("Corner Kicks", ["In", "Out", "Str"]),
+        ("Outcomes", ["Cmp", "Off", "Blocks"]),
+    ],
+    "goal_shot_creation": [
+        "Squad",
+        "# Pl",
+        "90s",
+        ("SCA", ["SCA", "SCA90"]),
+        ("SCA Types", ["PassLive", "PassDead", "Drib", "Sh", "Fld", "Def"]),
+        ("GCA", ["GCA", "GCA90"]),
+        ("GCA Types", ["PassLive", "PassDead", "Drib", "Sh", "Fld", "Def"]),
+    ],
+    "defensive_action": [
+        "Squad",
+        "# Pl",
+        "90s",
+        ("Tackles", ["Tkl", "TklW", "Def 3rd", "Mid 3rd", "Att 3rd"]),
+        ("Vs Dribbles", ["Tkl", "Att", "Tkl%", "Past"]),
+        ("Blocks", ["Blocks", "Sh", "Pass"]),
+        "Int",
+        "Tkl+Int",
+        "Clr",
+        "Err",
+    ],
+    "possession": [
+        "Squad",
+        "# Pl",
+        "Poss",
+        "90s",
+        (
+            "Touches",
+            [
+                "Touches",
+                "Def Pen",
+                "Def 3rd",
+                "Mid 3rd",
+                "Att 3rd",
+                "Att Pen",
+                "Live",
+            ],
+        ),
+        ("Dribbles", ["Succ", "Att", "Succ%", "Mis", "Dis"]),
+        ("Receiving", ["Rec", "Prog"]),
+    ],
+    "playing_time": [
+        "Squad",
+        "# Pl",
+        "Age",
+        ("Playing Time", ["MP", "Min", "Mn/MP", "Min%", "90s"]),
+        ("Starts", ["Starts", "Mn/Start", "Compl"]),
+        ("Subs", ["Subs", "Mn/Sub", "unSub"]),
+        ("Team Success", ["PPM", "onG", "onGA", "+/-", "+/-90"]),
+        ("Team Success (xG)", ["onxG", "onxGA", "xG+/-", "xG+/-90"]),
+    ],
+    "miscellaneous": [
+        "Squad",
+        "# Pl",
+        "90s",
+        (
+            "Performance",
+            [
+                "CrdY",
+                "CrdR",
+                "2CrdY",
+                "Fls",
+                "Fld",
+                "Off",
+                "Crs",
+                "Int",
+                "TklW",
+                "PKwon",
+                "PKcon",
+                "OG",
+                "Recov",
+            ],
+        ),
+        ("Aerial Duels", ["Won", "Lost", "Won%"]),
+    ],
+}
+
+# tables that only have a team version
+TEAM_ONLY_TABLES = ["league_table", "league_table_home_away"]
+
+# columns holding text or decimals rather than counts
+TEXT_COLUMNS = ["Last 5", "Top Team Scorer", "Goalkeeper", "Notes"]
+FLOAT_COLUMNS = [
+    "Age",
+    "Poss",
+    "90s",
+    "xG",
+    "npxG",
+    "xAG",
+    "xA",
+    "Dist",
+    "AvgLen",
+    "AvgDist",
+    "PSxG",
+]
+
+# html id of each table of a league stats page, {season_id} filled in for the
+# league tables
+TABLE_HTML_IDS = {
+    "league_table": "results{season_id}_overall",
+    "league_table_home_away": "results{season_id}_home_away",
+    "standard_stats": "stats_squads_standard",
+    "goalkeeping": "stats_squads_keeper",
+    "ad_goalkeeping": "stats_squads_keeper_adv",
+    "shooting": "stats_squads_shooting",
+    "passing": "stats_squads_passing",
+    "pass_types": "stats_squads_passing_types",
+    "goal_shot_creation": "stats_squads_gca",
+    "defensive_action": "stats_squads_defense",
+    "possession": "stats_squads_possession",
+    "playing_time": "stats_squads_playing_time",
+    "miscellaneous": "stats_squads_misc",
+}
+
+FIXTURE_COLUMNS = [
+    "Wk",
+    "Day",
+    "Date",
+    "Time",
+    "Home",
+    "xG",
+    "Score",
+    "xG.1",
+    "Away",
+    "Attendance",
+    "Venue",
+    "Referee",
+    "Match Report",
+    "Notes",
+]
+
+
+def get_squad_names(league_name, n_squads, season_index, n_promoted=3):
+    """Function used to name the squads of a league season. Each season the
+    bottom n_promoted squads are swapped for new ones, like relegation, so
+    squads overlap across seasons."""
+    first_squad = season_index * n_promoted
+    return [
+        f"{league_name} FC {squad_index}"
+        for squad_index in range(first_squad, first_squad + n_squads)
+    ]
+
+
+def get_raw_table_df(schema, squad_names, squad_columns_dict, rng):
+    """Function used to generate a table with the two level column headers
+    pd.read_html gives FBref tables.
+
+    Args:
+        schema (list): columns of the table from RAW_TABLE_SCHEMAS
+        squad_names (list): squads, one row each
+        squad_columns_dict (dict): values of the columns shared by every table
+                                   of a squad e.g MP, # Pl and 90s which the
+                                   tables are merged on
+        rng (numpy.random.Generator): random generator
+
+    Returns:
+        raw_df (pandas.DataFrame): table with MultiIndex columns
+    """
+    column_tuples = []
+    for column_index, column in enumerate(schema):
+        if isinstance(column, tuple):
+            over_header, column_names = column
+            column_tuples.extend(
+                (over_header, column_name) for column_name in column_names
+            )
+        else:
+            column_tuples.append((f"Unnamed: {column_index}_level_0", column))
+
+    n_squads = len(squad_names)
+    columns_list = []
+    for _, column_name in column_tuples:
+        if column_name == "Squad":
+            values = np.array(squad_names, dtype=object)
+        elif column_name == "Rk":
+            values = np.arange(1, n_squads + 1)
+        elif column_name in squad_columns_dict:
+            values = squad_columns_dict[column_name]
+        elif column_name in TEXT_COLUMNS:
+            values = np.full(n_squads, "W D L W W", dtype=object)
+        elif (
+            column_name in FLOAT_COLUMNS
+            or "%" in column_name
+            or "/" in column_name
+        ):
+            values = np.round(rng.uniform(0, 100, n_squads), 1)
+        else:
+            values = rng.integers(1, 3000, n_squads)
+        columns_list.append(values)
+
+    return pd.DataFrame(
+        dict(enumerate(columns_list)), columns=range(len(columns_list))
+    ).set_axis(pd.MultiIndex.from_tuples(column_tuples), axis=1)
+
+
+def get_league_team_dict(squad_names, rng):
+    """Function used to generate every table of a league stats page, keyed
+    the way FBref.get_fbref_league_team_data keys them, with flat column
+    names"""
+    n_squads = len(squad_names)
+    n_matches = 2 * (n_squads - 1)
+    squad_columns_dict = {
+        "MP": np.full(n_squads, n_matches),
+        "# Pl": rng.integers(18, 35, n_squads),
+        "90s": np.full(n_squads, float(n_matches)),
+    }
+    opponent_names = [f"vs {squad_name}" for squad_name in squad_names]
+
+    league_team_dict = {}
+    for table_name, schema in RAW_TABLE_SCHEMAS.items():
+        league_team_dict[table_name] = rename_unnamed_columns(
+            flatten_cols(
+                get_raw_table_df(schema, squad_names, squad_columns_dict, rng)
+            )
+        )
+        if table_name not in TEAM_ONLY_TABLES:
+            league_team_dict[f"{table_name}_opp"] = rename_unnamed_columns(
+                flatten_cols(
+                    get_raw_table_df(
+                        schema, opponent_names, squad_columns_dict, rng
+                    )
+                )
+            )
+    return league_team_dict
+
+
+def get_cell_text(value):
+    """Function used to write a value the way FBref shows it, with thousands
+    separators in counts"""
+    if isinstance(value, (int, np.integer)):
+        return f"{value:,}"
+    if isinstance(value, (float, np.floating)):
+        return f"{value:,.1f}"
+    return html.escape(str(value))
+
+
+def get_table_html(raw_df, table_id):
+    """Function used to write a table from get_raw_table_df as FBref html: an
+    over_header row above the column headers when columns are grouped, the
+    squad in a th cell linking to its page and numbers with thousands
+    separators"""
+    over_headers = [
+        "" if over_header.startswith("Unnamed:") else over_header
+        for over_header, _ in raw_df.columns
+    ]
+    html_list = [
+        f'<table class="stats_table sortable min_width" id="{table_id}">',
+        "<thead>",
+    ]
+    if any(over_headers):
+        html_list.append('<tr class="over_header">')
+        column_index = 0
+        while column_index < len(over_headers):
+            over_header = over_headers[column_index]
+            colspan = 1
+            while (
+                over_header
+                and column_index + colspan < len(over_headers)
+                and over_headers[column_index + colspan] == over_header
+            ):
+                colspan += 1
+            html_list.append(
+                f'<th colspan="{colspan}" class="over_header center">'
+                f"{html.escape(over_header)}</th>"
+            )
+            column_index += colspan
+        html_list.append("</tr>")
+    html_list.append("<tr>")
+    html_list.extend(
+        f'<th class="poptip center" scope="col">{html.escape(column_name)}'
+        "</th>"
+        for _, column_name in raw_df.columns
+    )
+    html_list.append("</tr>\n</thead>\n<tbody>")
+
+    squad_position = list(raw_df.columns.get_level_values(1)).index("Squad")
+    for row_index, row in enumerate(raw_df.itertuples(index=False)):
+        html_list.append("<tr>")
+        for column_index, value in enumerate(row):
+            if column_index == squad_position:
+                html_list.append(
+                    '<th scope="row" class="left">'
+                    f'<a href="/en/squads/{row_index:08x}/">'
+                    f"{html.escape(value)}</a></th>"
+                )
+            else:
+                html_list.append(
+                    f'<td class="right">{get_cell_text(value)}</td>'
+                )
+        html_list.append("</tr>\n")
+    html_list.append("</tbody>\n</table>")
+    return "".join(html_list)
+
+
+def get_synthetic_league_page_html(
+    league_name="League-0", season_name="2017_2018", n_squads=20, seed=0
+):
+    """Function used to generate the html of a league season stats page with
+    every table FBref.get_fbref_league_team_data reads. As on FBref, the
+    _opp tables are hidden inside html comments, grouped columns have an
+    over_header row and counts have thousands separators.
+
+    Args:
+        league_name (str, optional): name used for the squads.
+        season_name (str, optional): season the page is for.
+        n_squads (int, optional): squads in the season. Defaults to 20.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        html (str): html of the page
+    """
+    rng = np.random.default_rng(seed)
+    squad_names = get_squad_names(league_name, n_squads, 0)
+    opponent_names = [f"vs {squad_name}" for squad_name in squad_names]
+    n_matches = 2 * (n_squads - 1)
+    squad_columns_dict = {
+        "MP": np.full(n_squads, n_matches),
+        "# Pl": rng.integers(18, 35, n_squads),
+        "90s": np.full(n_squads, float(n_matches)),
+    }
+    season_id = season_name.replace("_", "-") + "91"
+
+    html_list = [
+        "<!DOCTYPE html>\n<html><head><title>"
+        f"{season_name} {league_name} Stats</title></head>\n<body>"
+    ]
+    for table_name, schema in RAW_TABLE_SCHEMAS.items():
+        table_id = TABLE_HTML_IDS[table_name].format(season_id=season_id)
+        if table_name in TEAM_ONLY_TABLES:
+            html_list.append(
+                f'<div class="table_wrapper" id="all_{table_id}">'
+                + get_table_html(
+                    get_raw_table_df(
+                        schema, squad_names, squad_columns_dict, rng
+                    ),
+                    table_id,
+                )
+                + "</div>"
+            )
+            continue
+        for side, side_names in (
+            ("for", squad_names),
+            ("against", opponent_names),
+        ):
+            table_html = get_table_html(
+                get_raw_table_df(schema, side_names, squad_columns_dict, rng),
+                f"{table_id}_{side}",
+            )
+            if side == "against":
+                # FBref only renders the opponent tables with javascript
+                table_html = (
+                    '<div class="placeholder"></div>\n<!--\n'
+                    + table_html
+                    + "\n-->"
+                )
+            html_list.append(
+                f'<div class="table_wrapper" id="all_{table_id}_{side}">'
+                + table_html
+                + "</div>"
+            )
+    html_list.append("</body></html>")
+    return "\n".join(html_list)
+
+
+def get_fixtures_df(squad_names, season_name, rng):
+    """Function used to generate a double round robin of played fixtures in
+    the format of FBref.get_fixtures_season_data"""
+    home_index, away_index = np.nonzero(~np.eye(len(squad_names), dtype=bool))
+    n_fixtures = len(home_index)
+    squad_array = np.array(squad_names, dtype=object)
+
+    start_year = int(season_name.split("_")[0])
+    dates = pd.Timestamp(f"{start_year}-08-01") + pd.to_timedelta(
+        np.arange(n_fixtures) // max(len(squad_names) // 2, 1) * 7, unit="D"
+    )
+    home_goals = rng.integers(0, 5, n_fixtures)
+    away_goals = rng.integers(0, 5, n_fixtures)
+
+    fixtures_df = pd.DataFrame(
+        {
+            "Wk": np.arange(n_fixtures) // max(len(squad_names) // 2, 1) + 1,
+            "Day": dates.strftime("%a"),
+            "Date": dates.strftime("%Y-%m-%d"),
+            "Time": "15:00",
+            "Home": squad_array[home_index],
+            "xG": np.round(rng.uniform(0, 3, n_fixtures), 1),
+            "Score": [
+                f"{home}–{away}" for home, away in zip(home_goals, away_goals)
+            ],
+            "xG.1": np.round(rng.uniform(0, 3, n_fixtures), 1),
+            "Away": squad_array[away_index],
+            "Attendance": rng.integers(5000, 60000, n_fixtures),
+            "Venue": [f"{squad} Stadium" for squad in squad_array[home_index]],
+            "Referee": [f"Referee {index % 20}" for index in range(n_fixtures)],
+            "Match Report": "Match Report",
+            "Notes": np.nan,
+        },
+        columns=FIXTURE_COLUMNS,
+    )
+    fixtures_df["home_score"] = home_goals.astype(str)
+    fixtures_df["away_score"] = away_goals.astype(str)
+    # no league games go to penalties
+    fixtures_df["home_penalties"] = np.nan
+    fixtures_df["away_penalties"] = np.nan
+    fixtures_df["season_name"] = season_name
+    return fixtures_df
+
+
+def get_synthetic_seasons_dict(
+    league_name="League-0",
+    n_seasons=5,
+    n_squads=20,
+    first_season=2017,
+    seed=0,
+):
+    """Function used to generate a seasons dictionary in the same format as
+    FBref.get_seasons_dict.
+
+    Args:
+        league_name (str, optional): name used for the squads.
+        n_seasons (int, optional): number of seasons. Defaults to 5.
+        n_squads (int, optional): squads in each season. Defaults to 20.
+        first_season (int, optional): start year of the first season.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        seasons_dict (dict): data and fixtures for each season
+    """
+    rng = np.random.default_rng(seed)
+    fbref = FBref()
+
+    seasons_dict = {}
+    for season_index in range(n_seasons):
+        start_year = first_season + season_index
+        season_name = f"{start_year}_{start_year + 1}"
+        squad_names = get_squad_names(league_name, n_squads, season_index)
+
+        league_team_dict = get_league_team_dict(squad_names, rng)
+        seasons_dict[season_name] = {
+            "data": fbref.get_team_data_dict(
+                season_name,
+                None,
+                league_name,
+                league_team_dict=league_team_dict,
+            ),
+            "fixtures": get_fixtures_df(squad_names, season_name, rng),
+        }
+    return seasons_dict
+
+
+def get_synthetic_leagues_dict(
+    n_leagues=1, n_seasons=5, n_squads=20, first_season=2017, seed=0
+):
+    """Function used to generate a seasons dictionary for each of several
+    leagues, keyed by league name"""
+    return {
+        f"League-{league_index}": get_synthetic_seasons_dict(
+            f"League-{league_index}",
+            n_seasons=n_seasons,
+            n_squads=n_squads,
+            first_season=first_season,
+            seed=seed + league_index,
+        )
+        for league_index in range(n_leagues)
+    }
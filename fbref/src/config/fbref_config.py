@@ -1,3 +1,45 @@
+# FBref site settings
+FBREF_BASE_URL = "https://fbref.com"
+
+FBREF_REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; fbref-analysis)",
+}
+
+# seconds before connecting to FBref, and then reading a response, times out
+FBREF_CONNECT_TIMEOUT = 10
+FBREF_REQUEST_TIMEOUT = 30
+
+# keep-alive connections the FBref session keeps open
+FBREF_POOL_MAXSIZE = 10
+
+# maximum number of requests sent to FBref in a minute across all threads
+FBREF_REQUESTS_PER_MINUTE = 10
+
+# retries of a request answered with 429/5xx or a connection error, waiting
+# Retry-After or an exponential backoff with jitter between attempts
+FBREF_MAX_RETRIES = 4
+FBREF_BACKOFF_SECONDS = 5
+FBREF_MAX_BACKOFF_SECONDS = 300
+
+# Response cache settings
+
+# hours before a cached page of a season that is still being played expires,
+# pages of completed seasons never expire
+CURRENT_SEASON_CACHE_TTL_HOURS = 12
+
+# month of the season's second year after which the season is complete
+SEASON_END_MONTH = 7
+
+# approximate bytes of parsed league pages kept in memory by an FBref instance
+LEAGUE_PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# approximate bytes of cleaned category tables kept in memory by a
+# CleanedTableCache
+CLEANED_TABLE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# bump when the cleaning code changes so cached cleaned tables are not reused
+CLEANED_TABLE_CACHE_VERSION = 1
+
 LEAGUE_TABLE_COLUMNS = [
     "Rk",
     "Squad",
@@ -29,6 +71,35 @@ LEAGUE_TABLE_COLUMNS = [
     "Away_Pts/MP",
 ]
 
+# html id patterns of the tables on a league's season stats page. League
+# table ids contain the season and league id so are matched on their ends.
+LEAGUE_TEAM_TABLE_ID_PATTERNS = {
+    "league_table": r"^results.*_overall$",
+    "league_table_home_away": r"^results.*_home_away$",
+    "standard_stats": r"^stats_squads_standard_for$",
+    "standard_stats_opp": r"^stats_squads_standard_against$",
+    "goalkeeping": r"^stats_squads_keeper_for$",
+    "goalkeeping_opp": r"^stats_squads_keeper_against$",
+    "ad_goalkeeping": r"^stats_squads_keeper_adv_for$",
+    "ad_goalkeeping_opp": r"^stats_squads_keeper_adv_against$",
+    "shooting": r"^stats_squads_shooting_for$",
+    "shooting_opp": r"^stats_squads_shooting_against$",
+    "passing": r"^stats_squads_passing_for$",
+    "passing_opp": r"^stats_squads_passing_against$",
+    "pass_types": r"^stats_squads_passing_types_for$",
+    "pass_types_opp": r"^stats_squads_passing_types_against$",
+    "goal_shot_creation": r"^stats_squads_gca_for$",
+    "goal_shot_creation_opp": r"^stats_squads_gca_against$",
+    "defensive_action": r"^stats_squads_defense_for$",
+    "defensive_action_opp": r"^stats_squads_defense_against$",
+    "possession": r"^stats_squads_possession_for$",
+    "possession_opp": r"^stats_squads_possession_against$",
+    "playing_time": r"^stats_squads_playing_time_for$",
+    "playing_time_opp": r"^stats_squads_playing_time_against$",
+    "miscellaneous": r"^stats_squads_misc_for$",
+    "miscellaneous_opp": r"^stats_squads_misc_against$",
+}
+
 # FBref columns of interest
 
 # Fixture table columns
@@ -39,14 +110,36 @@ FIXTURE_TABLE_COLUMNS = [
     "home_team",
     "home_score",
     "away_score",
+    "home_penalties",
+    "away_penalties",
     "xG_home",
     "xG_away",
     "away_team",
     "attendance",
+    "venue",
     "referee",
     "notes",
 ]
 
+# Score columns split out of the Score column of the fixtures table
+FIXTURE_SCORE_COLUMNS = [
+    "home_score",
+    "away_score",
+    "home_penalties",
+    "away_penalties",
+]
+
+# Score of a fixture e.g "2–1", or "(4) 1–1 (3)" when decided on penalties.
+# Postponed and abandoned games have no score and match nothing.
+FIXTURE_SCORE_PATTERN = (
+    r"^\s*(?:\((?P<home_penalties>\d+)\)\s*)?"
+    r"(?P<home_score>\d+)\s*[–-]\s*(?P<away_score>\d+)"
+    r"\s*(?:\((?P<away_penalties>\d+)\))?\s*$"
+)
+
+# Date and Time columns of the fixtures table joined by a space
+FIXTURE_KICKOFF_FORMAT = "%Y-%m-%d %H:%M"
+
 # Attacking rename column dictionary
 
 ATTACKING_RENAME_COL_DICT = {
@@ -136,6 +229,29 @@ ATTACKING_TOTAL_COLUMNS = [
     "total_defensive_actions_to_shots",
 ]
 
+# Attacking derived ratio columns, numerator and denominator
+ATTACKING_RATIO_COLUMNS = {
+    "goal_to_assist_ratio": ["total_goals", "total_assists"],
+}
+
+# Attacking drop columns
+ATTACKING_DROP_COLUMNS = [
+    "Playing_Time_Starts",
+    "Playing_Time_Min",
+    "Playing_Time_90s",
+    "Performance_CrdY",
+    "Performance_CrdR",
+    "Per_90_Minutes_G_plus_A",
+    "Per_90_Minutes_G_plus_A_minus_PK",
+    "Expected_npxG_plus_xAG",
+    "Per_90_Minutes_xG_plus_xAG",
+    "Per_90_Minutes_npxG_plus_xAG",
+    "90s",
+    "Standard_Gls",
+    "Expected_xG_y",
+    "Expected_npxG_y",
+]
+
 # Defense rename column dictionary
 DEFENSE_RENAME_COL_DICT = {
     "#_Pl": "no_of_players_used",
@@ -204,6 +320,9 @@ DEFENSE_TOTAL_COLUMNS = [
 ]
 
 
+# Defense drop columns
+DEFENSE_DROP_COLUMNS = ["Performance_Int", "Performance_TklW"]
+
 # Passing rename column dictionary
 PASSING_RENAME_COL_DICT = {
     "#_Pl": "no_of_players_used",
@@ -306,6 +425,16 @@ PASSING_TOTAL_COLUMNS = [
     "total_progressive_passes_recieved",
 ]
 
+# Passing drop columns
+PASSING_DROP_COLUMNS = [
+    "Ast",
+    "xAG",
+    "xA",
+    "A_minus_xAG",
+    "Att",
+    "Outcomes_Cmp",
+]
+
 # Goalkeeping rename column dictionary
 GOALKEEPING_RENAME_COL_DICT = {
     "#_Pl": "no_of_players_used",
@@ -370,6 +499,18 @@ GOALKEEPING_TOTAL_COLUMNS = [
     "defensive_actions_outside_penalty_area",
 ]
 
+# Goalkeeping drop columns
+GOALKEEPING_DROP_COLUMNS = [
+    "Playing_Time_Starts",
+    "Playing_Time_Min",
+    "Playing_Time_90s",
+    "Performance_W",
+    "Performance_D",
+    "Performance_L",
+    "90s",
+    "Goals_GA",
+]
+
 # Playing time rename column dictionary
 PLAYING_TIME_RENAME_COL_DICT = {
     "#_Pl": "no_of_players_used",
@@ -393,6 +534,26 @@ PLAYING_TIME_TOTAL_COLUMNS = [
     "total_expected_goals_against",
 ]
 
+# Playing time keep columns
+PLAYING_TIME_KEEP_COLUMNS = [
+    "Squad",
+    "no_of_players_used",
+    "average_age",
+    "MP",
+    "no_of_subs_used",
+    "minutes_per_sub",
+    "no_of_subs_unused",
+    "goals_scored_minus_against_per_90",
+    "total_expect_goals",
+    "total_expected_goals_against",
+    "xg_minus_xga",
+    "xg_minus_xga_per_90",
+    "no_of_subs_used_per_match",
+    "no_of_subs_unused_per_match",
+    "total_expect_goals_per_match",
+    "total_expected_goals_against_per_match",
+]
+
 # comparison columns
 
 ATTACKING_COMPARISON_COLUMNS = [
@@ -582,3 +743,103 @@ PLAYING_COMPARISON_COLUMNS = [
     "total_expect_goals_per_match",
     "total_expected_goals_against_per_match",
 ]
+
+# Named column projections, the cleaned columns of each data category to
+# parse, clean and compare. Data categories left out keep every column.
+COLUMN_PROJECTIONS = {
+    "comparison": {
+        "attacking": ATTACKING_COMPARISON_COLUMNS,
+        "defense": DEFENSE_COMPARISON_COLUMNS,
+        "passing": PASSING_COMPARISON_COLUMNS,
+        "goalkeeping": GOALKEEPING_COMPARISON_COLUMNS,
+        "playing_time": PLAYING_COMPARISON_COLUMNS,
+    },
+}
+
+# Cleaning specs for each data category, used by clean_table_df
+CLEANING_TABLE_SPECS = {
+    "attacking": {
+        "squad_category": True,
+        "rename_col_dict": ATTACKING_RENAME_COL_DICT,
+        "ratio_columns": ATTACKING_RATIO_COLUMNS,
+        "total_columns": ATTACKING_TOTAL_COLUMNS,
+        "drop_columns": ATTACKING_DROP_COLUMNS,
+        "keep_columns": None,
+    },
+    "defense": {
+        "squad_category": False,
+        "rename_col_dict": DEFENSE_RENAME_COL_DICT,
+        "ratio_columns": {},
+        "total_columns": DEFENSE_TOTAL_COLUMNS,
+        "drop_columns": DEFENSE_DROP_COLUMNS,
+        "keep_columns": None,
+    },
+    "passing": {
+        "squad_category": True,
+        "rename_col_dict": PASSING_RENAME_COL_DICT,
+        "ratio_columns": {},
+        "total_columns": PASSING_TOTAL_COLUMNS,
+        "drop_columns": PASSING_DROP_COLUMNS,
+        "keep_columns": None,
+    },
+    "goalkeeping": {
+        "squad_category": True,
+        "rename_col_dict": GOALKEEPING_RENAME_COL_DICT,
+        "ratio_columns": {},
+        "total_columns": GOALKEEPING_TOTAL_COLUMNS,
+        "drop_columns": GOALKEEPING_DROP_COLUMNS,
+        "keep_columns": None,
+    },
+    "playing_time": {
+        "squad_category": True,
+        "rename_col_dict": PLAYING_TIME_RENAME_COL_DICT,
+        "ratio_columns": {},
+        "total_columns": PLAYING_TIME_TOTAL_COLUMNS,
+        "drop_columns": [],
+        "keep_columns": PLAYING_TIME_KEEP_COLUMNS,
+    },
+}
+
+# Stats where a lower value is better, ranked in ascending order. Stats the
+# cleaning specs work out per match values for are ranked per match too.
+LOWER_IS_BETTER_STATS = [
+    "total_penalties_conceded",
+    "total_own_goals",
+    "total_dribbles_past",
+    "total_errors_to_opp_shots",
+    "total_yellow_cards",
+    "total_red_cards",
+    "total_second_yellows",
+    "total_fouls_committed",
+    "total_offsides",
+    "total_aerial_duels_lost",
+    "total_passes_offsides",
+    "total_passes_blocked",
+    "dribbles_unsuccessful_dispossession",
+    "dribbles_dispossesed",
+    "total_goals_against",
+    "total_shots_on_target_against",
+    "total_penalties_allowed",
+    "total_goals_against_penalties",
+    "total_goals_against_free_kicks",
+    "total_goals_against_corners",
+    "total_goals_against_own_goals",
+    "total_post_shot_xg",
+    "total_expected_goals_against",
+]
+
+LOWER_IS_BETTER_COLUMNS = (
+    LOWER_IS_BETTER_STATS
+    + [
+        f"{stat}_per_match"
+        for stat in LOWER_IS_BETTER_STATS
+        if any(
+            stat in table_spec["total_columns"]
+            for table_spec in CLEANING_TABLE_SPECS.values()
+        )
+    ]
+    + [
+        "total_goals_against_per_90",
+        "total_post_shot_xg_per_shot_on_target",
+    ]
+)
@@ -0,0 +1,141 @@
+"""Script used to backfill the fbref warehouse in resumable units of work.
+
+Each (league, season, page) unit is fetched, parsed and written to the
+warehouse on its own and recorded in a JobJournal with the partition it was
+written to. Running the same backfill again after a failure, e.g an HTTP 429
+on the 17th season, skips every finished unit and carries on from the unit
+that failed.
+"""
+
+from pathlib import Path
+
+from src.etl.warehouse import (
+    get_partition_path,
+    write_season_data_dict,
+    write_season_fixtures_df,
+)
+from src.utility.response_cache import get_content_hash
+
+# pages of a season crawled as separate units
+PAGE_LIST = ["stats", "fixtures"]
+
+
+def get_unit_output_path(warehouse_dir, league_name, season_name, page):
+    """Function used to get the partition whose existence shows a unit's
+    output was written"""
+    category = "league_table" if page == "stats" else "fixtures"
+    return get_partition_path(
+        warehouse_dir, "raw", league_name, season_name, category
+    )
+
+
+def is_unit_stored(journal, league_name, season_name, page):
+    """Function used to check whether a unit is done in the journal and its
+    output is still in the warehouse"""
+    unit = journal.get_unit(league_name, season_name, page)
+    return (
+        unit is not None
+        and unit["state"] == "done"
+        and Path(unit["output_location"]).exists()
+    )
+
+
+def crawl_unit(
+    fbref, warehouse_dir, season_name, league_id, league_name, page, cleaned
+):
+    """Function used to fetch, parse and store a single page of a season.
+
+    Returns:
+        unit_output (tuple): partition written and content hash of the page
+    """
+    if page == "stats":
+        html = fbref.get_page_html(
+            fbref.get_league_stats_url(season_name, league_id, league_name),
+            season_name,
+        )
+        write_season_data_dict(
+            fbref.get_team_season_data(
+                season_name, league_id, league_name, html=html
+            ),
+            warehouse_dir,
+            league_name,
+            season_name,
+            cleaned,
+        )
+    elif page == "fixtures":
+        html = fbref.get_page_html(
+            fbref.get_fixtures_url(season_name, league_id, league_name),
+            season_name,
+        )
+        write_season_fixtures_df(
+            fbref.get_fixtures_season_data(
+                season_name, league_id, league_name, html=html
+            ),
+            warehouse_dir,
+            league_name,
+            season_name,
+            cleaned,
+        )
+    else:
+        raise Exception("Invalid page.")
+
+    output_path = get_unit_output_path(
+        warehouse_dir, league_name, season_name, page
+    )
+    return output_path, get_content_hash(html)
+
+
+def backfill_seasons(
+    fbref,
+    journal,
+    warehouse_dir,
+    season_name_list,
+    league_id,
+    league_name,
+    cleaned=True,
+):
+    """Function used to crawl seasons of a competition into the warehouse,
+    skipping units the journal records as done.
+
+    A failed unit is recorded in the journal and its error raised, so the
+    backfill stops and the same call can be made again to resume.
+
+    Args:
+        fbref (FBref): FBref instance used to fetch pages
+        journal (JobJournal): journal of finished units
+        warehouse_dir (str): root folder of the warehouse
+        season_name_list (list): seasons to crawl e.g ["2021_2022"]
+        league_id (int): FBref id of the competition
+        league_name (str): FBref name of the competition
+        cleaned (bool, optional): Whether to also write the cleaned tables.
+                                  Defaults to True.
+
+    Returns:
+        unit_state_dict (dict): done or skipped for each (season, page)
+    """
+    unit_state_dict = {}
+    for season_name in season_name_list:
+        for page in PAGE_LIST:
+            if is_unit_stored(journal, league_name, season_name, page):
+                unit_state_dict[(season_name, page)] = "skipped"
+                continue
+
+            journal.mark_started(league_name, season_name, page)
+            try:
+                output_path, content_hash = crawl_unit(
+                    fbref,
+                    warehouse_dir,
+                    season_name,
+                    league_id,
+                    league_name,
+                    page,
+                    cleaned,
+                )
+            except Exception as error:
+                journal.mark_failed(league_name, season_name, page, repr(error))
+                raise
+            journal.mark_done(
+                league_name, season_name, page, output_path, content_hash
+            )
+            unit_state_dict[(season_name, page)] = "done"
+    return unit_state_dict
@@ -1,18 +1,15 @@
 """ Script used to help clean data extracted from fbref. """
 
+import numpy as np
 import pandas as pd
+from src.utility.instrumentation import instrument_stage
 from src.config.fbref_config import (
     FIXTURE_TABLE_COLUMNS,
-    ATTACKING_RENAME_COL_DICT,
-    ATTACKING_TOTAL_COLUMNS,
-    DEFENSE_RENAME_COL_DICT,
-    DEFENSE_TOTAL_COLUMNS,
-    PASSING_RENAME_COL_DICT,
-    PASSING_TOTAL_COLUMNS,
-    GOALKEEPING_RENAME_COL_DICT,
-    GOALKEEPING_TOTAL_COLUMNS,
-    PLAYING_TIME_RENAME_COL_DICT,
-    PLAYING_TIME_TOTAL_COLUMNS,
+    FIXTURE_SCORE_COLUMNS,
+    FIXTURE_SCORE_PATTERN,
+    FIXTURE_KICKOFF_FORMAT,
+    CLEANING_TABLE_SPECS,
+    COLUMN_PROJECTIONS,
     ATTACKING_COMPARISON_COLUMNS,
     DEFENSE_COMPARISON_COLUMNS,
     PASSING_COMPARISON_COLUMNS,
@@ -22,39 +19,189 @@ from src.config.fbref_config import (
 
 
 def clean_fb_ref_column_names(fbref_df):
-    """Function used to clean column names for fbref dataframes.
+    """Function used to clean column names for fbref dataframes. The given
+    dataframe is left as it is, as raw tables are shared with the page cache.
 
     Args:
         fbref_df (pandas.DataFrame): fbref dataframe
 
     Returns:
-        fbref_df (pandas.DataFrame): Renamed fbref dataframe
+        renamed_df (pandas.DataFrame): Renamed fbref dataframe
     """
     # set column names
-    fbref_df.columns = [
+    return fbref_df.rename(columns=get_clean_column_name)
+
+
+def get_clean_column_name(col_name):
+    """Function used to clean a single fbref column name e.g
+    "Per 90 Minutes G+A" becomes "Per_90_Minutes_G_plus_A"."""
+    return (
         col_name.replace(" ", "_")
         .replace("/", "_per_")
         .replace("+", "_plus_")
         .replace("-", "_minus_")
         .replace("%", "_perc")
-        for col_name in list(fbref_df.columns)
+    )
+
+
+def get_column_projection(projection):
+    """Function used to get the cleaned columns of each data category asked
+    for by a projection.
+
+    Args:
+        projection (str or dict): name of a projection in COLUMN_PROJECTIONS
+                                  e.g "comparison", or a dictionary of
+                                  cleaned columns for each data category.
+                                  None keeps every column.
+
+    Raises:
+        Exception: Given if projection is not in COLUMN_PROJECTIONS
+
+    Returns:
+        columns_dict (dict): cleaned columns of each data category, None
+                             when every column is kept
+    """
+    if projection is None or isinstance(projection, dict):
+        return projection
+    if projection not in COLUMN_PROJECTIONS:
+        raise Exception("Invalid projection.")
+    return COLUMN_PROJECTIONS[projection]
+
+
+def get_clean_input_columns(table_spec, columns):
+    """Function used to work out which columns of a table, named as
+    clean_fb_ref_column_names leaves them, clean_table_df needs to give the
+    cleaned columns asked for.
+
+    Args:
+        table_spec (dict): cleaning spec from CLEANING_TABLE_SPECS
+        columns (list): cleaned columns wanted e.g ["total_goals_per_match"]
+
+    Returns:
+        input_column_set (set): columns needed, always including Squad
+    """
+    # a cleaned column can come from several columns before renaming
+    source_column_dict = {}
+    for source_column, renamed_column in table_spec["rename_col_dict"].items():
+        source_column_dict.setdefault(renamed_column, []).append(source_column)
+    total_column_set = set(table_spec["total_columns"])
+
+    input_column_set = {"Squad"}
+    for column in columns:
+        if column in table_spec["ratio_columns"]:
+            renamed_columns = list(table_spec["ratio_columns"][column])
+        elif (
+            column.endswith("_per_match")
+            and column[: -len("_per_match")] in total_column_set
+        ):
+            renamed_columns = [column[: -len("_per_match")], "MP"]
+        else:
+            renamed_columns = [column]
+        for renamed_column in renamed_columns:
+            input_column_set.add(renamed_column)
+            input_column_set.update(source_column_dict.get(renamed_column, []))
+    return input_column_set
+
+
+def extract_unique_values(text_series, pattern, expand=True):
+    """Function used to run Series.str.extract on the distinct values of a
+    column only, as fixtures repeat the same few scores and kickoff times,
+    and spread the matches back to every row.
+
+    Args:
+        text_series (pandas.Series): column of strings, missing values allowed
+        pattern (str): regular expression with capture groups
+        expand (bool, optional): as in Series.str.extract. Defaults to True.
+
+    Returns:
+        extracted (pandas.DataFrame or pandas.Series): matches of each row,
+                                                       NaN where nothing
+                                                       matches
+    """
+    # object so columns with every value missing can use .str
+    codes, unique_values = pd.factorize(text_series.astype(object))
+    unique_extracted = pd.Series(unique_values, dtype=object).str.extract(
+        pattern, expand=expand
+    )
+    # missing values have code -1 which reindex leaves as NaN
+    extracted = unique_extracted.reindex(codes)
+    extracted.index = text_series.index
+    return extracted
+
+
+def get_fixture_scores_df(score_series):
+    """Function used to split the Score column of a fixtures table into
+    home_score, away_score, home_penalties and away_penalties with a single
+    vectorized match, e.g "(4) 1–1 (3)" gives 1, 1, 4 and 3. Values are kept
+    as strings, games with no score e.g postponed or abandoned ones are NaN.
+
+    Args:
+        score_series (pandas.Series): Score column of the fixtures table
+
+    Returns:
+        scores_df (pandas.DataFrame): FIXTURE_SCORE_COLUMNS of each fixture
+    """
+    return extract_unique_values(score_series, FIXTURE_SCORE_PATTERN)[
+        FIXTURE_SCORE_COLUMNS
     ]
-    return fbref_df
 
 
-def clean_fixtures_df(fixtures_df):
-    """Function used to clean fixtures data extracted from FBref"""
+def get_fixture_kickoff(date_series, time_series):
+    """Function used to parse the kickoff of fixtures from the Date and Time
+    columns with FIXTURE_KICKOFF_FORMAT, NaT when either is missing. Only the
+    venue time is kept when a local time follows it e.g "20:00 (21:00)"."""
+    kickoff_time = extract_unique_values(
+        time_series, r"(\d{2}:\d{2})", expand=False
+    )
+    return pd.to_datetime(
+        date_series.astype(object) + " " + kickoff_time,
+        format=FIXTURE_KICKOFF_FORMAT,
+        errors="coerce",
+        cache=True,
+    )
+
+
+def get_fixture_team_dtype(fixtures_df):
+    """Function used to create one categorical dtype for the Home and Away
+    columns of a fixtures table"""
+    return pd.CategoricalDtype(
+        sorted(
+            pd.concat([fixtures_df["Home"], fixtures_df["Away"]])
+            .dropna()
+            .unique()
+        )
+    )
+
+
+@instrument_stage("clean_fixtures")
+def clean_fixtures_df(fixtures_df, team_dtype=None):
+    """Function used to clean fixtures data extracted from FBref.
+
+    Scores are split out of the Score column if the table does not have them
+    yet, e.g tables stored before penalty shootouts were parsed.
+
+    Args:
+        fixtures_df (pandas.DataFrame): fixtures table, of any number of
+                                        seasons and leagues
+        team_dtype (pandas.CategoricalDtype, optional): shared dtype for the
+                                                        home_team and
+                                                        away_team columns.
+                                                        Defaults to None which
+                                                        builds one from
+                                                        fixtures_df.
+
+    Returns:
+        cleaned_fixtures_df (pandas.DataFrame): cleaned fixtures data
+    """
+    if not set(FIXTURE_SCORE_COLUMNS).issubset(fixtures_df.columns):
+        fixtures_df = fixtures_df.assign(
+            **get_fixture_scores_df(fixtures_df["Score"])
+        )
+    if team_dtype is None:
+        team_dtype = get_fixture_team_dtype(fixtures_df)
+
     cleaned_fixtures_df = (
         fixtures_df
-        # change column types
-        .astype(
-            {
-                "home_score": float,
-                "away_score": float,
-                "Venue": "category",
-                "Referee": "category",
-            }
-        )
         # rename
         .rename(
             columns={
@@ -67,22 +214,37 @@ def clean_fixtures_df(fixtures_df):
                 "xG.1": "xG_away",
                 "Away": "away_team",
                 "Attendance": "attendance",
+                "Venue": "venue",
                 "Referee": "referee",
                 "Notes": "notes",
             }
         )
         # set kick off column
         .assign(
-            kickoff=pd.to_datetime(
-                fixtures_df["Date"] + " " + fixtures_df["Time"]
+            kickoff=get_fixture_kickoff(
+                fixtures_df["Date"], fixtures_df["Time"]
             )
         )
-        # filter for columns we want
+        # filter for columns we want, before casting so only those are copied
         [FIXTURE_TABLE_COLUMNS]
+        # change column types
+        .astype(
+            {
+                "home_score": float,
+                "away_score": float,
+                "home_penalties": float,
+                "away_penalties": float,
+                "home_team": team_dtype,
+                "away_team": team_dtype,
+                "venue": "category",
+                "referee": "category",
+            }
+        )
     )
     return cleaned_fixtures_df
 
 
+@instrument_stage("clean_league_table")
 def clean_league_table_df(league_table_df):
     """Function used to clean league table data extracted from FBref"""
     cleaned_league_table_df = (
@@ -127,228 +289,231 @@ def clean_league_table_df(league_table_df):
     return cleaned_league_table_df
 
 
-def clean_attacking_table_df(attacking_df):
-    """Function used to clean attacking table data extracted from FBref
+@instrument_stage("clean_table")
+def clean_table_df(table_df, table_spec, columns=None):
+    """Function used to clean a category table extracted from FBref using a
+    cleaning spec from CLEANING_TABLE_SPECS.
+
+    All per match columns are worked out in one vectorized division of the
+    total columns by MP.
 
     Args:
-        attacking_df (pandas.DataFrame): tabular data related to attacking data
+        table_df (pandas.DataFrame): tabular data for a data category
+        table_spec (dict): rename dictionary, ratio, total, drop and keep
+                           columns used to clean the table
+        columns (list, optional): cleaned columns wanted, only the columns
+                                  they are worked out from are kept and only
+                                  their ratio and per match columns worked
+                                  out. Defaults to None which gives every
+                                  column of the spec.
 
     Returns:
-        cleaned_attacking_df (pandas.DataFrame): cleaned attacking data
+        cleaned_table_df (pandas.DataFrame): cleaned data, Squad and columns
+                                             in the order given if columns
+                                             is given
     """
     # set column names
-    attacking_df = clean_fb_ref_column_names(attacking_df)
-
-    # clean attacking df
-    attacking_df = (
-        attacking_df
-        # change column types
-        .astype(
-            {
-                "Squad": "category",
-            }
+    table_df = clean_fb_ref_column_names(table_df)
+
+    if columns is not None:
+        input_column_set = get_clean_input_columns(table_spec, columns)
+        table_df = table_df[
+            [
+                column
+                for column in table_df.columns
+                if column in input_column_set
+            ]
+        ]
+        table_spec = dict(
+            table_spec,
+            ratio_columns={
+                ratio_col: ratio_columns
+                for ratio_col, ratio_columns in table_spec[
+                    "ratio_columns"
+                ].items()
+                if ratio_col in columns
+            },
+            total_columns=[
+                tot_col
+                for tot_col in table_spec["total_columns"]
+                if f"{tot_col}_per_match" in columns
+            ],
         )
-        # rename
-        .rename(columns=ATTACKING_RENAME_COL_DICT).assign(
-            goal_to_assist_ratio=lambda x: x["total_goals"] / x["total_assists"]
+
+    # change column types
+    if table_spec["squad_category"]:
+        table_df = table_df.astype({"Squad": "category"})
+
+    # rename columns
+    table_df = table_df.rename(columns=table_spec["rename_col_dict"])
+
+    # calculate ratio columns
+    for ratio_col, (numerator_col, denominator_col) in table_spec[
+        "ratio_columns"
+    ].items():
+        table_df = table_df.assign(
+            **{ratio_col: table_df[numerator_col] / table_df[denominator_col]}
         )
-    )
 
     # calculate per match columns
-    for tot_col in ATTACKING_TOTAL_COLUMNS:
-        attacking_df[f"{tot_col}_per_match"] = attacking_df.apply(
-            lambda x: round(float(x[f"{tot_col}"]) / float(x["MP"]), 3), axis=1
-        )
+    total_columns = list(dict.fromkeys(table_spec["total_columns"]))
+    totals_array = table_df[total_columns].to_numpy(dtype=np.float64)
+    matches_array = table_df["MP"].to_numpy(dtype=np.float64)
+    per_match_df = pd.DataFrame(
+        round_array(totals_array / matches_array[:, np.newaxis], 3),
+        columns=[f"{tot_col}_per_match" for tot_col in total_columns],
+        index=table_df.index,
+    )
+    table_df = pd.concat([table_df, per_match_df], axis=1)
+
+    # drop or filter for columns
+    if columns is not None:
+        cleaned_table_df = table_df[
+            list(dict.fromkeys(["Squad"] + list(columns)))
+        ]
+    elif table_spec["keep_columns"] is not None:
+        cleaned_table_df = table_df[table_spec["keep_columns"]]
+    else:
+        cleaned_table_df = table_df.drop(table_spec["drop_columns"], axis=1)
+
+    return cleaned_table_df
 
-    # drop columns
-
-    cleaned_attacking_df = attacking_df.drop(
-        [
-            "Playing_Time_Starts",
-            "Playing_Time_Min",
-            "Playing_Time_90s",
-            "Performance_CrdY",
-            "Performance_CrdR",
-            "Per_90_Minutes_G_plus_A",
-            "Per_90_Minutes_G_plus_A_minus_PK",
-            "Expected_npxG_plus_xAG",
-            "Per_90_Minutes_xG_plus_xAG",
-            "Per_90_Minutes_npxG_plus_xAG",
-            "90s",
-            "Standard_Gls",
-            "Expected_xG_y",
-            "Expected_npxG_y",
-        ],
-        axis=1,
+
+def round_array(values_array, decimals):
+    """Function used to round an array of floats giving the same values as the
+    built in round. np.round scales by 10**decimals first which can land the
+    other side of a half, so those values are rounded again with round."""
+    rounded_array = np.round(values_array, decimals)
+
+    scaled_array = values_array * 10**decimals
+    near_half_array = (
+        np.abs(np.abs(scaled_array - np.trunc(scaled_array)) - 0.5) < 1e-6
     )
-    return cleaned_attacking_df
+    for index in zip(*np.nonzero(near_half_array)):
+        rounded_array[index] = round(float(values_array[index]), decimals)
+    return rounded_array
 
 
-def clean_defense_table_df(defense_df):
-    """Function used to clean defense table data extracted from FBref
+def clean_attacking_table_df(attacking_df, columns=None):
+    """Function used to clean attacking table data extracted from FBref
+
     Args:
-        defense_df (pandas.DataFrame): tabular data related to defensive data
+        attacking_df (pandas.DataFrame): tabular data related to attacking data
+        columns (list, optional): cleaned columns wanted. Defaults to None.
 
     Returns:
-        cleaned_defense_df (pandas.DataFrame): cleaned defense data
+        cleaned_attacking_df (pandas.DataFrame): cleaned attacking data
     """
-    # set column names
-    defense_df = clean_fb_ref_column_names(defense_df)
-
-    # rename column names
-    defense_df = defense_df.rename(columns=DEFENSE_RENAME_COL_DICT)
-
-    # calculate per match columns
-    for tot_col in DEFENSE_TOTAL_COLUMNS:
-        defense_df[f"{tot_col}_per_match"] = defense_df.apply(
-            lambda x: round(float(x[f"{tot_col}"]) / float(x["MP"]), 3), axis=1
-        )
+    return clean_table_df(
+        attacking_df, CLEANING_TABLE_SPECS["attacking"], columns
+    )
 
-    # drop columns
 
-    cleaned_defense_df = defense_df.drop(
-        ["Performance_Int", "Performance_TklW"], axis=1
-    )
+def clean_defense_table_df(defense_df, columns=None):
+    """Function used to clean defense table data extracted from FBref
+    Args:
+        defense_df (pandas.DataFrame): tabular data related to defensive data
+        columns (list, optional): cleaned columns wanted. Defaults to None.
 
-    return cleaned_defense_df
+    Returns:
+        cleaned_defense_df (pandas.DataFrame): cleaned defense data
+    """
+    return clean_table_df(defense_df, CLEANING_TABLE_SPECS["defense"], columns)
 
 
-def clean_passing_table_df(passing_df):
+def clean_passing_table_df(passing_df, columns=None):
     """Function used to clean passing table data extracted from FBref
     Args:
         defense_df (pandas.DataFrame): tabular data related to passing data
+        columns (list, optional): cleaned columns wanted. Defaults to None.
 
     Returns:
         cleaned_defense_df (pandas.DataFrame): cleaned passing data
     """
-    # set column names
-    passing_df = clean_fb_ref_column_names(passing_df)
-
-    passing_df = (
-        passing_df
-        # change type of
-        .astype(
-            {
-                "Squad": "category",
-            }
-        )
-        # rename columns
-        .rename(columns=PASSING_RENAME_COL_DICT)
-    )
-
-    # calculate per match columns
-    for tot_col in PASSING_TOTAL_COLUMNS:
-        passing_df[f"{tot_col}_per_match"] = passing_df.apply(
-            lambda x: round(float(x[f"{tot_col}"]) / float(x["MP"]), 3), axis=1
-        )
+    return clean_table_df(passing_df, CLEANING_TABLE_SPECS["passing"], columns)
 
-    # drop columns
 
-    cleaned_passing_df = passing_df.drop(
-        ["Ast", "xAG", "xA", "A_minus_xAG", "Att", "Outcomes_Cmp"], axis=1
-    )
-
-    return cleaned_passing_df
-
-
-def clean_goalkeeping_table_df(goalkeeping_df):
+def clean_goalkeeping_table_df(goalkeeping_df, columns=None):
     """Function used to clean goalkeeping table data extracted from FBref
     Args:
         defense_df (pandas.DataFrame): tabular data related to goalkeeping data
+        columns (list, optional): cleaned columns wanted. Defaults to None.
 
     Returns:
         cleaned_defense_df (pandas.DataFrame): cleaned goalkeeping data
     """
-    # set column names
-    goalkeeping_df = clean_fb_ref_column_names(goalkeeping_df)
-
-    goalkeeping_df = (
-        goalkeeping_df
-        # change type of
-        .astype(
-            {
-                "Squad": "category",
-            }
-        )
-        # rename columns
-        .rename(columns=GOALKEEPING_RENAME_COL_DICT)
+    return clean_table_df(
+        goalkeeping_df, CLEANING_TABLE_SPECS["goalkeeping"], columns
     )
 
-    # calculate per match columns
-    for tot_col in GOALKEEPING_TOTAL_COLUMNS:
-        goalkeeping_df[f"{tot_col}_per_match"] = goalkeeping_df.apply(
-            lambda x: round(float(x[f"{tot_col}"]) / float(x["MP"]), 3), axis=1
-        )
-
-    # drop columns
-
-    cleaned_goalkeeping_df = goalkeeping_df.drop(
-        [
-            "Playing_Time_Starts",
-            "Playing_Time_Min",
-            "Playing_Time_90s",
-            "Performance_W",
-            "Performance_D",
-            "Performance_L",
-            "90s",
-            "Goals_GA",
-        ],
-        axis=1,
-    )
 
-    return cleaned_goalkeeping_df
-
-
-def clean_playing_time_table_df(playing_time_df):
+def clean_playing_time_table_df(playing_time_df, columns=None):
     """Function used to clean playing_time table data extracted from FBref
     Args:
         playing_time_df (pandas.DataFrame): tabular data related to playing_time data
+        columns (list, optional): cleaned columns wanted. Defaults to None.
 
     Returns:
         cleaned_playing_time_df (pandas.DataFrame): cleaned playing_time data
     """
-    # set column names
-    playing_time_df = clean_fb_ref_column_names(playing_time_df)
-
-    playing_time_df = (
-        playing_time_df
-        # change type of
-        .astype(
-            {
-                "Squad": "category",
-            }
-        )
-        # rename columns
-        .rename(columns=PLAYING_TIME_RENAME_COL_DICT)
+    return clean_table_df(
+        playing_time_df, CLEANING_TABLE_SPECS["playing_time"], columns
     )
 
-    # calculate per match columns
-    for tot_col in PLAYING_TIME_TOTAL_COLUMNS:
-        playing_time_df[f"{tot_col}_per_match"] = playing_time_df.apply(
-            lambda x: round(float(x[f"{tot_col}"]) / float(x["MP"]), 3), axis=1
-        )
 
-    # filter for certain columns
-
-    cleaned_playing_time_df = playing_time_df[
-        [
-            "Squad",
-            "no_of_players_used",
-            "average_age",
-            "MP",
-            "no_of_subs_used",
-            "minutes_per_sub",
-            "no_of_subs_unused",
-            "goals_scored_minus_against_per_90",
-            "total_expect_goals",
-            "total_expected_goals_against",
-            "xg_minus_xga",
-            "xg_minus_xga_per_90",
-            "no_of_subs_used_per_match",
-            "no_of_subs_unused_per_match",
-            "total_expect_goals_per_match",
-            "total_expected_goals_against_per_match",
-        ]
-    ]
+def get_team_category_dtype(*seasons_dicts):
+    """Function used to create one categorical dtype holding every squad in
+    the given seasons dictionaries, so Squad columns stay categorical when
+    seasons, leagues and data categories are concatenated.
 
-    return cleaned_playing_time_df
+    Args:
+        seasons_dicts (dict): Dictionaries of data from fbref for multiple
+                              seasons e.g one per league
+
+    Returns:
+        team_dtype (pandas.CategoricalDtype): dtype with every team and
+                                              opponent squad as categories
+    """
+    squad_set = set()
+    for seasons_dict in seasons_dicts:
+        for season_dict in seasons_dict.values():
+            data_dict = season_dict["data"]
+            squad_set.update(data_dict["league_table"]["Squad"].dropna())
+            for data_type in ("team_data", "opponent_data"):
+                for category_df in data_dict[data_type].values():
+                    squad_set.update(category_df["Squad"].dropna())
+    return pd.CategoricalDtype(sorted(squad_set))
+
+
+def downcast_numeric_columns(fbref_df):
+    """Function used to downcast numeric columns to smaller types where no
+    information is lost, integers to int16 or int32 when they fit and floats
+    to float32 when every value survives the round trip. int8 is not used so
+    arithmetic on the downcast columns has headroom.
+
+    Args:
+        fbref_df (pandas.DataFrame): fbref dataframe
+
+    Returns:
+        downcast_df (pandas.DataFrame): dataframe with downcast columns
+    """
+    downcast_dtype_dict = {}
+    for col_name, col_dtype in fbref_df.dtypes.items():
+        if pd.api.types.is_integer_dtype(col_dtype):
+            for int_dtype in (np.int16, np.int32):
+                int_info = np.iinfo(int_dtype)
+                if (
+                    fbref_df[col_name].min() >= int_info.min
+                    and fbref_df[col_name].max() <= int_info.max
+                ):
+                    downcast_dtype_dict[col_name] = int_dtype
+                    break
+        elif col_dtype == np.float64:
+            values_array = fbref_df[col_name].to_numpy()
+            if np.array_equal(
+                values_array.astype(np.float32).astype(np.float64),
+                values_array,
+                equal_nan=True,
+            ):
+                downcast_dtype_dict[col_name] = np.float32
+    return fbref_df.astype(downcast_dtype_dict)
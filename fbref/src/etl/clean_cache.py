@@ -0,0 +1,174 @@
+"""Script used to cache cleaned category tables by the content of the raw table
+and the cleaning spec they were cleaned with.
+
+The clean_*_table_df functions only depend on the raw table and the cleaning
+spec of its data category in CLEANING_TABLE_SPECS, so a cleaned table is
+stored under a key made of
+    {data_category}-{spec version}-{raw table fingerprint}
+Changing a category's spec changes its version, so only that category's
+tables are cleaned again, while unchanged seasons are read from memory or
+from a pickle file in the cache folder.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from src.config.fbref_config import (
+    CLEANING_TABLE_SPECS,
+    CLEANED_TABLE_CACHE_VERSION,
+    CLEANED_TABLE_CACHE_MAX_BYTES,
+)
+from src.utility.lru_cache import ByteBoundedLRUCache
+
+
+def get_table_fingerprint(table_df):
+    """Function used to hash the content of a raw table, its values, index,
+    dtypes and column names"""
+    table_hash = hashlib.sha256()
+    table_hash.update(
+        json.dumps(
+            [
+                [str(column_name), str(dtype)]
+                for column_name, dtype in table_df.dtypes.items()
+            ]
+        ).encode("utf-8")
+    )
+    table_hash.update(
+        pd.util.hash_pandas_object(table_df, index=True).to_numpy().tobytes()
+    )
+    return table_hash.hexdigest()
+
+
+def get_spec_version(data_category, table_specs=CLEANING_TABLE_SPECS):
+    """Function used to hash the cleaning spec of a data category along with
+    CLEANED_TABLE_CACHE_VERSION, bumped when the cleaning code changes"""
+    spec_json = json.dumps(
+        [CLEANED_TABLE_CACHE_VERSION, table_specs[data_category]],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(spec_json.encode("utf-8")).hexdigest()[:16]
+
+
+class CleanedTableCache:
+    """Class used to keep cleaned category tables in memory and, given a
+    cache_dir, on disk so they survive between sessions.
+
+    Args:
+        cache_dir (str, optional): folder the cleaned tables are pickled to.
+                                   Defaults to None which only caches in
+                                   memory.
+        max_bytes (int, optional): maximum size of the tables kept in memory.
+                                   Defaults to CLEANED_TABLE_CACHE_MAX_BYTES.
+        table_specs (dict, optional): cleaning specs the versions are worked
+                                      out from. Defaults to
+                                      CLEANING_TABLE_SPECS.
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        max_bytes=CLEANED_TABLE_CACHE_MAX_BYTES,
+        table_specs=CLEANING_TABLE_SPECS,
+    ):
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        # tables are cached with their size as cleaned tables do not grow
+        self.memory_cache = ByteBoundedLRUCache(
+            max_bytes, sizeof=lambda entry: entry[1]
+        )
+        self.spec_version_dict = {
+            data_category: get_spec_version(data_category, table_specs)
+            for data_category in table_specs
+        }
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+
+    def get_key(self, table_df, data_category, columns=None):
+        """Function used to get the cache key of a raw table, cleaned keeping
+        only columns if given"""
+        if data_category not in self.spec_version_dict:
+            raise Exception("Invalid data category.")
+        key = (
+            f"{data_category}-{self.spec_version_dict[data_category]}-"
+            f"{get_table_fingerprint(table_df)}"
+        )
+        if columns is not None:
+            columns_hash = hashlib.sha256(
+                json.dumps(list(columns)).encode("utf-8")
+            ).hexdigest()[:16]
+            key = f"{key}-{columns_hash}"
+        return key
+
+    def _get_path(self, key):
+        """Function used to get the file a cleaned table is pickled to"""
+        data_category = key.split("-", 1)[0]
+        return self.cache_dir / data_category / f"{key}.pkl"
+
+    def get(self, key):
+        """Function used to grab a cleaned table from memory or disk, None if
+        it is not cached"""
+        entry = self.memory_cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if self.cache_dir is None:
+            return None
+
+        path = self._get_path(key)
+        if not path.exists():
+            return None
+        cleaned_df = pd.read_pickle(path)
+        with self._lock:
+            self.disk_hits += 1
+        self._put_in_memory(key, cleaned_df)
+        return cleaned_df
+
+    def _put_in_memory(self, key, cleaned_df):
+        """Function used to keep a cleaned table in memory with its size"""
+        self.memory_cache.put(
+            key, (cleaned_df, int(cleaned_df.memory_usage(deep=True).sum()))
+        )
+
+    def put(self, key, cleaned_df):
+        """Function used to cache a cleaned table in memory and on disk. The
+        file is written next to its path first and then moved in place so
+        readers never see half written files."""
+        self._put_in_memory(key, cleaned_df)
+        if self.cache_dir is None:
+            return
+
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        cleaned_df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    def get_cleaned_df(
+        self, table_df, data_category, clean_function, columns=None
+    ):
+        """Function used to grab the cleaned table of a raw table, cleaning it
+        with clean_function(table_df, data_category, columns=columns) if it is
+        not cached"""
+        key = self.get_key(table_df, data_category, columns)
+        cleaned_df = self.get(key)
+        if cleaned_df is None:
+            cleaned_df = clean_function(
+                table_df, data_category, columns=columns
+            )
+            self.put(key, cleaned_df)
+        return cleaned_df
+
+    def get_stats(self):
+        """Function used to grab the memory cache counters along with the
+        tables read from disk, misses less disk_hits being the tables that had
+        to be cleaned"""
+        stats = self.memory_cache.get_stats()
+        with self._lock:
+            stats["disk_hits"] = self.disk_hits
+        return stats
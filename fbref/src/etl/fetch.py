@@ -1,12 +1,22 @@
 """Fetch script used to grab fbref data used for analaysis
 """
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+import numpy as np
 import pandas as pd
+from src.utility.instrumentation import instrument_stage
 from src.etl.clean import (
+    clean_fixtures_df,
     clean_attacking_table_df,
     clean_defense_table_df,
     clean_passing_table_df,
     clean_goalkeeping_table_df,
     clean_playing_time_table_df,
+    get_team_category_dtype,
+    get_column_projection,
+    downcast_numeric_columns,
 )
 from src.config.fbref_config import (
     ATTACKING_COMPARISON_COLUMNS,
@@ -14,11 +24,19 @@ from src.config.fbref_config import (
     PASSING_COMPARISON_COLUMNS,
     PLAYING_COMPARISON_COLUMNS,
     GOALKEEPING_COMPARISON_COLUMNS,
+    LOWER_IS_BETTER_COLUMNS,
 )
 
 
+@instrument_stage("get_category_data_across_seasons")
 def get_category_data_across_seasons(
-    seasons_dict, data_category, opponent_data=False
+    seasons_dict,
+    data_category,
+    opponent_data=False,
+    team_dtype=None,
+    downcast=True,
+    cleaned_table_cache=None,
+    columns=None,
 ):
     """Function used to create a dataframe of seasons worth of data with data side by side
 
@@ -26,6 +44,14 @@ def get_category_data_across_seasons(
         seasons_dict (dict): Dictionary of data from fbref for multiple seasons
         data_category (str): Type of data from fbref.
         opponent_data (bool, optional): Whether we want extract. Defaults to False.
+        team_dtype (pandas.CategoricalDtype, optional): shared dtype for the Squad
+            column. Defaults to None which builds one from seasons_dict.
+        downcast (bool, optional): Whether to downcast numeric columns where no
+            information is lost. Defaults to True.
+        cleaned_table_cache (CleanedTableCache, optional): cache of cleaned
+            tables so unchanged seasons are not cleaned again. Defaults to None.
+        columns (list, optional): cleaned columns to keep, only those and the
+            columns they are worked out from are cleaned. Defaults to None.
 
     Raises:
         Exception: Given if data_category is not one of 'attacking', 'defense', 'passing',
@@ -40,38 +66,76 @@ def get_category_data_across_seasons(
     else:
         data_type = "team_data"
 
+    if team_dtype is None:
+        team_dtype = get_team_category_dtype(seasons_dict)
+
     # clean each seasons data
-    seasons_category_data_dict = {}
-    for season_name in seasons_dict.keys():
-        category_data_dict = {}
-        category_df = seasons_dict[season_name]["data"][data_type][
-            data_category
-        ]
-        if data_category == "attacking":
-            cleaned_category_df = clean_attacking_table_df(category_df)
-        elif data_category == "defense":
-            cleaned_category_df = clean_defense_table_df(category_df)
-        elif data_category == "passing":
-            cleaned_category_df = clean_passing_table_df(category_df)
-        elif data_category == "goalkeeping":
-            cleaned_category_df = clean_goalkeeping_table_df(category_df)
-        elif data_category == "playing_time":
-            cleaned_category_df = clean_playing_time_table_df(category_df)
-        else:
-            raise Exception("Invalid data category.")
+    cleaned_df_dict = {
+        season_name: clean_category_df(
+            season_dict["data"][data_type][data_category],
+            data_category,
+            cleaned_table_cache,
+            columns,
+        )
+        for season_name, season_dict in seasons_dict.items()
+    }
+    return concat_category_seasons(cleaned_df_dict, team_dtype, downcast)
+
+
+def clean_category_df(
+    category_df, data_category, cleaned_table_cache=None, columns=None
+):
+    """Function used to clean a season's table of a data category, through
+    cleaned_table_cache if one is given, keeping only columns if given.
 
-        cleaned_category_df = cleaned_category_df.assign(
-            season_name=season_name
+    Raises:
+        Exception: Given if data_category is not one of 'attacking', 'defense', 'passing',
+        'goalkeeping', 'playing_time'
+    """
+    if cleaned_table_cache is not None:
+        return cleaned_table_cache.get_cleaned_df(
+            category_df, data_category, clean_category_df, columns
         )
-        category_data_dict[data_type] = cleaned_category_df
-        seasons_category_data_dict[season_name] = category_data_dict
 
-    stats_data_type_df_list = [
-        season_data_dict[data_type]
-        for season_data_dict in seasons_category_data_dict.values()
-    ]
+    if data_category == "attacking":
+        cleaned_category_df = clean_attacking_table_df(category_df, columns)
+    elif data_category == "defense":
+        cleaned_category_df = clean_defense_table_df(category_df, columns)
+    elif data_category == "passing":
+        cleaned_category_df = clean_passing_table_df(category_df, columns)
+    elif data_category == "goalkeeping":
+        cleaned_category_df = clean_goalkeeping_table_df(category_df, columns)
+    elif data_category == "playing_time":
+        cleaned_category_df = clean_playing_time_table_df(category_df, columns)
+    else:
+        raise Exception("Invalid data category.")
+    return cleaned_category_df
+
 
-    seasons_df = pd.concat(stats_data_type_df_list)
+def concat_category_seasons(cleaned_df_dict, team_dtype, downcast=True):
+    """Function used to stack the cleaned tables of a data category into one
+    df indexed by Squad and season_name.
+
+    Args:
+        cleaned_df_dict (dict): cleaned table of each season
+        team_dtype (pandas.CategoricalDtype): shared dtype for the Squad column
+        downcast (bool, optional): Whether to downcast numeric columns where no
+            information is lost. Defaults to True.
+
+    Returns:
+        seasons_df (pandas.DataFrame) : df for a certain data category in the format to compare
+                                        data across seasons.
+    """
+    seasons_df = pd.concat(
+        [
+            cleaned_category_df.astype({"Squad": team_dtype}).assign(
+                season_name=season_name
+            )
+            for season_name, cleaned_category_df in cleaned_df_dict.items()
+        ]
+    )
+    if downcast:
+        seasons_df = downcast_numeric_columns(seasons_df)
     # transpose data
     seasons_df = seasons_df.set_index(["Squad", "season_name"])
     # sort columns based by team
@@ -80,6 +144,7 @@ def get_category_data_across_seasons(
     return seasons_df
 
 
+@instrument_stage("get_seasons_comparison_dict")
 def get_seasons_comparison_dict(
     seasons_dict,
     data_category_list=[
@@ -89,22 +154,72 @@ def get_seasons_comparison_dict(
         "goalkeeping",
         "playing_time",
     ],
+    max_workers=1,
+    executor="process",
+    cleaned_table_cache=None,
+    columns=None,
 ):
-    """Function used to create dictionary for season comparisons"""
+    """Function used to create dictionary for season comparisons
+
+    Args:
+        seasons_dict (dict): Dictionary of data from fbref for multiple seasons
+        data_category_list (list, optional): data categories to compare.
+        max_workers (int, optional): Number of workers cleaning the
+                                     (category, side, season) tables at the
+                                     same time, None for one per core.
+                                     Defaults to 1 which cleans them one
+                                     after another in this process.
+        executor (str, optional): 'process' or 'thread' pool used when
+                                  max_workers is not 1. Defaults to 'process'.
+        cleaned_table_cache (CleanedTableCache, optional): cache of cleaned
+                                                           tables so unchanged
+                                                           seasons are not
+                                                           cleaned again.
+                                                           Defaults to None.
+        columns (str or dict, optional): projection e.g "comparison", or
+                                         cleaned columns of each data
+                                         category, to clean and keep.
+                                         Defaults to None which keeps every
+                                         column.
+
+    Returns:
+        season_comparison_dict (dict): comparison df of each data category
+                                       for team_data and opponent_data
+    """
+    columns_dict = get_column_projection(columns) or {}
+    if max_workers != 1:
+        return get_seasons_comparison_dict_in_parallel(
+            seasons_dict,
+            data_category_list,
+            max_workers,
+            executor,
+            cleaned_table_cache,
+            columns_dict,
+        )
+
     season_comparison_dict = {}
     team_data_dict = {}
     oppoenet_data_dict = {}
 
+    # one Squad dtype shared by every category and side
+    team_dtype = get_team_category_dtype(seasons_dict)
+
     for data_category in data_category_list:
         team_comparison_df = get_category_data_across_seasons(
             seasons_dict=seasons_dict,
             data_category=data_category,
             opponent_data=False,
+            team_dtype=team_dtype,
+            cleaned_table_cache=cleaned_table_cache,
+            columns=columns_dict.get(data_category),
         )
         team_opponent_comparison_df = get_category_data_across_seasons(
             seasons_dict=seasons_dict,
             data_category=data_category,
             opponent_data=True,
+            team_dtype=team_dtype,
+            cleaned_table_cache=cleaned_table_cache,
+            columns=columns_dict.get(data_category),
         )
         team_data_dict[data_category] = team_comparison_df
         oppoenet_data_dict[data_category] = team_opponent_comparison_df
@@ -114,6 +229,256 @@ def get_seasons_comparison_dict(
     return season_comparison_dict
 
 
+def clean_category_dfs(
+    category_df_list,
+    data_category_list,
+    max_workers=None,
+    executor="process",
+    columns_list=None,
+):
+    """Function used to clean many tables at once in a process or thread pool.
+
+    Falls back to cleaning the tables one after another in this process if
+    the process pool cannot be started or its workers die.
+
+    Args:
+        category_df_list (list): tables to clean
+        data_category_list (list): data category of each table
+        max_workers (int, optional): Number of workers. Defaults to None, one
+                                     per core.
+        executor (str, optional): 'process' or 'thread'. Defaults to
+                                  'process'.
+        columns_list (list, optional): cleaned columns to keep for each
+                                       table. Defaults to None which keeps
+                                       every column.
+
+    Raises:
+        Exception: Given if executor is not one of 'process', 'thread'
+
+    Returns:
+        cleaned_df_list (list): cleaned tables in the order given
+    """
+    if executor == "process":
+        pool_class = ProcessPoolExecutor
+    elif executor == "thread":
+        pool_class = ThreadPoolExecutor
+    else:
+        raise Exception("Invalid executor.")
+    if columns_list is None:
+        columns_list = [None] * len(category_df_list)
+
+    try:
+        with pool_class(max_workers=max_workers) as pool:
+            return list(
+                pool.map(
+                    clean_category_df,
+                    category_df_list,
+                    data_category_list,
+                    repeat(None),
+                    columns_list,
+                )
+            )
+    except (BrokenProcessPool, NotImplementedError, OSError):
+        return [
+            clean_category_df(category_df, data_category, columns=columns)
+            for category_df, data_category, columns in zip(
+                category_df_list, data_category_list, columns_list
+            )
+        ]
+
+
+def get_seasons_comparison_dict_in_parallel(
+    seasons_dict,
+    data_category_list,
+    max_workers=None,
+    executor="process",
+    cleaned_table_cache=None,
+    columns_dict=None,
+):
+    """Function used to create dictionary for season comparisons, cleaning
+    every (category, side, season) table in a pool at once. The output is
+    the same as the serial get_seasons_comparison_dict.
+
+    Tables in cleaned_table_cache are looked up here so only the others are
+    sent to the pool.
+    """
+    data_type_list = ["team_data", "opponent_data"]
+    columns_dict = columns_dict or {}
+    unit_list = [
+        (data_type, data_category, season_name)
+        for data_type in data_type_list
+        for data_category in data_category_list
+        for season_name in seasons_dict
+    ]
+    category_df_list = [
+        seasons_dict[season_name]["data"][data_type][data_category]
+        for data_type, data_category, season_name in unit_list
+    ]
+
+    if cleaned_table_cache is None:
+        key_list = [None] * len(unit_list)
+        cleaned_df_list = [None] * len(unit_list)
+    else:
+        key_list = [
+            cleaned_table_cache.get_key(
+                category_df, data_category, columns_dict.get(data_category)
+            )
+            for category_df, (_, data_category, _) in zip(
+                category_df_list, unit_list
+            )
+        ]
+        cleaned_df_list = [cleaned_table_cache.get(key) for key in key_list]
+
+    # clean the tables that were not cached
+    uncached_list = [
+        unit_number
+        for unit_number, cleaned_df in enumerate(cleaned_df_list)
+        if cleaned_df is None
+    ]
+    for unit_number, cleaned_df in zip(
+        uncached_list,
+        clean_category_dfs(
+            [category_df_list[unit_number] for unit_number in uncached_list],
+            [unit_list[unit_number][1] for unit_number in uncached_list],
+            max_workers,
+            executor,
+            [
+                columns_dict.get(unit_list[unit_number][1])
+                for unit_number in uncached_list
+            ],
+        ),
+    ):
+        cleaned_df_list[unit_number] = cleaned_df
+        if cleaned_table_cache is not None:
+            cleaned_table_cache.put(key_list[unit_number], cleaned_df)
+
+    cleaned_df_dict = {
+        data_type: {data_category: {} for data_category in data_category_list}
+        for data_type in data_type_list
+    }
+    for (data_type, data_category, season_name), cleaned_df in zip(
+        unit_list, cleaned_df_list
+    ):
+        cleaned_df_dict[data_type][data_category][season_name] = cleaned_df
+
+    # one Squad dtype shared by every category and side
+    team_dtype = get_team_category_dtype(seasons_dict)
+
+    return {
+        data_type: {
+            data_category: concat_category_seasons(
+                cleaned_df_dict[data_type][data_category], team_dtype
+            )
+            for data_category in data_category_list
+        }
+        for data_type in data_type_list
+    }
+
+
+def get_seasons_comparison_dict_from_stream(
+    season_items,
+    data_category_list=[
+        "attacking",
+        "defense",
+        "passing",
+        "goalkeeping",
+        "playing_time",
+    ],
+    cleaned_table_cache=None,
+    columns=None,
+):
+    """Function used to create dictionary for season comparisons from seasons
+    given one at a time e.g by FBref.iter_seasons. Each season is cleaned as
+    it arrives so only the cleaned tables are kept, not the raw tables of
+    every season.
+
+    Args:
+        season_items (iterable): (season_name, season_dict) pairs
+        data_category_list (list, optional): data categories to compare.
+        cleaned_table_cache (CleanedTableCache, optional): cache of cleaned
+                                                           tables. Defaults to
+                                                           None.
+        columns (str or dict, optional): projection to clean and keep, as in
+                                         get_seasons_comparison_dict.
+                                         Defaults to None.
+
+    Returns:
+        season_comparison_dict (dict): same output as
+                                       get_seasons_comparison_dict
+    """
+    columns_dict = get_column_projection(columns) or {}
+    data_type_list = ["team_data", "opponent_data"]
+    cleaned_df_dict = {
+        data_type: {data_category: {} for data_category in data_category_list}
+        for data_type in data_type_list
+    }
+    squad_set = set()
+
+    for season_name, season_dict in season_items:
+        squad_set.update(
+            get_team_category_dtype({season_name: season_dict}).categories
+        )
+        for data_type in data_type_list:
+            for data_category in data_category_list:
+                category_df = season_dict["data"][data_type][data_category]
+                cleaned_df_dict[data_type][data_category][season_name] = (
+                    clean_category_df(
+                        category_df,
+                        data_category,
+                        cleaned_table_cache,
+                        columns_dict.get(data_category),
+                    )
+                )
+
+    # one Squad dtype shared by every category and side
+    team_dtype = pd.CategoricalDtype(sorted(squad_set))
+
+    return {
+        data_type: {
+            data_category: concat_category_seasons(
+                cleaned_df_dict[data_type][data_category], team_dtype
+            )
+            for data_category in data_category_list
+        }
+        for data_type in data_type_list
+    }
+
+
+@instrument_stage("get_fixtures_across_seasons")
+def get_fixtures_across_seasons(*seasons_dicts, team_dtype=None):
+    """Function used to clean the fixtures of every season in the given
+    seasons dictionaries, e.g one per league, in one pass so the team, venue
+    and referee columns share one categorical dtype.
+
+    Args:
+        seasons_dicts (dict): Dictionaries of data from fbref for multiple
+                              seasons
+        team_dtype (pandas.CategoricalDtype, optional): shared dtype for the
+                                                        home_team and
+                                                        away_team columns.
+                                                        Defaults to None which
+                                                        builds one from the
+                                                        fixtures.
+
+    Returns:
+        fixtures_df (pandas.DataFrame): cleaned fixtures of every season with
+                                        a season_name column
+    """
+    raw_fixtures_df = pd.concat(
+        [
+            season_dict["fixtures"]
+            for seasons_dict in seasons_dicts
+            for season_dict in seasons_dict.values()
+        ],
+        ignore_index=True,
+    )
+    fixtures_df = clean_fixtures_df(raw_fixtures_df, team_dtype)
+    fixtures_df.insert(
+        0, "season_name", raw_fixtures_df["season_name"].astype("category")
+    )
+    return fixtures_df
+
+
 def get_data_category_season_comparison_df(
     season_comparison_dict,
     data_category,
@@ -169,6 +534,7 @@ def get_data_category_season_comparison_df(
     return season_comparison_df
 
 
+@instrument_stage("get_ranking_df")
 def get_ranking_df(data_category_df):
     """Function used to get the ranking of each stat for each team with respective to other teams of the league"""
     # filter out columns we don't want to rank
@@ -190,3 +556,88 @@ def get_ranking_df(data_category_df):
     ranking_df.columns = [column + "_rank" for column in ranking_df]
 
     return ranking_df
+
+
+@instrument_stage("get_grouped_ranking_df")
+def get_grouped_ranking_df(
+    data_category_df,
+    group_by=("season_name",),
+    lower_is_better_columns=LOWER_IS_BETTER_COLUMNS,
+    opponent_data=False,
+):
+    """Function used to rank, and get percentiles and z-scores of, every stat
+    for each team against the other teams of the same group e.g the same
+    league season.
+
+    All stats are ranked in one grouped pass. Stats in
+    lower_is_better_columns are flipped first so rank 1, the highest
+    percentile and the highest z-score always mean the best value for the
+    team. Opponent frames keep the column names of team frames but hold what
+    the team's opponents did, e.g total_goals is goals conceded, so with
+    opponent_data every direction is flipped back.
+
+    Args:
+        data_category_df (pandas.DataFrame): season comparison df e.g from
+                                             get_data_category_season_comparison_df
+        group_by (tuple, optional): index levels or columns to rank within.
+                                    Defaults to ("season_name",), add a league
+                                    level for multi-league frames.
+        lower_is_better_columns (list, optional): stats where a lower value
+                                                  is better for the team the
+                                                  stat is about.
+        opponent_data (bool, optional): Whether data_category_df is opponent
+                                        data e.g from
+                                        get_data_category_season_comparison_df
+                                        with opponent_data=True. Defaults to
+                                        False.
+
+    Returns:
+        ranking_df (pandas.DataFrame): _rank, _percentile and _zscore columns
+                                       for each stat
+    """
+    group_by = list(group_by)
+
+    # filter out columns we don't want to rank
+    stats_columns = [
+        column
+        for column in data_category_df.columns
+        if column not in ["Squad", "MP"] + group_by
+        and pd.api.types.is_numeric_dtype(data_category_df[column])
+    ]
+
+    # flip stats where lower is better so higher is always better
+    direction_array = np.where(
+        np.isin(stats_columns, list(lower_is_better_columns)), -1.0, 1.0
+    )
+    # opponent stats are good for the team when they are bad for the opponent
+    if opponent_data:
+        direction_array = -direction_array
+    stats_df = (
+        data_category_df[stats_columns].astype(np.float64) * direction_array
+    )
+
+    group_keys = [
+        (
+            stats_df.index.get_level_values(key)
+            if key in stats_df.index.names
+            else data_category_df[key]
+        )
+        for key in group_by
+    ]
+    grouped_stats = stats_df.groupby(group_keys, observed=True, sort=False)
+
+    rank_df = grouped_stats.rank(ascending=False)
+    percentile_df = grouped_stats.rank(pct=True)
+    zscore_df = (stats_df - grouped_stats.transform("mean")) / (
+        grouped_stats.transform("std")
+    )
+
+    ranking_df = pd.concat(
+        [
+            rank_df.add_suffix("_rank"),
+            percentile_df.add_suffix("_percentile"),
+            zscore_df.add_suffix("_zscore"),
+        ],
+        axis=1,
+    )
+    return ranking_df
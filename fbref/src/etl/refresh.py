@@ -0,0 +1,105 @@
+"""Script used to incrementally refresh the fbref warehouse, only fetching
+seasons that can still change"""
+
+import datetime
+
+from src.config.fbref_config import SEASON_END_MONTH
+from src.etl.warehouse import (
+    load_season_metadata,
+    write_season_metadata,
+    write_season_dict,
+)
+from src.utility.functions import is_completed_season
+from src.utility.response_cache import get_content_hash
+
+
+def is_season_complete(fixtures_df, season_name):
+    """Function used to check whether a season can no longer change, either
+    because its end date has passed or every fixture has a score.
+
+    Args:
+        fixtures_df (pandas.DataFrame): fixtures of the season
+        season_name (str): season e.g 2021_2022
+
+    Returns:
+        season_complete (bool): Whether the season is complete
+    """
+    if is_completed_season(season_name, SEASON_END_MONTH):
+        return True
+
+    # spacer rows between match weeks have no teams
+    fixtures_df = fixtures_df.dropna(subset=["Home", "Away"])
+    return len(fixtures_df) > 0 and bool(fixtures_df["Score"].notna().all())
+
+
+def refresh_warehouse_seasons(
+    fbref, warehouse_dir, season_name_list, league_id, league_name
+):
+    """Function used to bring the warehouse up to date for a competition.
+
+    Complete seasons are skipped without any request. Other seasons have their
+    stats and fixtures pages fetched, and are only parsed, cleaned and written
+    again when the content hash of a page has changed.
+
+    Args:
+        fbref (FBref): FBref instance used to fetch pages
+        warehouse_dir (str): root folder of the warehouse
+        season_name_list (list): seasons to refresh e.g ["2021_2022"]
+        league_id (int): FBref id of the competition
+        league_name (str): FBref name of the competition
+
+    Returns:
+        season_status_dict (dict): complete, unchanged or updated per season
+    """
+    season_status_dict = {}
+    for season_name in season_name_list:
+        metadata = load_season_metadata(warehouse_dir, league_name, season_name)
+        if metadata is not None and metadata["complete"]:
+            season_status_dict[season_name] = "complete"
+            continue
+
+        stats_html = fbref.get_page_html(
+            fbref.get_league_stats_url(season_name, league_id, league_name),
+            season_name,
+        )
+        fixtures_html = fbref.get_page_html(
+            fbref.get_fixtures_url(season_name, league_id, league_name),
+            season_name,
+        )
+        page_hash_dict = {
+            "stats_page_hash": get_content_hash(stats_html),
+            "fixtures_page_hash": get_content_hash(fixtures_html),
+        }
+
+        if metadata is not None and all(
+            metadata.get(hash_name) == page_hash
+            for hash_name, page_hash in page_hash_dict.items()
+        ):
+            metadata["complete"] = is_completed_season(
+                season_name, SEASON_END_MONTH
+            )
+            season_status_dict[season_name] = "unchanged"
+        else:
+            season_dict = {
+                "data": fbref.get_team_season_data(
+                    season_name, league_id, league_name, html=stats_html
+                ),
+                "fixtures": fbref.get_fixtures_season_data(
+                    season_name, league_id, league_name, html=fixtures_html
+                ),
+            }
+            write_season_dict(
+                season_dict, warehouse_dir, league_name, season_name
+            )
+            metadata = dict(
+                page_hash_dict,
+                complete=is_season_complete(
+                    season_dict["fixtures"], season_name
+                ),
+            )
+            season_status_dict[season_name] = "updated"
+
+        metadata["checked_at"] = datetime.datetime.now().isoformat()
+        write_season_metadata(metadata, warehouse_dir, league_name, season_name)
+
+    return season_status_dict
@@ -0,0 +1,167 @@
+"""Script used to build season comparison dfs lazily, only for the data
+categories that are read"""
+
+import threading
+from collections.abc import Mapping
+
+from src.etl.clean import get_team_category_dtype, get_column_projection
+from src.etl.fetch import clean_category_df, concat_category_seasons
+
+DATA_TYPE_LIST = ["team_data", "opponent_data"]
+
+
+class SeasonComparison(Mapping):
+    """Class used in place of the season_comparison_dict. Each (side, data
+    category) df is built the first time it is accessed and kept, so
+    comparisons only pay for the categories they read.
+
+        season_comparison = SeasonComparison(seasons_dict)
+        attacking_df = season_comparison["team_data"]["attacking"]
+
+    The cleaned table of every (side, data category, season) is kept too, so
+    add_seasons only cleans the new seasons and rebuilds a category df the
+    next time it is read.
+
+    Args:
+        seasons_dict (dict): Dictionary of data from fbref for multiple seasons
+        data_category_list (list, optional): data categories to compare.
+        cleaned_table_cache (CleanedTableCache, optional): cache of cleaned
+                                                           tables shared with
+                                                           other comparisons.
+                                                           Defaults to None.
+        columns (str or dict, optional): projection to clean and keep, as in
+                                         get_seasons_comparison_dict.
+                                         Defaults to None.
+    """
+
+    def __init__(
+        self,
+        seasons_dict,
+        data_category_list=[
+            "attacking",
+            "defense",
+            "passing",
+            "goalkeeping",
+            "playing_time",
+        ],
+        cleaned_table_cache=None,
+        columns=None,
+    ):
+        self.seasons_dict = dict(seasons_dict)
+        self.data_category_list = list(data_category_list)
+        self.cleaned_table_cache = cleaned_table_cache
+        self.columns_dict = get_column_projection(columns) or {}
+        self._team_dtype = None
+        self._cleaned_df_dict = {}
+        self._comparison_df_dict = {}
+        self._lock = threading.RLock()
+        self._side_dict = {
+            data_type: SideComparison(self, data_type)
+            for data_type in DATA_TYPE_LIST
+        }
+
+    def __getitem__(self, data_type):
+        return self._side_dict[data_type]
+
+    def __iter__(self):
+        return iter(DATA_TYPE_LIST)
+
+    def __len__(self):
+        return len(DATA_TYPE_LIST)
+
+    @property
+    def team_dtype(self):
+        """Squad dtype shared by every category and side"""
+        with self._lock:
+            if self._team_dtype is None:
+                self._team_dtype = get_team_category_dtype(self.seasons_dict)
+            return self._team_dtype
+
+    def get_comparison_df(self, data_type, data_category):
+        """Function used to grab the comparison df of a side and data
+        category, building it on first access"""
+        if data_type not in DATA_TYPE_LIST:
+            raise KeyError(data_type)
+        if data_category not in self.data_category_list:
+            raise KeyError(data_category)
+
+        with self._lock:
+            if (data_type, data_category) not in self._comparison_df_dict:
+                cleaned_df_dict = {
+                    season_name: self._get_cleaned_df(
+                        data_type, data_category, season_name
+                    )
+                    for season_name in self.seasons_dict
+                }
+                self._comparison_df_dict[(data_type, data_category)] = (
+                    concat_category_seasons(cleaned_df_dict, self.team_dtype)
+                )
+            return self._comparison_df_dict[(data_type, data_category)]
+
+    def _get_cleaned_df(self, data_type, data_category, season_name):
+        """Function used to grab the cleaned table of a season, cleaning it on
+        first access"""
+        key = (data_type, data_category, season_name)
+        if key not in self._cleaned_df_dict:
+            self._cleaned_df_dict[key] = clean_category_df(
+                self.seasons_dict[season_name]["data"][data_type][
+                    data_category
+                ],
+                data_category,
+                self.cleaned_table_cache,
+                self.columns_dict.get(data_category),
+            )
+        return self._cleaned_df_dict[key]
+
+    def add_seasons(self, seasons_dict):
+        """Function used to add seasons, or replace seasons of the same name.
+
+        Cleaned tables of the other seasons are kept while every category df
+        is dropped, as they all gain rows, and rebuilt when next read.
+        """
+        with self._lock:
+            for season_name, season_dict in seasons_dict.items():
+                self.seasons_dict[season_name] = season_dict
+                for data_type in DATA_TYPE_LIST:
+                    for data_category in self.data_category_list:
+                        self._cleaned_df_dict.pop(
+                            (data_type, data_category, season_name), None
+                        )
+            self._comparison_df_dict.clear()
+            self._team_dtype = None
+
+    def get_built_keys(self):
+        """Function used to list the (side, data category) dfs built so far"""
+        with self._lock:
+            return list(self._comparison_df_dict)
+
+    def to_dict(self):
+        """Function used to build every category df into the same dict as
+        get_seasons_comparison_dict"""
+        return {
+            data_type: dict(side_comparison)
+            for data_type, side_comparison in self.items()
+        }
+
+
+class SideComparison(Mapping):
+    """Class used for the team_data or opponent_data side of a
+    SeasonComparison, mapping data categories to their comparison df"""
+
+    def __init__(self, season_comparison, data_type):
+        self.season_comparison = season_comparison
+        self.data_type = data_type
+
+    def __getitem__(self, data_category):
+        return self.season_comparison.get_comparison_df(
+            self.data_type, data_category
+        )
+
+    def __contains__(self, data_category):
+        return data_category in self.season_comparison.data_category_list
+
+    def __iter__(self):
+        return iter(self.season_comparison.data_category_list)
+
+    def __len__(self):
+        return len(self.season_comparison.data_category_list)
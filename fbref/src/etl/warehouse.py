@@ -0,0 +1,549 @@
+"""Script used to store fetched and cleaned fbref data in a Parquet warehouse.
+
+Tables are written to a folder per partition:
+    {warehouse_dir}/{layer}/league={league}/season={season}/category={category}/side={side}/data.parquet
+
+where layer is raw or cleaned and side is team or opponent. Loaders build the
+partition paths they need so only those files, and the requested columns, are
+read.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from src.etl.clean import (
+    clean_fixtures_df,
+    clean_league_table_df,
+    clean_attacking_table_df,
+    clean_defense_table_df,
+    clean_passing_table_df,
+    clean_goalkeeping_table_df,
+    clean_playing_time_table_df,
+    downcast_numeric_columns,
+    get_column_projection,
+)
+
+DATA_CATEGORY_LIST = [
+    "attacking",
+    "defense",
+    "passing",
+    "goalkeeping",
+    "playing_time",
+]
+
+# warehouse side partition for each seasons_dict data type
+SIDE_DICT = {
+    "team_data": "team",
+    "opponent_data": "opponent",
+}
+
+CLEANING_FUNCTION_DICT = {
+    "attacking": clean_attacking_table_df,
+    "defense": clean_defense_table_df,
+    "passing": clean_passing_table_df,
+    "goalkeeping": clean_goalkeeping_table_df,
+    "playing_time": clean_playing_time_table_df,
+}
+
+
+def get_partition_path(
+    warehouse_dir, layer, league_name, season_name, category, side="team"
+):
+    """Function used to get the file of a partition in the warehouse"""
+    return (
+        Path(warehouse_dir)
+        / layer
+        / f"league={league_name}"
+        / f"season={season_name}"
+        / f"category={category}"
+        / f"side={side}"
+        / "data.parquet"
+    )
+
+
+def write_table_df(
+    table_df,
+    warehouse_dir,
+    layer,
+    league_name,
+    season_name,
+    category,
+    side="team",
+):
+    """Function used to write a table to its partition. The file is written
+    next to the partition first and then moved in place so readers never see
+    half written files."""
+    partition_path = get_partition_path(
+        warehouse_dir, layer, league_name, season_name, category, side
+    )
+    partition_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = partition_path.with_name(
+        f".{partition_path.name}.{os.getpid()}.tmp"
+    )
+    table_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, partition_path)
+    return partition_path
+
+
+def load_table_df(
+    warehouse_dir,
+    layer,
+    league_name,
+    season_name,
+    category,
+    side="team",
+    columns=None,
+):
+    """Function used to read a table from its partition.
+
+    Args:
+        warehouse_dir (str): root folder of the warehouse
+        layer (str): raw or cleaned
+        league_name (str): FBref name of the competition
+        season_name (str): season e.g 2021_2022
+        category (str): data category e.g attacking, league_table, fixtures
+        side (str, optional): team or opponent. Defaults to "team".
+        columns (list, optional): columns to read. Defaults to None which reads
+                                  every column.
+
+    Returns:
+        table_df (pandas.DataFrame): stored table
+    """
+    partition_path = get_partition_path(
+        warehouse_dir, layer, league_name, season_name, category, side
+    )
+    return pd.read_parquet(partition_path, columns=columns)
+
+
+def clean_season_data_dict(data_dict, columns=None):
+    """Function used to clean the league table and team and opponent tables
+    of a season, the tables coming from the league stats page.
+
+    Args:
+        data_dict (dict): data of a season from get_team_season_data
+        columns (str or dict, optional): projection the season was fetched
+                                         with e.g "comparison". Defaults to
+                                         None for full tables.
+
+    Returns:
+        cleaned_data_dict (dict): cleaned tables in the layout of data_dict
+    """
+    columns_dict = get_column_projection(columns) or {}
+    cleaned_data_dict = {
+        "league_table": clean_league_table_df(data_dict["league_table"])
+    }
+    for data_type in SIDE_DICT:
+        cleaned_data_dict[data_type] = {
+            data_category: CLEANING_FUNCTION_DICT[data_category](
+                category_df, columns_dict.get(data_category)
+            )
+            for data_category, category_df in data_dict[data_type].items()
+        }
+    return cleaned_data_dict
+
+
+def clean_season_dict(season_dict, columns=None):
+    """Function used to clean every table of a season from get_seasons_dict,
+    giving the cleaned tables in the layout of season_dict"""
+    return {
+        "data": clean_season_data_dict(season_dict["data"], columns),
+        "fixtures": clean_fixtures_df(season_dict["fixtures"]),
+    }
+
+
+def write_season_dict(
+    season_dict,
+    warehouse_dir,
+    league_name,
+    season_name,
+    cleaned=True,
+    columns=None,
+):
+    """Function used to write a season from get_seasons_dict to the warehouse.
+
+    Args:
+        season_dict (dict): data and fixtures of a season
+        warehouse_dir (str): root folder of the warehouse
+        league_name (str): FBref name of the competition
+        season_name (str): season e.g 2021_2022
+        cleaned (bool, optional): Whether to also write the cleaned tables.
+                                  Defaults to True.
+        columns (str or dict, optional): projection the season was fetched
+                                         with e.g "comparison". Defaults to
+                                         None for full tables.
+    """
+    write_season_data_dict(
+        season_dict["data"],
+        warehouse_dir,
+        league_name,
+        season_name,
+        cleaned,
+        columns,
+    )
+    write_season_fixtures_df(
+        season_dict["fixtures"],
+        warehouse_dir,
+        league_name,
+        season_name,
+        cleaned,
+    )
+
+
+def write_season_data_dict(
+    data_dict,
+    warehouse_dir,
+    league_name,
+    season_name,
+    cleaned=True,
+    columns=None,
+):
+    """Function used to write the league table and team and opponent tables
+    of a season, the tables coming from the league stats page. Tables
+    fetched with a projection, e.g columns="comparison", only hold the
+    columns that projection needs, so the same projection is cleaned and
+    written to the cleaned layer."""
+    # raw tables
+    write_table_df(
+        data_dict["league_table"],
+        warehouse_dir,
+        "raw",
+        league_name,
+        season_name,
+        "league_table",
+    )
+    for data_type, side in SIDE_DICT.items():
+        for data_category, category_df in data_dict[data_type].items():
+            write_table_df(
+                category_df,
+                warehouse_dir,
+                "raw",
+                league_name,
+                season_name,
+                data_category,
+                side,
+            )
+
+    if not cleaned:
+        return
+
+    # cleaned tables
+    cleaned_data_dict = clean_season_data_dict(data_dict, columns)
+    write_table_df(
+        cleaned_data_dict["league_table"],
+        warehouse_dir,
+        "cleaned",
+        league_name,
+        season_name,
+        "league_table",
+    )
+    for data_type, side in SIDE_DICT.items():
+        for data_category, cleaned_df in cleaned_data_dict[data_type].items():
+            write_table_df(
+                cleaned_df,
+                warehouse_dir,
+                "cleaned",
+                league_name,
+                season_name,
+                data_category,
+                side,
+            )
+
+
+def write_season_fixtures_df(
+    fixtures_df, warehouse_dir, league_name, season_name, cleaned=True
+):
+    """Function used to write the fixtures of a season, the table coming from
+    the fixtures page"""
+    write_table_df(
+        fixtures_df,
+        warehouse_dir,
+        "raw",
+        league_name,
+        season_name,
+        "fixtures",
+    )
+    if cleaned:
+        write_table_df(
+            clean_fixtures_df(fixtures_df),
+            warehouse_dir,
+            "cleaned",
+            league_name,
+            season_name,
+            "fixtures",
+        )
+
+
+def write_seasons_dict(
+    seasons_dict, warehouse_dir, league_name, cleaned=True, columns=None
+):
+    """Function used to write every season from get_seasons_dict to the
+    warehouse"""
+    write_season_stream(
+        seasons_dict.items(), warehouse_dir, league_name, cleaned, columns
+    )
+
+
+def write_season_stream(
+    season_items, warehouse_dir, league_name, cleaned=True, columns=None
+):
+    """Function used to write seasons to the warehouse as they are given e.g
+    by FBref.iter_seasons, so only one season is held in memory at a time.
+
+    Args:
+        season_items (iterable): (season_name, season_dict) pairs
+        warehouse_dir (str): root folder of the warehouse
+        league_name (str): FBref name of the competition
+        cleaned (bool, optional): Whether to also write the cleaned tables.
+                                  Defaults to True.
+        columns (str or dict, optional): projection the seasons were
+                                         fetched with e.g "comparison".
+                                         Defaults to None for full tables.
+
+    Returns:
+        season_name_list (list): seasons written
+    """
+    season_name_list = []
+    for season_name, season_dict in season_items:
+        write_season_dict(
+            season_dict,
+            warehouse_dir,
+            league_name,
+            season_name,
+            cleaned,
+            columns,
+        )
+        season_name_list.append(season_name)
+    return season_name_list
+
+
+def get_season_metadata_path(warehouse_dir, league_name, season_name):
+    """Function used to get the metadata file of a season in the warehouse"""
+    return (
+        Path(warehouse_dir)
+        / "raw"
+        / f"league={league_name}"
+        / f"season={season_name}"
+        / "_metadata.json"
+    )
+
+
+def load_season_metadata(warehouse_dir, league_name, season_name):
+    """Function used to read the stored metadata of a season, None if the
+    season has not been stored"""
+    metadata_path = get_season_metadata_path(
+        warehouse_dir, league_name, season_name
+    )
+    if not metadata_path.exists():
+        return None
+    with open(metadata_path, encoding="utf-8") as metadata_file:
+        return json.load(metadata_file)
+
+
+def write_season_metadata(metadata, warehouse_dir, league_name, season_name):
+    """Function used to store the metadata of a season e.g whether it is
+    complete and the content hash of its pages"""
+    metadata_path = get_season_metadata_path(
+        warehouse_dir, league_name, season_name
+    )
+    metadata_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = metadata_path.with_name(
+        f".{metadata_path.name}.{os.getpid()}.tmp"
+    )
+    with open(tmp_path, "w", encoding="utf-8") as metadata_file:
+        json.dump(metadata, metadata_file, indent=2)
+    os.replace(tmp_path, metadata_path)
+
+
+def get_warehouse_season_names(warehouse_dir, league_name, layer="raw"):
+    """Function used to list the seasons stored for a competition"""
+    league_dir = Path(warehouse_dir) / layer / f"league={league_name}"
+    if not league_dir.exists():
+        return []
+    return sorted(
+        season_dir.name.split("=", 1)[1]
+        for season_dir in league_dir.iterdir()
+        if season_dir.is_dir() and season_dir.name.startswith("season=")
+    )
+
+
+def load_seasons_dict(
+    warehouse_dir,
+    league_name,
+    season_name_list=None,
+    data_category_list=DATA_CATEGORY_LIST,
+):
+    """Function used to rebuild a seasons_dict from the raw tables in the
+    warehouse, so get_seasons_comparison_dict can run without fetching.
+
+    Args:
+        warehouse_dir (str): root folder of the warehouse
+        league_name (str): FBref name of the competition
+        season_name_list (list, optional): seasons to load. Defaults to None
+                                           which loads every stored season.
+        data_category_list (list, optional): data categories to load.
+
+    Returns:
+        seasons_dict (dict): data and fixtures for each season in the same
+                             format as FBref.get_seasons_dict
+    """
+    if season_name_list is None:
+        season_name_list = get_warehouse_season_names(
+            warehouse_dir, league_name
+        )
+
+    seasons_dict = {}
+    for season_name in season_name_list:
+        data_dict = {
+            "league_table": load_table_df(
+                warehouse_dir, "raw", league_name, season_name, "league_table"
+            )
+        }
+        for data_type, side in SIDE_DICT.items():
+            data_dict[data_type] = {
+                data_category: load_table_df(
+                    warehouse_dir,
+                    "raw",
+                    league_name,
+                    season_name,
+                    data_category,
+                    side,
+                )
+                for data_category in data_category_list
+            }
+        seasons_dict[season_name] = {
+            "data": data_dict,
+            "fixtures": load_table_df(
+                warehouse_dir, "raw", league_name, season_name, "fixtures"
+            ),
+        }
+    return seasons_dict
+
+
+def load_category_data_across_seasons(
+    warehouse_dir,
+    league_name,
+    data_category,
+    opponent_data=False,
+    season_name_list=None,
+    columns=None,
+    team_dtype=None,
+):
+    """Function used to read the cleaned tables of a data category across
+    seasons, in the same format as get_category_data_across_seasons.
+
+    Args:
+        warehouse_dir (str): root folder of the warehouse
+        league_name (str): FBref name of the competition
+        data_category (str): Type of data from fbref.
+        opponent_data (bool, optional): Whether we want opponent data. Defaults
+                                        to False.
+        season_name_list (list, optional): seasons to load. Defaults to None
+                                           which loads every stored season.
+        columns (list, optional): columns to read besides Squad. Defaults to
+                                  None which reads every column.
+        team_dtype (pandas.CategoricalDtype, optional): shared dtype for the
+                                                        Squad column. Defaults
+                                                        to None which builds
+                                                        one from the seasons
+                                                        read.
+
+    Returns:
+        seasons_df (pandas.DataFrame) : df for a certain data category in the
+                                        format to compare data across seasons.
+    """
+    if season_name_list is None:
+        season_name_list = get_warehouse_season_names(
+            warehouse_dir, league_name, layer="cleaned"
+        )
+    if columns is not None:
+        columns = ["Squad"] + [
+            column for column in columns if column != "Squad"
+        ]
+    side = SIDE_DICT["opponent_data" if opponent_data else "team_data"]
+
+    season_df_list = [
+        load_table_df(
+            warehouse_dir,
+            "cleaned",
+            league_name,
+            season_name,
+            data_category,
+            side,
+            columns=columns,
+        ).assign(season_name=season_name)
+        for season_name in season_name_list
+    ]
+    if team_dtype is None:
+        team_dtype = pd.CategoricalDtype(
+            sorted(
+                set().union(
+                    *(
+                        season_df["Squad"].dropna()
+                        for season_df in season_df_list
+                    )
+                )
+            )
+        )
+
+    seasons_df = pd.concat(
+        [
+            season_df.astype({"Squad": team_dtype})
+            for season_df in season_df_list
+        ]
+    )
+    seasons_df = downcast_numeric_columns(seasons_df)
+    # transpose data
+    seasons_df = seasons_df.set_index(["Squad", "season_name"])
+    # sort columns based by team
+    seasons_df = seasons_df.sort_index(axis=0)
+
+    return seasons_df
+
+
+def load_season_comparison_dict(
+    warehouse_dir,
+    league_name,
+    season_name_list=None,
+    data_category_list=DATA_CATEGORY_LIST,
+    columns_dict=None,
+):
+    """Function used to build the season_comparison_dict straight from the
+    cleaned tables in the warehouse, for use with
+    get_data_category_season_comparison_df.
+
+    Args:
+        warehouse_dir (str): root folder of the warehouse
+        league_name (str): FBref name of the competition
+        season_name_list (list, optional): seasons to load. Defaults to None
+                                           which loads every stored season.
+        data_category_list (list, optional): data categories to load.
+        columns_dict (dict, optional): columns to read for each data category.
+                                       Defaults to None which reads every
+                                       column.
+
+    Returns:
+        season_comparison_dict (dict): Dictionary of season data for data
+                                       categories from fbref.
+    """
+    if columns_dict is None:
+        columns_dict = {}
+
+    season_comparison_dict = {}
+    for data_type in SIDE_DICT:
+        season_comparison_dict[data_type] = {
+            data_category: load_category_data_across_seasons(
+                warehouse_dir,
+                league_name,
+                data_category,
+                opponent_data=data_type == "opponent_data",
+                season_name_list=season_name_list,
+                columns=columns_dict.get(data_category),
+            )
+            for data_category in data_category_list
+        }
+    return season_comparison_dict
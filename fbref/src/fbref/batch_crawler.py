@@ -0,0 +1,340 @@
+"""Script used to crawl many (league, season) jobs, fetching pages in threads
+and parsing them in a process pool.
+
+Fetching is network bound so a thread pool sends the requests, sharing the
+FBref rate limiter and response cache. Parsing and merging the tables is CPU
+bound so each season's pages are handed to a process pool as soon as they are
+downloaded, which lets fetching and parsing overlap and parsing use every
+core. Workers either send the parsed season back, along with its cleaned
+tables when clean is set, or, given a warehouse_dir, write the raw and
+cleaned tables to the Parquet warehouse and only send back where they were
+stored.
+
+Worker processes are started with forkserver, or spawn where it is not
+available, rather than fork: by the time the pool starts the fetch threads
+hold the rate limiter, session and response cache locks, and a forked child
+would inherit them locked.
+
+    crawler = BatchCrawler(FBref(cache=ResponseCache("fbref_cache.db")))
+    jobs = [CrawlJob(9, "Premier-League", "2021_2022"), ...]
+    for job_status in crawler.iter_crawl(jobs):
+        print(job_status.job, job_status.state, job_status.error)
+"""
+
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import pandas as pd
+
+from src.etl.backfill import (
+    PAGE_LIST,
+    get_unit_output_path,
+    is_unit_stored,
+)
+
+CrawlJob = namedtuple("CrawlJob", ["league_id", "league_name", "season_name"])
+
+
+class JobStatus:
+    """Class used to report the progress of a crawl job.
+
+    state goes from pending to fetching, parsing and then done or failed, or
+    is skipped when the journal records the job as stored.
+    season_dict holds the parsed season, and cleaned_season_dict its cleaned
+    tables when the crawler cleans, unless they were written to the
+    warehouse.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.state = "pending"
+        self.fetch_seconds = None
+        self.parse_seconds = None
+        self.html_bytes = None
+        self.error = None
+        self.season_dict = None
+        self.cleaned_season_dict = None
+        self.warehouse_dir = None
+
+    def to_dict(self):
+        """Function used to get the status without the parsed data"""
+        return {
+            "league_id": self.job.league_id,
+            "league_name": self.job.league_name,
+            "season_name": self.job.season_name,
+            "state": self.state,
+            "fetch_seconds": self.fetch_seconds,
+            "parse_seconds": self.parse_seconds,
+            "html_bytes": self.html_bytes,
+            "error": self.error,
+            "warehouse_dir": self.warehouse_dir,
+        }
+
+
+def fetch_season_pages(fbref, job):
+    """Function used to download the stats and fixtures pages of a job"""
+    start_time = time.perf_counter()
+    stats_html = fbref.get_page_html(
+        fbref.get_league_stats_url(
+            job.season_name, job.league_id, job.league_name
+        ),
+        job.season_name,
+    )
+    fixtures_html = fbref.get_page_html(
+        fbref.get_fixtures_url(job.season_name, job.league_id, job.league_name),
+        job.season_name,
+    )
+    return stats_html, fixtures_html, time.perf_counter() - start_time
+
+
+def get_parse_mp_context():
+    """Function used to get the start method of the parsing processes,
+    forkserver where available and spawn otherwise, as forking a process
+    that runs fetch threads can copy locks they hold"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def parse_season_pages(
+    job, stats_html, fixtures_html, warehouse_dir=None, clean=False
+):
+    """Function used in the worker processes to parse the pages of a job into
+    a season_dict, writing it to the warehouse when warehouse_dir is given
+    and otherwise cleaning it when clean is set.
+
+    Returns:
+        parse_result (tuple): season_dict and cleaned_season_dict, None when
+                              written to the warehouse or not cleaned, and
+                              the seconds taken
+    """
+    # imported in the worker so the parent does not need the parsing modules
+    from src.fbref.fbref_class import FBref
+    from src.etl.warehouse import clean_season_dict, write_season_dict
+
+    start_time = time.perf_counter()
+    fbref = FBref(league_page_cache_bytes=0)
+    season_dict = {
+        "data": fbref.get_team_season_data(
+            job.season_name, job.league_id, job.league_name, html=stats_html
+        ),
+        "fixtures": fbref.get_fixtures_season_data(
+            job.season_name, job.league_id, job.league_name, html=fixtures_html
+        ),
+    }
+    cleaned_season_dict = None
+    if warehouse_dir is not None:
+        write_season_dict(
+            season_dict, warehouse_dir, job.league_name, job.season_name
+        )
+        season_dict = None
+    elif clean:
+        cleaned_season_dict = clean_season_dict(season_dict)
+    return season_dict, cleaned_season_dict, time.perf_counter() - start_time
+
+
+class BatchCrawler:
+    """Class used to crawl (league, season) jobs with threads fetching pages
+    and a process pool parsing them.
+
+    Args:
+        fbref (FBref): instance used to fetch pages, its rate limiter keeps
+                       every fetch thread under the FBref rate limit
+        fetch_workers (int, optional): threads fetching pages. Defaults to 4.
+        parse_workers (int, optional): processes parsing pages. Defaults to
+                                       the number of cores.
+        warehouse_dir (str, optional): warehouse the workers write seasons to
+                                       instead of sending them back. Defaults
+                                       to None.
+        on_status (callable, optional): called with the JobStatus every time
+                                        a job changes state. Defaults to None.
+        journal (JobJournal, optional): journal recording finished jobs so a
+                                        restarted crawl skips them. Needs a
+                                        warehouse_dir to store the jobs in.
+                                        Defaults to None.
+        clean (bool, optional): Whether the workers also clean the seasons
+                                they send back, into
+                                JobStatus.cleaned_season_dict. Seasons
+                                written to a warehouse_dir are always
+                                cleaned. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        fbref,
+        fetch_workers=4,
+        parse_workers=None,
+        warehouse_dir=None,
+        on_status=None,
+        journal=None,
+        clean=False,
+    ):
+        if journal is not None and warehouse_dir is None:
+            raise ValueError("A journal needs a warehouse_dir to store jobs.")
+        self.fbref = fbref
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.warehouse_dir = warehouse_dir
+        self.on_status = on_status
+        self.journal = journal
+        self.clean = clean
+
+    def _set_state(self, job_status, state):
+        """Function used to update the state of a job and report it"""
+        job_status.state = state
+        if self.on_status is not None:
+            self.on_status(job_status)
+
+    def _is_job_stored(self, job):
+        """Function used to check whether the journal records both page units
+        of a job as stored"""
+        return self.journal is not None and all(
+            is_unit_stored(self.journal, job.league_name, job.season_name, page)
+            for page in PAGE_LIST
+        )
+
+    def _journal_job(self, job, state, error=None):
+        """Function used to record the state of both page units of a job"""
+        if self.journal is None:
+            return
+        for page in PAGE_LIST:
+            if state == "started":
+                self.journal.mark_started(
+                    job.league_name, job.season_name, page
+                )
+            elif state == "done":
+                self.journal.mark_done(
+                    job.league_name,
+                    job.season_name,
+                    page,
+                    get_unit_output_path(
+                        self.warehouse_dir,
+                        job.league_name,
+                        job.season_name,
+                        page,
+                    ),
+                )
+            else:
+                self.journal.mark_failed(
+                    job.league_name, job.season_name, page, error
+                )
+
+    def iter_crawl(self, jobs):
+        """Function used to crawl jobs, yielding each job's status as soon as
+        it is done or has failed. Jobs finish in any order.
+
+        Args:
+            jobs (list): CrawlJob or (league_id, league_name, season_name)
+                         tuples
+
+        Yields:
+            job_status (JobStatus): status of a finished job
+        """
+        job_status_list = [JobStatus(CrawlJob(*job)) for job in jobs]
+
+        with ThreadPoolExecutor(
+            max_workers=self.fetch_workers
+        ) as fetch_executor, ProcessPoolExecutor(
+            max_workers=self.parse_workers, mp_context=get_parse_mp_context()
+        ) as parse_executor:
+            futures_dict = {}
+            for job_status in job_status_list:
+                if self._is_job_stored(job_status.job):
+                    job_status.warehouse_dir = self.warehouse_dir
+                    self._set_state(job_status, "skipped")
+                    yield job_status
+                    continue
+
+                self._journal_job(job_status.job, "started")
+                futures_dict[
+                    fetch_executor.submit(
+                        fetch_season_pages, self.fbref, job_status.job
+                    )
+                ] = ("fetch", job_status)
+                self._set_state(job_status, "fetching")
+
+            while futures_dict:
+                done_futures, _ = wait(
+                    list(futures_dict), return_when=FIRST_COMPLETED
+                )
+                for future in done_futures:
+                    stage, job_status = futures_dict.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        job_status.error = f"{stage}: {error!r}"
+                        self._journal_job(
+                            job_status.job, "failed", job_status.error
+                        )
+                        self._set_state(job_status, "failed")
+                        yield job_status
+                        continue
+
+                    if stage == "fetch":
+                        stats_html, fixtures_html, fetch_seconds = result
+                        job_status.fetch_seconds = fetch_seconds
+                        job_status.html_bytes = len(stats_html) + len(
+                            fixtures_html
+                        )
+                        futures_dict[
+                            parse_executor.submit(
+                                parse_season_pages,
+                                job_status.job,
+                                stats_html,
+                                fixtures_html,
+                                self.warehouse_dir,
+                                self.clean,
+                            )
+                        ] = ("parse", job_status)
+                        self._set_state(job_status, "parsing")
+                    else:
+                        season_dict, cleaned_season_dict, parse_seconds = (
+                            result
+                        )
+                        job_status.season_dict = season_dict
+                        job_status.cleaned_season_dict = cleaned_season_dict
+                        job_status.parse_seconds = parse_seconds
+                        job_status.warehouse_dir = self.warehouse_dir
+                        self._journal_job(job_status.job, "done")
+                        self._set_state(job_status, "done")
+                        yield job_status
+
+    def crawl(self, jobs):
+        """Function used to crawl jobs and gather the parsed seasons.
+
+        Args:
+            jobs (list): CrawlJob or (league_id, league_name, season_name)
+                         tuples
+
+        Returns:
+            leagues_dict (dict): seasons_dict of each league name, empty when
+                                 the seasons were written to the warehouse
+            status_df (pandas.DataFrame): status of every job
+        """
+        leagues_dict = {}
+        status_list = []
+        for job_status in self.iter_crawl(jobs):
+            status_list.append(job_status.to_dict())
+            if job_status.season_dict is not None:
+                leagues_dict.setdefault(job_status.job.league_name, {})[
+                    job_status.job.season_name
+                ] = job_status.season_dict
+
+        # keep the season order of the jobs
+        job_order = [CrawlJob(*job) for job in jobs]
+        for league_name, seasons_dict in leagues_dict.items():
+            leagues_dict[league_name] = {
+                job.season_name: seasons_dict[job.season_name]
+                for job in job_order
+                if job.league_name == league_name
+                and job.season_name in seasons_dict
+            }
+        return leagues_dict, pd.DataFrame(status_list)
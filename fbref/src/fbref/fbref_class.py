@@ -1,83 +1,289 @@
 """Script used to help fetch data grabbed from FBref site"""
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-import numpy as np
+import requests
 
 from src.config.fbref_config import (
     LEAGUE_TABLE_COLUMNS,
+    FIXTURE_SCORE_COLUMNS,
+    FBREF_BASE_URL,
+    FBREF_REQUEST_HEADERS,
+    FBREF_CONNECT_TIMEOUT,
+    FBREF_REQUEST_TIMEOUT,
+    FBREF_POOL_MAXSIZE,
+    CURRENT_SEASON_CACHE_TTL_HOURS,
+    SEASON_END_MONTH,
+    FBREF_REQUESTS_PER_MINUTE,
+    FBREF_MAX_RETRIES,
+    FBREF_BACKOFF_SECONDS,
+    FBREF_MAX_BACKOFF_SECONDS,
+    LEAGUE_PAGE_CACHE_MAX_BYTES,
+    CLEANING_TABLE_SPECS,
 )
 
-from src.utility.functions import (
-    flatten_cols,
-    rename_unnamed_columns,
+from src.utility.functions import is_completed_season
+from src.utility.rate_limiter import (
+    RateLimiter,
+    RETRY_STATUS_CODES,
+    parse_retry_after,
+    get_backoff_delay,
+)
+from src.utility.lru_cache import ByteBoundedLRUCache
+from src.utility.http_session import create_session
+from src.utility.instrumentation import (
+    instrument_stage,
+    add_stage_metrics,
+)
+from src.fbref.league_page import (
+    LeagueTeamData,
+    get_projected_table,
+    get_table_column_names,
+)
+from src.fbref.table_join import (
+    get_column_source_dict,
+    get_join_projection_list,
+    join_tables,
+)
+from src.etl.clean import (
+    get_clean_column_name,
+    get_clean_input_columns,
+    get_column_projection,
+    get_fixture_scores_df,
+)
+from src.fbref.table_parser import (
+    find_tables,
+    parse_fbref_table,
 )
 
 
 class FBref:
-    """FBref class used to fetch data from FBref website"""
+    """FBref class used to fetch data from FBref website
+
+    Args:
+        cache (ResponseCache, optional): cache used to store fetched pages so
+                                         reruns do not hit the FBref site.
+                                         Defaults to None.
+        revalidate (bool, optional): Whether to send a conditional request for
+                                     expired cached pages instead of
+                                     downloading them again. Defaults to True.
+        rate_limiter (RateLimiter, optional): limiter shared by every request
+                                              sent to the FBref site. Defaults
+                                              to FBREF_REQUESTS_PER_MINUTE.
+        league_page_cache_bytes (int, optional): approximate memory allowed for
+                                                 parsed league pages kept on
+                                                 the instance. Defaults to
+                                                 LEAGUE_PAGE_CACHE_MAX_BYTES.
+        base_url (str, optional): site the pages are fetched from e.g a local
+                                  ReplayServer. Defaults to FBREF_BASE_URL.
+        recorder (SnapshotRecorder, optional): recorder used to save every
+                                               fetched page to a snapshot.
+                                               Defaults to None.
+        max_retries (int, optional): retries of a request answered with
+                                     429/5xx or failing to connect. Defaults
+                                     to FBREF_MAX_RETRIES.
+        session (requests.Session, optional): session requests are sent with.
+                                              Defaults to None which creates
+                                              a pooled keep-alive session
+                                              asking for compressed pages.
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        revalidate=True,
+        rate_limiter=None,
+        league_page_cache_bytes=LEAGUE_PAGE_CACHE_MAX_BYTES,
+        base_url=FBREF_BASE_URL,
+        recorder=None,
+        max_retries=FBREF_MAX_RETRIES,
+        session=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.cache = cache
+        self.revalidate = revalidate
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(FBREF_REQUESTS_PER_MINUTE)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        if session is None:
+            session = create_session(
+                FBREF_REQUEST_HEADERS, pool_maxsize=FBREF_POOL_MAXSIZE
+            )
+        self.session = session
+        self.league_page_cache = ByteBoundedLRUCache(
+            league_page_cache_bytes, sizeof=lambda page: page.get_nbytes()
+        )
 
-    def get_fbref_league_team_data(self, season_name, league_id, league_name):
-        """Function used to grab league tables for a specific league e.g
-        Premier league"""
-        year1, year2 = season_name.split("_")
+    def close(self):
+        """Function used to close the connections of the session"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
 
-        league_data = pd.read_html(
-            f"https://fbref.com/en/comps/{league_id}/{year1}-{year2}/"
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_league_stats_url(self, season_name, league_id, league_name):
+        """Function used to create the url of a league's season stats page"""
+        year1, year2 = season_name.split("_")
+        return (
+            f"{self.base_url}/en/comps/{league_id}/{year1}-{year2}/"
             + f"{year1}-{year2}-{league_name}-Stats"
         )
 
-        for table in league_data:
-            if isinstance(table.columns, pd.MultiIndex):
-                table = flatten_cols(table)
-                table = rename_unnamed_columns(table)
-
-        league_team_dict = {}
-
-        league_team_dict["league_table"] = league_data[0]
-        league_team_dict["league_table_home_away"] = league_data[1]
-        league_team_dict["standard_stats"] = league_data[2]
-        league_team_dict["standard_stats_opp"] = league_data[3]
-        league_team_dict["goalkeeping"] = league_data[4]
-        league_team_dict["goalkeeping_opp"] = league_data[5]
-        league_team_dict["ad_goalkeeping"] = league_data[6]
-        league_team_dict["ad_goalkeeping_opp"] = league_data[7]
-        league_team_dict["shooting"] = league_data[8]
-        league_team_dict["shooting_opp"] = league_data[9]
-        league_team_dict["passing"] = league_data[10]
-        league_team_dict["passing_opp"] = league_data[11]
-        league_team_dict["pass_types"] = league_data[12]
-        league_team_dict["pass_types_opp"] = league_data[13]
-        league_team_dict["goal_shot_creation"] = league_data[14]
-        league_team_dict["goal_shot_creation_opp"] = league_data[15]
-        league_team_dict["defensive_action"] = league_data[16]
-        league_team_dict["defensive_action_opp"] = league_data[17]
-        league_team_dict["possession"] = league_data[18]
-        league_team_dict["possession_opp"] = league_data[19]
-        league_team_dict["playing_time"] = league_data[20]
-        league_team_dict["playing_time_opp"] = league_data[21]
-        league_team_dict["miscellaneous"] = league_data[22]
-        league_team_dict["miscellaneous_opp"] = league_data[23]
+    def get_fixtures_url(self, season_name, league_id, league_name):
+        """Function used to create the url of a league's season fixtures page"""
+        year1, year2 = season_name.split("_")
+        return (
+            f"{self.base_url}/en/comps/{league_id}/{year1}-{year2}/schedule/"
+            + f"{year1}-{year2}-{league_name}-Scores-and-Fixtures"
+        )
+
+    def get_page_ttl(self, season_name):
+        """Function used to get how long a season's page can be cached for.
+        Pages of completed seasons never expire."""
+        if is_completed_season(season_name, SEASON_END_MONTH):
+            return None
+        return CURRENT_SEASON_CACHE_TTL_HOURS * 60 * 60
+
+    @instrument_stage("fetch_page")
+    def get_page_html(self, url, season_name):
+        """Function used to grab the html of an FBref page, using the response
+        cache when one has been set and saving the page to the snapshot when
+        a recorder has been set"""
+        html = self._get_page_html(url, season_name)
+        if self.recorder is not None:
+            self.recorder.record(url, html)
+        return html
+
+    def _get_page_html(self, url, season_name):
+        """Function used to grab the html of an FBref page from the response
+        cache or the site"""
+        if self.cache is None:
+            response = self._request_page(url)
+            response.raise_for_status()
+            return response.text
+
+        cached_response = self.cache.get(url)
+        if cached_response is not None and not cached_response.is_expired():
+            return cached_response.body
+
+        ttl = self.get_page_ttl(season_name)
+        headers = {}
+        if cached_response is not None and self.revalidate:
+            headers = cached_response.get_validator_headers()
+
+        response = self._request_page(url, headers=headers)
+        if response.status_code == 304 and cached_response is not None:
+            self.cache.refresh(url, ttl=ttl)
+            return cached_response.body
+        response.raise_for_status()
+
+        self.cache.set(
+            url,
+            response.text,
+            ttl=ttl,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return response.text
+
+    @instrument_stage("http_request")
+    def _request_page(self, url, headers=None):
+        """Function used to send a request to the FBref site through the rate
+        limiter. Requests answered with 429/5xx or failing to connect are
+        retried after Retry-After or an exponential backoff with jitter, and
+        the limiter slows down every thread sharing it."""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self.session.get(
+                    url,
+                    headers=headers,
+                    timeout=(FBREF_CONNECT_TIMEOUT, FBREF_REQUEST_TIMEOUT),
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.rate_limiter.backoff(self.get_retry_delay(attempt))
+                continue
+
+            add_stage_metrics(bytes_downloaded=len(response.content))
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == self.max_retries
+            ):
+                break
+            self.rate_limiter.backoff(
+                self.get_retry_delay(
+                    attempt, response.headers.get("Retry-After")
+                )
+            )
+
+        if response.status_code not in RETRY_STATUS_CODES:
+            self.rate_limiter.record_success()
+        return response
+
+    def get_retry_delay(self, attempt, retry_after=None):
+        """Function used to get the seconds to wait before retrying a request,
+        the Retry-After header when the site sent one"""
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = get_backoff_delay(
+                attempt, FBREF_BACKOFF_SECONDS, FBREF_MAX_BACKOFF_SECONDS
+            )
+        return delay
+
+    @instrument_stage("parse_league_page")
+    def get_fbref_league_team_data(
+        self, season_name, league_id, league_name, html=None
+    ):
+        """Function used to grab league tables for a specific league e.g
+        Premier league. Tables are parsed the first time they are accessed and
+        parsed pages are kept on the instance for the other get_* methods.
+        Passing html parses an already downloaded page."""
+        page_key = (season_name, league_id, league_name)
+        if html is None:
+            league_team_dict = self.league_page_cache.get(page_key)
+            if league_team_dict is not None:
+                return league_team_dict
+
+            url = self.get_league_stats_url(season_name, league_id, league_name)
+            html = self.get_page_html(url, season_name)
+
+        league_team_dict = LeagueTeamData(html)
+        self.league_page_cache.put(
+            page_key, league_team_dict, ttl=self.get_page_ttl(season_name)
+        )
 
         return league_team_dict
 
+    def get_league_page_cache_stats(self):
+        """Function used to grab hit/miss counters and memory used by the
+        parsed league pages kept on the instance"""
+        return self.league_page_cache.get_stats()
+
+    @instrument_stage("parse_fixtures_page")
     def get_fbref_fixtures_and_results(
-        self, season_name, league_id, league_name
+        self, season_name, league_id, league_name, html=None
     ):
         """Function used to grab fixtures and results table for a specific
-        league e.g Premier league"""
-        year1, year2 = season_name.split("_")
-
-        fixtures_data = pd.read_html(
-            f"https://fbref.com/en/comps/{league_id}/{year1}-{year2}/schedule/"
-            + f"{year1}-{year2}-{league_name}-Scores-and-Fixtures"
-        )
-        fixtures_df = fixtures_data[0]
-
-        fixtures_df["home_score"] = fixtures_df["Score"].apply(
-            lambda x: x.split("–")[0] if isinstance(x, str) else np.nan
-        )
-        fixtures_df["away_score"] = fixtures_df["Score"].apply(
-            lambda x: x.split("–")[1] if isinstance(x, str) else np.nan
+        league e.g Premier league. Passing html parses an already downloaded
+        page."""
+        if html is None:
+            url = self.get_fixtures_url(season_name, league_id, league_name)
+            html = self.get_page_html(url, season_name)
+        fixtures_data = find_tables(html)
+        fixtures_df = parse_fbref_table(next(iter(fixtures_data.values())))
+        add_stage_metrics(tables_parsed=1)
+
+        fixtures_df[FIXTURE_SCORE_COLUMNS] = get_fixture_scores_df(
+            fixtures_df["Score"]
         )
         return fixtures_df
 
@@ -98,11 +304,75 @@ class FBref:
         league_table_home_away = league_team_dict["league_table_home_away"]
 
         # merge table
-        league_table_df = league_table.merge(
-            league_table_home_away, on=["Squad", "Rk"]
+        league_table_df = join_tables(
+            [league_table, league_table_home_away], [["Squad", "Rk"]]
         )[LEAGUE_TABLE_COLUMNS]
         return league_table_df
 
+    def join_league_tables(
+        self, league_team_dict, table_key_list, on_list, columns=None
+    ):
+        """Function used to join tables of a league page by squad.
+
+        Given columns, named as clean_fb_ref_column_names leaves them, only
+        the columns of each table needed for them are parsed and joined.
+
+        Args:
+            league_team_dict (dict): tables of a league stats page
+            table_key_list (list): keys of the tables to join
+            on_list (list): key columns of each merge
+            columns (collection, optional): columns of the joined table to
+                                            keep. Defaults to None which
+                                            keeps them all.
+
+        Returns:
+            joined_df (pandas.DataFrame): joined table
+        """
+        if columns is None:
+            return join_tables(
+                [league_team_dict[table_key] for table_key in table_key_list],
+                on_list,
+            )
+
+        column_names_list = [
+            get_table_column_names(league_team_dict, table_key)
+            for table_key in table_key_list
+        ]
+        column_source_dict, _ = get_column_source_dict(
+            column_names_list, on_list
+        )
+        if column_source_dict is None:
+            joined_df = join_tables(
+                [league_team_dict[table_key] for table_key in table_key_list],
+                on_list,
+            )
+            return joined_df[
+                [
+                    column
+                    for column in joined_df.columns
+                    if get_clean_column_name(column) in columns
+                ]
+            ]
+
+        output_columns = [
+            column
+            for column in column_source_dict
+            if get_clean_column_name(column) in columns
+        ]
+        projection_list = get_join_projection_list(
+            column_names_list, on_list, output_columns
+        )
+        return join_tables(
+            [
+                get_projected_table(league_team_dict, table_key, projection)
+                for table_key, projection in zip(
+                    table_key_list, projection_list
+                )
+            ],
+            on_list,
+            columns=output_columns,
+        )
+
     def get_passing_table(
         self,
         season_name,
@@ -110,8 +380,9 @@ class FBref:
         league_name,
         league_team_dict=None,
         opponent=False,
+        columns=None,
     ):
-        """Function used to grab passing data"""
+        """Function used to grab passing data, only the columns given if any"""
         # fetch league data
         if league_team_dict is None:
             league_team_dict = self.get_fbref_league_team_data(
@@ -126,13 +397,16 @@ class FBref:
             opponent_data = ""
 
         # grab passing data table
-        passing = league_team_dict[f"passing{opponent_data}"]
-        pass_types = league_team_dict[f"pass_types{opponent_data}"]
-        possession = league_team_dict[f"possession{opponent_data}"]
-
-        passing_table_df = passing.merge(
-            pass_types, on=["Squad", "# Pl", "90s"]
-        ).merge(possession, on=["Squad", "# Pl", "90s"])
+        passing_table_df = self.join_league_tables(
+            league_team_dict,
+            [
+                f"passing{opponent_data}",
+                f"pass_types{opponent_data}",
+                f"possession{opponent_data}",
+            ],
+            [["Squad", "# Pl", "90s"], ["Squad", "# Pl", "90s"]],
+            columns,
+        )
         return passing_table_df
 
     def get_goalkeeping_table(
@@ -142,8 +416,10 @@ class FBref:
         league_name,
         league_team_dict=None,
         opponent=False,
+        columns=None,
     ):
-        """Function used to grab goalkeeping data"""
+        """Function used to grab goalkeeping data, only the columns given if
+        any"""
         # fetch league data
         if league_team_dict is None:
             league_team_dict = self.get_fbref_league_team_data(
@@ -158,10 +434,15 @@ class FBref:
             opponent_data = ""
 
         # grab passing data table
-        goalkeeping = league_team_dict[f"goalkeeping{opponent_data}"]
-        ad_goalkeeping = league_team_dict[f"ad_goalkeeping{opponent_data}"]
-
-        goalkeeping_df = goalkeeping.merge(ad_goalkeeping, on=["Squad", "# Pl"])
+        goalkeeping_df = self.join_league_tables(
+            league_team_dict,
+            [
+                f"goalkeeping{opponent_data}",
+                f"ad_goalkeeping{opponent_data}",
+            ],
+            [["Squad", "# Pl"]],
+            columns,
+        )
 
         return goalkeeping_df
 
@@ -172,8 +453,10 @@ class FBref:
         league_name,
         league_team_dict=None,
         opponent=False,
+        columns=None,
     ):
-        """Function used to grab attacking data"""
+        """Function used to grab attacking data, only the columns given if
+        any"""
         # fetch league data
         if league_team_dict is None:
             league_team_dict = self.get_fbref_league_team_data(
@@ -187,15 +470,16 @@ class FBref:
         else:
             opponent_data = ""
 
-        standard_stats = league_team_dict[f"standard_stats{opponent_data}"]
-        shooting = league_team_dict[f"shooting{opponent_data}"]
-        goal_shot_creation = league_team_dict[
-            f"goal_shot_creation{opponent_data}"
-        ]
-
-        attacking_table = standard_stats.merge(
-            shooting, on=["Squad", "# Pl"]
-        ).merge(goal_shot_creation, on=["Squad", "# Pl", "90s"])
+        attacking_table = self.join_league_tables(
+            league_team_dict,
+            [
+                f"standard_stats{opponent_data}",
+                f"shooting{opponent_data}",
+                f"goal_shot_creation{opponent_data}",
+            ],
+            [["Squad", "# Pl"], ["Squad", "# Pl", "90s"]],
+            columns,
+        )
 
         return attacking_table
 
@@ -206,8 +490,10 @@ class FBref:
         league_name,
         league_team_dict=None,
         opponent=False,
+        columns=None,
     ):
-        """Function used to grab defensive data"""
+        """Function used to grab defensive data, only the columns given if
+        any"""
         # fetch league data
         if league_team_dict is None:
             league_team_dict = self.get_fbref_league_team_data(
@@ -222,11 +508,14 @@ class FBref:
             opponent_data = ""
 
         # grab passing data table
-        defensive_action = league_team_dict[f"defensive_action{opponent_data}"]
-        miscellaneous = league_team_dict[f"miscellaneous{opponent_data}"]
-
-        defensive_table = defensive_action.merge(
-            miscellaneous, on=["Squad", "# Pl", "90s"]
+        defensive_table = self.join_league_tables(
+            league_team_dict,
+            [
+                f"defensive_action{opponent_data}",
+                f"miscellaneous{opponent_data}",
+            ],
+            [["Squad", "# Pl", "90s"]],
+            columns,
         )
 
         return defensive_table
@@ -238,8 +527,10 @@ class FBref:
         league_name,
         league_team_dict=None,
         opponent=False,
+        columns=None,
     ):
-        """Function used to grabbing playing time table"""
+        """Function used to grabbing playing time table, only the columns
+        given if any"""
         # fetch league data
         if league_team_dict is None:
             league_team_dict = self.get_fbref_league_team_data(
@@ -253,14 +544,30 @@ class FBref:
         else:
             opponent_data = ""
 
-        playing_time_df = league_team_dict[f"playing_time{opponent_data}"]
+        if columns is None:
+            playing_time_df = league_team_dict[f"playing_time{opponent_data}"]
+        else:
+            playing_time_df = self.join_league_tables(
+                league_team_dict, [f"playing_time{opponent_data}"], [], columns
+            )
 
         return playing_time_df
 
+    @instrument_stage("merge_team_data")
     def get_team_data_dict(
-        self, season_name, league_id, league_name, league_team_dict=None
+        self,
+        season_name,
+        league_id,
+        league_name,
+        league_team_dict=None,
+        columns=None,
     ):
-        """Function used to grab all team data for an example season"""
+        """Function used to grab all team data for an example season.
+
+        Given a projection in columns, e.g "comparison", only the columns the
+        cleaned columns of each data category are worked out from are parsed
+        and joined.
+        """
         # fetch league data
         if league_team_dict is None:
             league_team_dict = self.get_fbref_league_team_data(
@@ -272,6 +579,16 @@ class FBref:
         team_data_dict = {}
         opponent_data_dict = {}
 
+        # columns of each category table the projection is cleaned from
+        input_columns_dict = {
+            data_category: get_clean_input_columns(
+                CLEANING_TABLE_SPECS[data_category], category_columns
+            )
+            for data_category, category_columns in (
+                get_column_projection(columns) or {}
+            ).items()
+        }
+
         # league table
         league_table_df = self.get_league_table(
             season_name,
@@ -287,6 +604,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=False,
+            columns=input_columns_dict.get("attacking"),
         )
         team_data_dict["defense"] = self.get_defensive_table(
             season_name,
@@ -294,6 +612,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=False,
+            columns=input_columns_dict.get("defense"),
         )
         team_data_dict["passing"] = self.get_passing_table(
             season_name,
@@ -301,6 +620,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=False,
+            columns=input_columns_dict.get("passing"),
         )
         team_data_dict["goalkeeping"] = self.get_goalkeeping_table(
             season_name,
@@ -308,6 +628,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=False,
+            columns=input_columns_dict.get("goalkeeping"),
         )
         team_data_dict["playing_time"] = self.get_playing_time_table(
             season_name,
@@ -315,6 +636,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=False,
+            columns=input_columns_dict.get("playing_time"),
         )
 
         # opponent data
@@ -324,6 +646,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=True,
+            columns=input_columns_dict.get("attacking"),
         )
         opponent_data_dict["defense"] = self.get_defensive_table(
             season_name,
@@ -331,6 +654,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=True,
+            columns=input_columns_dict.get("defense"),
         )
         opponent_data_dict["passing"] = self.get_passing_table(
             season_name,
@@ -338,6 +662,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=True,
+            columns=input_columns_dict.get("passing"),
         )
         opponent_data_dict["goalkeeping"] = self.get_goalkeeping_table(
             season_name,
@@ -345,6 +670,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=True,
+            columns=input_columns_dict.get("goalkeeping"),
         )
         opponent_data_dict["playing_time"] = self.get_playing_time_table(
             season_name,
@@ -352,6 +678,7 @@ class FBref:
             league_name,
             league_team_dict=league_team_dict,
             opponent=True,
+            columns=input_columns_dict.get("playing_time"),
         )
 
         season_dict = {
@@ -362,28 +689,189 @@ class FBref:
 
         return season_dict
 
-    def get_seasons_dict(self, season_name_list, league_id, league_name):
-        """Function used to get multiple seasons worth of data for a chosen competition"""
+    def get_team_season_data(
+        self, season_name, league_id, league_name, html=None, columns=None
+    ):
+        """Function used to grab the team data of a season, only the columns
+        of the projection given if any"""
+        league_team_dict = self.get_fbref_league_team_data(
+            season_name, league_id, league_name, html=html
+        )
+        return self.get_team_data_dict(
+            season_name, league_id, league_name, league_team_dict, columns
+        )
+
+    def get_fixtures_season_data(
+        self, season_name, league_id, league_name, html=None
+    ):
+        """Function used to grab the fixtures of a season"""
+        fixtures_df = self.get_fbref_fixtures_and_results(
+            season_name, league_id, league_name, html=html
+        )
+
+        # add season name
+        fixtures_df["season_name"] = season_name
+        return fixtures_df
+
+    @instrument_stage("get_seasons_dict")
+    def get_seasons_dict(
+        self,
+        season_name_list,
+        league_id,
+        league_name,
+        max_workers=1,
+        columns=None,
+    ):
+        """Function used to get multiple seasons worth of data for a chosen competition
+
+        Args:
+            season_name_list (list): seasons to fetch e.g ["2021_2022"]
+            league_id (int): FBref id of the competition
+            league_name (str): FBref name of the competition
+            max_workers (int, optional): Number of threads used to fetch the
+                                         stats and fixtures pages of the
+                                         seasons at the same time. Defaults
+                                         to 1 which fetches sequentially.
+            columns (str or dict, optional): projection e.g "comparison", or
+                                             cleaned columns of each data
+                                             category, the category tables
+                                             are narrowed to. Defaults to
+                                             None which keeps every column.
+
+        Returns:
+            seasons_dict (dict): data and fixtures for each season
+        """
+        if max_workers > 1:
+            return self._get_seasons_dict_concurrently(
+                season_name_list, league_id, league_name, max_workers, columns
+            )
+
         seasons_dict = {}
         for season_name in season_name_list:
-            season_dict = {}
-            # team season statistics
-            league_team_dict = self.get_fbref_league_team_data(
-                season_name, league_id, league_name
-            )
-            team_data_dict = self.get_team_data_dict(
-                season_name, league_id, league_name, league_team_dict
-            )
-            # fixtures and results
-            fixtures_df = self.get_fbref_fixtures_and_results(
-                season_name, league_id, league_name
+            seasons_dict[season_name] = self.get_season_dict(
+                season_name, league_id, league_name, columns
             )
+        return seasons_dict
 
-            # add season name
-            fixtures_df["season_name"] = season_name
-
-            season_dict["data"] = team_data_dict
-            season_dict["fixtures"] = fixtures_df
+    def get_season_dict(
+        self, season_name, league_id, league_name, columns=None
+    ):
+        """Function used to get the data and fixtures of a single season"""
+        season_dict = {}
+        # team season statistics
+        season_dict["data"] = self.get_team_season_data(
+            season_name, league_id, league_name, columns=columns
+        )
+        # fixtures and results
+        season_dict["fixtures"] = self.get_fixtures_season_data(
+            season_name, league_id, league_name
+        )
+        return season_dict
 
-            seasons_dict[season_name] = season_dict
+    def iter_seasons(
+        self,
+        season_name_list,
+        league_id,
+        league_name,
+        max_workers=1,
+        columns=None,
+    ):
+        """Function used to fetch seasons one at a time, yielding each season
+        as soon as it is ready so consumers such as
+        get_seasons_comparison_dict_from_stream or write_season_stream can
+        process it before the next seasons arrive.
+
+        Args:
+            season_name_list (list): seasons to fetch e.g ["2021_2022"]
+            league_id (int): FBref id of the competition
+            league_name (str): FBref name of the competition
+            max_workers (int, optional): Number of seasons fetched ahead in a
+                                         thread pool. At most max_workers
+                                         seasons are held waiting to be
+                                         consumed. Defaults to 1 which fetches
+                                         sequentially.
+            columns (str or dict, optional): projection the category tables
+                                             are narrowed to, as in
+                                             get_seasons_dict. Defaults to
+                                             None.
+
+        Yields:
+            season_item (tuple): season name and its data and fixtures in the
+                                 same format as a get_seasons_dict value
+        """
+        if max_workers <= 1:
+            for season_name in season_name_list:
+                yield season_name, self.get_season_dict(
+                    season_name, league_id, league_name, columns
+                )
+            return
+
+        season_name_iter = iter(season_name_list)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending_futures = deque()
+
+            def submit_next_season():
+                season_name = next(season_name_iter, None)
+                if season_name is not None:
+                    pending_futures.append(
+                        (
+                            season_name,
+                            executor.submit(
+                                self.get_season_dict,
+                                season_name,
+                                league_id,
+                                league_name,
+                                columns,
+                            ),
+                        )
+                    )
+
+            for _ in range(max_workers):
+                submit_next_season()
+
+            # yield in season order, fetching the next season meanwhile
+            while pending_futures:
+                season_name, season_future = pending_futures.popleft()
+                season_dict = season_future.result()
+                submit_next_season()
+                yield season_name, season_dict
+
+    def _get_seasons_dict_concurrently(
+        self,
+        season_name_list,
+        league_id,
+        league_name,
+        max_workers,
+        columns=None,
+    ):
+        """Function used to fetch the stats and fixtures pages of every season
+        in a thread pool. Requests are kept under the rate limit by the
+        limiter shared by all threads."""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures_dict = {
+                season_name: (
+                    executor.submit(
+                        self.get_team_season_data,
+                        season_name,
+                        league_id,
+                        league_name,
+                        columns=columns,
+                    ),
+                    executor.submit(
+                        self.get_fixtures_season_data,
+                        season_name,
+                        league_id,
+                        league_name,
+                    ),
+                )
+                for season_name in season_name_list
+            }
+
+            seasons_dict = {}
+            for season_name, season_futures in futures_dict.items():
+                data_future, fixtures_future = season_futures
+                seasons_dict[season_name] = {
+                    "data": data_future.result(),
+                    "fixtures": fixtures_future.result(),
+                }
         return seasons_dict
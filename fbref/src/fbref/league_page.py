@@ -0,0 +1,128 @@
+"""Script used to lazily parse the tables of an FBref league stats page"""
+
+import re
+import threading
+from collections.abc import Mapping
+
+from src.config.fbref_config import LEAGUE_TEAM_TABLE_ID_PATTERNS
+from src.utility.instrumentation import add_stage_metrics
+from src.fbref.table_parser import (
+    find_tables,
+    get_column_names,
+    parse_fbref_table,
+)
+
+
+class LeagueTeamData(Mapping):
+    """Class used in place of the league_team_dict. Tables are found by their
+    html id and only parsed the first time their key is accessed.
+
+    Args:
+        html (str): html of a league's season stats page
+        table_id_patterns (dict, optional): regex of the html id for each table
+                                            key. Defaults to
+                                            LEAGUE_TEAM_TABLE_ID_PATTERNS.
+    """
+
+    def __init__(self, html, table_id_patterns=LEAGUE_TEAM_TABLE_ID_PATTERNS):
+        self.html_nbytes = len(html)
+        table_elements = find_tables(html)
+
+        # match table keys to the tables found on the page
+        self._table_elements = {}
+        for table_key, id_pattern in table_id_patterns.items():
+            for table_id, table in table_elements.items():
+                if re.search(id_pattern, table_id):
+                    self._table_elements[table_key] = table
+                    break
+
+        self._table_keys = list(self._table_elements)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, table_key):
+        with self._lock:
+            if table_key not in self._tables:
+                if table_key not in self._table_elements:
+                    raise KeyError(f"{table_key} table not found on page.")
+                self._tables[table_key] = parse_fbref_table(
+                    self._table_elements.pop(table_key)
+                )
+                add_stage_metrics(tables_parsed=1)
+            return self._tables[table_key]
+
+    def get_table(self, table_key, columns=None):
+        """Function used to grab a table with only the columns given. Unless
+        the full table has been parsed already only those columns are
+        parsed, and the narrow table is not kept."""
+        if columns is None:
+            return self[table_key]
+
+        with self._lock:
+            if table_key in self._tables:
+                table_df = self._tables[table_key]
+                return table_df[
+                    [column for column in table_df.columns if column in columns]
+                ]
+            if table_key not in self._table_elements:
+                raise KeyError(f"{table_key} table not found on page.")
+            table_element = self._table_elements[table_key]
+
+        table_df = parse_fbref_table(table_element, columns)
+        add_stage_metrics(tables_parsed=1)
+        return table_df
+
+    def get_column_names(self, table_key):
+        """Function used to grab the column names of a table, read from its
+        header when the table has not been parsed"""
+        with self._lock:
+            if table_key in self._tables:
+                return list(self._tables[table_key].columns)
+            if table_key not in self._table_elements:
+                raise KeyError(f"{table_key} table not found on page.")
+            return get_column_names(self._table_elements[table_key])
+
+    def __contains__(self, table_key):
+        return table_key in self._table_keys
+
+    def __iter__(self):
+        return iter(self._table_keys)
+
+    def __len__(self):
+        return len(self._table_keys)
+
+    def get_parsed_table_keys(self):
+        """Function used to get the keys of the tables parsed so far"""
+        return list(self._tables)
+
+    def get_nbytes(self):
+        """Function used to approximate the memory used by the page. The html
+        is counted while tables are still waiting to be parsed."""
+        nbytes = sum(
+            int(table.memory_usage(index=True, deep=True).sum())
+            for table in list(self._tables.values())
+        )
+        if self._table_elements:
+            nbytes += self.html_nbytes
+        return nbytes
+
+
+def get_table_column_names(league_team_dict, table_key):
+    """Function used to grab the column names of a table of a league_team_dict,
+    without parsing it when it is a LeagueTeamData"""
+    if isinstance(league_team_dict, LeagueTeamData):
+        return league_team_dict.get_column_names(table_key)
+    return list(league_team_dict[table_key].columns)
+
+
+def get_projected_table(league_team_dict, table_key, columns=None):
+    """Function used to grab a table of a league_team_dict with only the
+    columns given, only parsing those when it is a LeagueTeamData"""
+    if isinstance(league_team_dict, LeagueTeamData):
+        return league_team_dict.get_table(table_key, columns)
+    table_df = league_team_dict[table_key]
+    if columns is None:
+        return table_df
+    return table_df[
+        [column for column in table_df.columns if column in columns]
+    ]
@@ -0,0 +1,384 @@
+"""Script used to record FBref pages to a snapshot and replay them offline.
+
+A snapshot is a versioned folder of saved pages along with a manifest:
+    {snapshot_dir}/{version}/manifest.json
+    {snapshot_dir}/{version}/pages/en/comps/9/2021-2022/...-Stats.html
+
+SnapshotRecorder is passed to FBref to save the pages it fetches, and
+ReplayServer serves a snapshot over HTTP so FBref(base_url=server.base_url)
+runs without the FBref site, with optional latency and rate limiting.
+
+Record a snapshot from the fbref folder with e.g
+    python -m src.fbref.replay record snapshots/ v1 --league-id 9 \
+        --league-name Premier-League --season 2021_2022
+and replay it with
+    python -m src.fbref.replay serve snapshots/ v1 --port 8000 --latency 0.2
+"""
+
+import argparse
+import datetime
+import gzip
+import http.server
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from src.utility.response_cache import get_content_hash
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def get_snapshot_dir(snapshot_dir, version):
+    """Function used to get the folder of a snapshot version"""
+    return Path(snapshot_dir) / version
+
+
+def get_page_key(url):
+    """Function used to get the key of a page in a snapshot, the path of the
+    url so the same snapshot replays under any base url"""
+    return urlsplit(url).path.rstrip("/")
+
+
+def load_snapshot_manifest(snapshot_dir, version):
+    """Function used to read the manifest of a snapshot version.
+
+    Args:
+        snapshot_dir (str): root folder of the snapshots
+        version (str): snapshot version e.g v1
+
+    Returns:
+        manifest (dict): version, creation time and the saved pages keyed by
+                         url path
+    """
+    manifest_path = get_snapshot_dir(snapshot_dir, version) / MANIFEST_FILE_NAME
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+class SnapshotRecorder:
+    """Class used to save fetched FBref pages into a versioned snapshot.
+
+    Args:
+        snapshot_dir (str): root folder of the snapshots
+        version (str): snapshot version e.g v1. Pages recorded again under the
+                       same version replace the saved page.
+    """
+
+    def __init__(self, snapshot_dir, version):
+        self.version = version
+        self.version_dir = get_snapshot_dir(snapshot_dir, version)
+        self.manifest_path = self.version_dir / MANIFEST_FILE_NAME
+        self._lock = threading.Lock()
+
+        if self.manifest_path.exists():
+            self.manifest = load_snapshot_manifest(snapshot_dir, version)
+        else:
+            self.manifest = {
+                "version": version,
+                "created_at": datetime.datetime.now(
+                    datetime.timezone.utc
+                ).isoformat(),
+                "pages": {},
+            }
+
+    def record(self, url, html):
+        """Function used to save a page to the snapshot and add it to the
+        manifest"""
+        page_key = get_page_key(url)
+        page_file = f"pages{page_key}.html"
+        page_path = self.version_dir / page_file
+        page_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(page_path, html)
+
+        with self._lock:
+            self.manifest["pages"][page_key] = {
+                "url": url,
+                "file": page_file,
+                "content_hash": get_content_hash(html),
+                "recorded_at": datetime.datetime.now(
+                    datetime.timezone.utc
+                ).isoformat(),
+            }
+            write_file_atomically(
+                self.manifest_path, json.dumps(self.manifest, indent=2)
+            )
+
+
+def write_file_atomically(path, text):
+    """Function used to write a text file next to its path first and then move
+    it in place so readers never see half written files"""
+    tmp_path = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class ReplayServer:
+    """Class used to serve a snapshot over HTTP as a local stand-in for the
+    FBref site.
+
+    Pages are read into memory when the server starts. Responses carry the
+    page content hash as ETag so conditional requests get 304 responses, and
+    connections are kept alive so clients reusing connections can be
+    measured through stats["connections"].
+
+    Args:
+        snapshot_dir (str): root folder of the snapshots
+        version (str): snapshot version to serve
+        host (str, optional): Defaults to "127.0.0.1".
+        port (int, optional): Defaults to 0 which picks a free port.
+        latency (float, optional): seconds added to every response.
+                                   Defaults to 0.
+        latency_jitter (float, optional): maximum random seconds added on top
+                                          of latency. Defaults to 0.
+        max_requests_per_minute (int, optional): requests allowed in any
+                                                 minute before the server
+                                                 answers 429. Defaults to None
+                                                 which never rate limits.
+        retry_after (int, optional): Retry-After seconds sent with 429
+                                     responses. Defaults to 60.
+        seed (int, optional): seed for the latency jitter. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        snapshot_dir,
+        version,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        latency_jitter=0.0,
+        max_requests_per_minute=None,
+        retry_after=60,
+        seed=None,
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.max_requests_per_minute = max_requests_per_minute
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._request_times = deque()
+        self.stats = {
+            "requests": 0,
+            "pages": 0,
+            "not_modified": 0,
+            "rate_limited": 0,
+            "not_found": 0,
+            "connections": 0,
+        }
+        self._gzip_bodies = {}
+
+        version_dir = get_snapshot_dir(snapshot_dir, version)
+        manifest = load_snapshot_manifest(snapshot_dir, version)
+        self.pages = {
+            page_key: (
+                (version_dir / page["file"]).read_bytes(),
+                f'"{page["content_hash"]}"',
+            )
+            for page_key, page in manifest["pages"].items()
+        }
+
+        self._server = http.server.ThreadingHTTPServer(
+            (host, port), self._get_handler_class()
+        )
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """Url to pass to FBref as base_url"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Function used to start serving in a background thread"""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Function used to serve in the current thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        """Function used to stop the server"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, stat_name):
+        """Function used to increment one of the server counters"""
+        with self._lock:
+            self.stats[stat_name] += 1
+
+    def is_rate_limited(self):
+        """Function used to check whether a new request goes over
+        max_requests_per_minute, recording it if not"""
+        if self.max_requests_per_minute is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._request_times and now - self._request_times[0] >= 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.max_requests_per_minute:
+                return True
+            self._request_times.append(now)
+            return False
+
+    def get_gzip_body(self, page_key):
+        """Function used to get the gzipped body of a page, compressing it
+        the first time it is asked for"""
+        with self._lock:
+            gzip_body = self._gzip_bodies.get(page_key)
+            if gzip_body is None:
+                gzip_body = self._gzip_bodies[page_key] = gzip.compress(
+                    self.pages[page_key][0]
+                )
+            return gzip_body
+
+    def get_delay(self):
+        """Function used to get the latency of a response"""
+        if not self.latency_jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.latency_jitter)
+
+    def _get_handler_class(self):
+        """Function used to build the request handler bound to this server"""
+        replay_server = self
+
+        class ReplayRequestHandler(http.server.BaseHTTPRequestHandler):
+            """Class used to answer requests with pages from the snapshot,
+            keeping connections alive and gzipping pages when asked to"""
+
+            protocol_version = "HTTP/1.1"
+            # headers and body are separate writes, without this kept alive
+            # connections stall on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                replay_server._count("requests")
+                delay = replay_server.get_delay()
+                if delay:
+                    time.sleep(delay)
+
+                if replay_server.is_rate_limited():
+                    replay_server._count("rate_limited")
+                    self.send_response(429)
+                    self.send_header(
+                        "Retry-After", str(replay_server.retry_after)
+                    )
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                page = replay_server.pages.get(get_page_key(self.path))
+                if page is None:
+                    replay_server._count("not_found")
+                    self.send_error(404)
+                    return
+
+                body, etag = page
+                if self.headers.get("If-None-Match") == etag:
+                    replay_server._count("not_modified")
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                replay_server._count("pages")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = replay_server.get_gzip_body(get_page_key(self.path))
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def setup(self):
+                replay_server._count("connections")
+                super().setup()
+
+            def log_message(self, format, *args):
+                pass
+
+        return ReplayRequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record FBref pages to a snapshot or replay a snapshot"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("snapshot_dir")
+    record_parser.add_argument("version")
+    record_parser.add_argument("--league-id", required=True)
+    record_parser.add_argument("--league-name", required=True)
+    record_parser.add_argument(
+        "--season", action="append", required=True, help="e.g 2021_2022"
+    )
+
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("snapshot_dir")
+    serve_parser.add_argument("version")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--latency", type=float, default=0.0)
+    serve_parser.add_argument("--latency-jitter", type=float, default=0.0)
+    serve_parser.add_argument("--max-requests-per-minute", type=int)
+    serve_parser.add_argument("--retry-after", type=int, default=60)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        # imported here so serving does not need the FBref dependencies
+        from src.fbref.fbref_class import FBref
+
+        fbref = FBref(
+            recorder=SnapshotRecorder(args.snapshot_dir, args.version)
+        )
+        fbref.get_seasons_dict(args.season, args.league_id, args.league_name)
+        return
+
+    replay_server = ReplayServer(
+        args.snapshot_dir,
+        args.version,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        max_requests_per_minute=args.max_requests_per_minute,
+        retry_after=args.retry_after,
+    )
+    print(
+        f"Serving {len(replay_server.pages)} pages at {replay_server.base_url}"
+    )
+    replay_server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Script used to join the tables of a league stats page by squad.
+
+A category table, e.g attacking, is standard_stats merged with shooting and
+then goal_shot_creation. Chaining DataFrame.merge calls hashes the keys and
+copies every column of the growing table at each step. join_tables instead
+indexes each table by squad once, works out which row of every
+table lands in each output row and then takes the rows of every table and
+concatenates them in one go.
+
+The output is the same as the chained inner merges: rows in the order of the
+first table, key columns kept once, other columns shared by both sides of a
+merge suffixed with _x and _y and a fresh RangeIndex.
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+
+def merge_tables(table_list, on_list, suffixes=("_x", "_y"), columns=None):
+    """Function used to join tables with chained DataFrame.merge calls, used
+    when join_tables cannot match rows on a unique index"""
+    merged_df = functools.reduce(
+        lambda left, step: left.merge(step[0], on=step[1], suffixes=suffixes),
+        zip(table_list[1:], on_list),
+        table_list[0],
+    )
+    if columns is not None:
+        merged_df = merged_df[
+            [column for column in merged_df.columns if column in columns]
+        ]
+    return merged_df
+
+
+def is_equal_key(left_values, right_values):
+    """Function used to compare key values the way merge matches them, with
+    missing values matching each other"""
+    is_equal = left_values == right_values
+    if not is_equal.all():
+        is_equal |= pd.isna(left_values) & pd.isna(right_values)
+    return is_equal
+
+
+def get_column_source_dict(column_names_list, on_list, suffixes=("_x", "_y")):
+    """Function used to work out, from the column names of the tables alone,
+    the columns chained merges of the tables would give and where each one
+    comes from.
+
+    Args:
+        column_names_list (list): column names of each table
+        on_list (list): key columns of each merge
+        suffixes (tuple, optional): added to overlapping columns. Defaults to
+                                    ("_x", "_y").
+
+    Returns:
+        column_source_dict (dict): (table number, column) of each output
+                                   column in merge order, None when the
+                                   names cannot be joined without merge
+        key_source_list (list): (table number, column) of the left keys of
+                                each merge
+    """
+    # output column name -> (table number, column of that table)
+    column_source_dict = {
+        column: (0, column) for column in column_names_list[0]
+    }
+    key_source_list = []
+
+    for table_number, (column_names, on) in enumerate(
+        zip(column_names_list[1:], on_list), start=1
+    ):
+        on = [on] if isinstance(on, str) else list(on)
+        if any(
+            key not in column_source_dict or key not in column_names
+            for key in on
+        ):
+            return None, None
+        key_source_list.append([column_source_dict[key] for key in on])
+
+        # rename the columns both sides have
+        right_column_list = [
+            column for column in column_names if column not in on
+        ]
+        overlap_set = set(column_source_dict) & set(right_column_list)
+        if overlap_set:
+            column_source_dict = {
+                (
+                    f"{column}{suffixes[0]}"
+                    if column in overlap_set
+                    else column
+                ): source
+                for column, source in column_source_dict.items()
+            }
+        for column in right_column_list:
+            output_column = (
+                f"{column}{suffixes[1]}" if column in overlap_set else column
+            )
+            if output_column in column_source_dict:
+                return None, None
+            column_source_dict[output_column] = (table_number, column)
+    return column_source_dict, key_source_list
+
+
+def get_join_projection_list(
+    column_names_list, on_list, columns, suffixes=("_x", "_y")
+):
+    """Function used to get the columns each table needs for join_tables to
+    give the output columns asked for.
+
+    Besides the columns asked for, each table keeps its key columns and every
+    column another table of the join also has, so the _x and _y suffixes come
+    out the same as when joining the full tables.
+
+    Args:
+        column_names_list (list): column names of each full table
+        on_list (list): key columns of each merge
+        columns (list): output columns wanted, unknown columns are ignored
+        suffixes (tuple, optional): added to overlapping columns. Defaults to
+                                    ("_x", "_y").
+
+    Returns:
+        projection_list (list): columns to read from each table, None for
+                                every table when the join cannot be worked
+                                out from the names
+    """
+    column_source_dict, _ = get_column_source_dict(
+        column_names_list, on_list, suffixes
+    )
+    if column_source_dict is None:
+        return [None] * len(column_names_list)
+
+    key_set = {
+        key for on in on_list for key in ([on] if isinstance(on, str) else on)
+    }
+    name_count_dict = {}
+    for column_names in column_names_list:
+        for column in set(column_names):
+            name_count_dict[column] = name_count_dict.get(column, 0) + 1
+
+    needed_set = {
+        column_source_dict[column]
+        for column in columns
+        if column in column_source_dict
+    }
+    return [
+        [
+            column
+            for column in column_names
+            if column in key_set
+            or name_count_dict[column] > 1
+            or (table_number, column) in needed_set
+        ]
+        for table_number, column_names in enumerate(column_names_list)
+    ]
+
+
+def join_tables(table_list, on_list, suffixes=("_x", "_y"), columns=None):
+    """Function used to inner join tables on key columns e.g Squad, giving
+    the same dataframe as table_list[0].merge(table_list[1], on=on_list[0])
+    .merge(table_list[2], on=on_list[1]) and so on.
+
+    Falls back to the chained merges when a table repeats a key, as the rows
+    would multiply, or a key column is missing or has been suffixed.
+
+    Args:
+        table_list (list): dataframes to join, at least one
+        on_list (list): key columns of each merge, one list per table after
+                        the first
+        suffixes (tuple, optional): added to overlapping columns of the left
+                                    and right tables. Defaults to
+                                    ("_x", "_y").
+        columns (list, optional): output columns to keep, in merge order.
+                                  Defaults to None which keeps them all.
+
+    Returns:
+        joined_df (pandas.DataFrame): joined table
+    """
+    if len(on_list) != len(table_list) - 1:
+        raise ValueError("Need one list of key columns per merge.")
+
+    column_source_dict, key_source_list = get_column_source_dict(
+        [table.columns for table in table_list], on_list, suffixes
+    )
+    if column_source_dict is None or any(
+        table.columns.duplicated().any() for table in table_list
+    ):
+        return merge_tables(table_list, on_list, suffixes, columns)
+
+    position_list = [np.arange(len(table_list[0]))]
+    for table, on, key_sources in zip(table_list[1:], on_list, key_source_list):
+        on = [on] if isinstance(on, str) else list(on)
+
+        # match rows on the first key e.g Squad, then check the others
+        right_index = pd.Index(table[on[0]])
+        if not right_index.is_unique:
+            return merge_tables(table_list, on_list, suffixes, columns)
+
+        def get_left_values(key_number):
+            """Function used to grab a key of the rows joined so far"""
+            source_number, source_column = key_sources[key_number]
+            return table_list[source_number][source_column].array.take(
+                position_list[source_number]
+            )
+
+        right_positions = right_index.get_indexer(get_left_values(0))
+        is_matched = right_positions != -1
+        for key_number, key in enumerate(on[1:], start=1):
+            is_matched[is_matched] = is_equal_key(
+                get_left_values(key_number).to_numpy()[is_matched],
+                table[key].to_numpy().take(right_positions[is_matched]),
+            )
+        if not is_matched.all():
+            position_list = [
+                positions[is_matched] for positions in position_list
+            ]
+            right_positions = right_positions[is_matched]
+        position_list.append(right_positions)
+
+    if columns is not None:
+        column_source_dict = {
+            output_column: source
+            for output_column, source in column_source_dict.items()
+            if output_column in columns
+        }
+
+    # take the rows of each table once
+    taken_df_list = []
+    for table_number, table in enumerate(table_list):
+        column_dict = {
+            output_column: column
+            for output_column, (
+                source_number,
+                column,
+            ) in column_source_dict.items()
+            if source_number == table_number
+        }
+        if not column_dict:
+            continue
+        taken_df = table.iloc[
+            position_list[table_number],
+            table.columns.get_indexer(list(column_dict.values())),
+        ]
+        taken_df.columns = list(column_dict)
+        taken_df.index = pd.RangeIndex(len(taken_df))
+        taken_df_list.append(taken_df)
+
+    # columns are grouped by table in the order the merges would give
+    return pd.concat(taken_df_list, axis=1)
@@ -1,5 +1,7 @@
 """Script used to help with general functionality"""
 
+import datetime
+
 
 def flatten_cols(df):
     """Function used to flatten multi indexed columns in panda dfs."""
@@ -22,3 +24,11 @@ def rename_unnamed_columns(input_df):
             new_col_list.append(new_col)
     input_df.columns = new_col_list
     return input_df
+
+
+def is_completed_season(season_name, end_month, today=None):
+    """Function used to check whether a season e.g 2021_2022 has finished"""
+    end_year = int(season_name.split("_")[-1])
+    if today is None:
+        today = datetime.date.today()
+    return today >= datetime.date(end_year, end_month, 1)
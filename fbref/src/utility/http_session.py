@@ -0,0 +1,50 @@
+"""Script used to create the pooled HTTP session FBref pages are fetched with"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode br responses
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+    except ImportError:
+        brotli = None
+    else:
+        brotli = True
+
+
+def get_accept_encoding():
+    """Function used to get the compressions to ask for, brotli only when a
+    brotli package is installed to decode it"""
+    if brotli is None:
+        return "gzip, deflate"
+    return "gzip, deflate, br"
+
+
+def create_session(headers=None, pool_maxsize=10):
+    """Function used to create a session reusing keep-alive connections and
+    asking for compressed responses.
+
+    Retries are left to FBref so they go through its rate limiter.
+
+    Args:
+        headers (dict, optional): headers sent with every request e.g
+                                  User-Agent. Defaults to None.
+        pool_maxsize (int, optional): connections kept open per host, at
+                                      least the number of threads fetching.
+                                      Defaults to 10.
+
+    Returns:
+        session (requests.Session): session to send requests with
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    session.headers["Accept-Encoding"] = get_accept_encoding()
+    session.headers["Connection"] = "keep-alive"
+    if headers:
+        session.headers.update(headers)
+    return session
@@ -0,0 +1,398 @@
+"""Script used to time stages of the fbref pipeline and record what they
+processed.
+
+Functions decorated with instrument_stage are timed only while
+instrumentation is enabled, otherwise the decorator costs a single check:
+
+    sink = MemorySink()
+    with enable_instrumentation(sink, trace_memory=True):
+        seasons_dict = fbref.get_seasons_dict(...)
+        get_seasons_comparison_dict(seasons_dict)
+    sink.get_summary()
+
+Each call records an event with the stage, season, wall time, bytes
+downloaded, tables parsed, the size of the result and, with trace_memory, the
+peak memory allocated during the call measured with tracemalloc. Counters of
+nested stages also count towards the outer stage, and nested stages inherit
+its season. tracemalloc is process wide so peak memory
+of stages running in parallel threads overlaps.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+# instrumentation used by every decorated function, None when disabled
+_instrumentation = None
+
+
+class StageFrame:
+    """Class used to hold the measurements of a running stage"""
+
+    def __init__(self, stage, season_name):
+        self.stage = stage
+        self.season_name = season_name
+        self.metrics = {}
+        self.start_traced_bytes = 0
+        self.peak_traced_bytes = 0
+
+    def add_metrics(self, **metrics):
+        """Function used to add to the counters of the stage"""
+        for metric_name, value in metrics.items():
+            self.metrics[metric_name] = self.metrics.get(metric_name, 0) + value
+
+
+class Instrumentation:
+    """Class used to measure stages and send their events to sinks.
+
+    Args:
+        sinks (list): objects with a write(event) method and optionally
+                      flush() and close()
+        trace_memory (bool, optional): Whether to record peak memory with
+                                       tracemalloc, which slows down
+                                       allocations. Defaults to False.
+    """
+
+    def __init__(self, sinks, trace_memory=False):
+        self.sinks = list(sinks)
+        self.trace_memory = trace_memory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get_stack(self):
+        """Function used to grab the running stages of the current thread"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def run_stage(self, stage, season_name, function, args, kwargs):
+        """Function used to run a function as a stage and record its event"""
+        stack = self.get_stack()
+        if season_name is None and stack:
+            season_name = stack[-1].season_name
+        frame = StageFrame(stage, season_name)
+
+        if self.trace_memory:
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_traced_bytes = max(
+                    stack[-1].peak_traced_bytes, peak_bytes
+                )
+            reset_traced_memory_peak()
+            frame.start_traced_bytes = current_bytes
+            frame.peak_traced_bytes = current_bytes
+
+        stack.append(frame)
+        start_time = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            wall_seconds = time.perf_counter() - start_time
+            stack.pop()
+
+        event = {
+            "stage": stage,
+            "season_name": season_name,
+            "wall_seconds": wall_seconds,
+            "timestamp": time.time(),
+        }
+        event.update(get_result_metrics(result))
+        for metric_name, value in frame.metrics.items():
+            event[metric_name] = event.get(metric_name, 0) + value
+
+        if self.trace_memory:
+            peak_bytes = max(
+                frame.peak_traced_bytes, tracemalloc.get_traced_memory()[1]
+            )
+            event["peak_memory_bytes"] = peak_bytes - frame.start_traced_bytes
+            if stack:
+                stack[-1].peak_traced_bytes = max(
+                    stack[-1].peak_traced_bytes, peak_bytes
+                )
+
+        # counters of nested stages also count towards the parent stage
+        if stack:
+            stack[-1].add_metrics(**frame.metrics)
+
+        with self._lock:
+            for sink in self.sinks:
+                sink.write(event)
+        return result
+
+    def add_metrics(self, **metrics):
+        """Function used to add to the counters of the innermost running stage
+        of the current thread"""
+        stack = self.get_stack()
+        if stack:
+            stack[-1].add_metrics(**metrics)
+
+    def close(self):
+        """Function used to flush and close every sink"""
+        for sink in self.sinks:
+            if hasattr(sink, "flush"):
+                sink.flush()
+            if hasattr(sink, "close"):
+                sink.close()
+
+
+def reset_traced_memory_peak():
+    """Function used to reset the tracemalloc peak, which only python 3.9+
+    supports. Older versions report the peak since tracing started."""
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+
+
+def get_result_metrics(result):
+    """Function used to measure the output of a stage e.g the rows and columns
+    of a dataframe or the bytes of a page"""
+    if isinstance(result, pd.DataFrame):
+        return {"rows": result.shape[0], "columns": result.shape[1]}
+    if isinstance(result, str):
+        return {"bytes": len(result)}
+    return {}
+
+
+def instrument_stage(stage):
+    """Function used to decorate a function so its calls are recorded as a
+    stage while instrumentation is enabled.
+
+    Args:
+        stage (str): name of the stage e.g fetch_page
+
+    Returns:
+        decorator (callable): decorator for the function
+    """
+
+    def decorator(function):
+        parameter_names = list(inspect.signature(function).parameters)
+        season_index = (
+            parameter_names.index("season_name")
+            if "season_name" in parameter_names
+            else None
+        )
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            instrumentation = _instrumentation
+            if instrumentation is None:
+                return function(*args, **kwargs)
+
+            season_name = kwargs.get("season_name")
+            if (
+                season_name is None
+                and season_index is not None
+                and season_index < len(args)
+            ):
+                season_name = args[season_index]
+            return instrumentation.run_stage(
+                stage, season_name, function, args, kwargs
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def add_stage_metrics(**metrics):
+    """Function used to add counters e.g tables_parsed=1 to the running stage,
+    does nothing when instrumentation is disabled"""
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        instrumentation.add_metrics(**metrics)
+
+
+def is_instrumentation_enabled():
+    """Function used to check whether stages are being recorded"""
+    return _instrumentation is not None
+
+
+@contextmanager
+def enable_instrumentation(*sinks, trace_memory=False):
+    """Function used to record decorated stages while inside the with block.
+
+    Args:
+        sinks: MemorySink, JSONLinesSink, PrometheusTextfileSink or any object
+               with a write(event) method
+        trace_memory (bool, optional): Whether to record peak memory with
+                                       tracemalloc. Defaults to False.
+
+    Yields:
+        instrumentation (Instrumentation): the enabled instrumentation
+    """
+    global _instrumentation
+    previous_instrumentation = _instrumentation
+    instrumentation = Instrumentation(sinks, trace_memory=trace_memory)
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _instrumentation = instrumentation
+    try:
+        yield instrumentation
+    finally:
+        _instrumentation = previous_instrumentation
+        if started_tracing:
+            tracemalloc.stop()
+        instrumentation.close()
+
+
+class MemorySink:
+    """Class used to keep stage events in memory and summarise them"""
+
+    def __init__(self):
+        self.events = []
+
+    def write(self, event):
+        """Function used to store an event"""
+        self.events.append(event)
+
+    def get_events_df(self):
+        """Function used to get every event as a dataframe"""
+        return pd.DataFrame(self.events)
+
+    def get_summary(self, by=("stage",)):
+        """Function used to summarise events e.g per stage or per stage and
+        season.
+
+        Args:
+            by (tuple, optional): event fields to group by. Defaults to
+                                  ("stage",).
+
+        Returns:
+            summary_df (pandas.DataFrame): calls, total and max wall time,
+                                           summed counters and the largest
+                                           peak memory of each group
+        """
+        events_df = self.get_events_df()
+        if events_df.empty:
+            return events_df
+
+        aggregation_dict = {
+            "calls": ("wall_seconds", "size"),
+            "wall_seconds": ("wall_seconds", "sum"),
+            "max_wall_seconds": ("wall_seconds", "max"),
+        }
+        for metric_name in (
+            "bytes",
+            "bytes_downloaded",
+            "tables_parsed",
+            "rows",
+            "columns",
+        ):
+            if metric_name in events_df:
+                aggregation_dict[metric_name] = (metric_name, "sum")
+        if "peak_memory_bytes" in events_df:
+            aggregation_dict["peak_memory_bytes"] = ("peak_memory_bytes", "max")
+
+        return (
+            events_df.groupby(list(by), dropna=False, sort=False)
+            .agg(**aggregation_dict)
+            .sort_values("wall_seconds", ascending=False)
+        )
+
+
+class JSONLinesSink:
+    """Class used to append each stage event to a JSON lines file.
+
+    Args:
+        path (str): file to append to
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, event):
+        """Function used to append an event"""
+        self._file.write(json.dumps(event, default=str) + "\n")
+
+    def flush(self):
+        """Function used to flush written events to disk"""
+        self._file.flush()
+
+    def close(self):
+        """Function used to close the file"""
+        self._file.close()
+
+
+class PrometheusTextfileSink:
+    """Class used to aggregate stage events into a Prometheus textfile, e.g
+    for the node exporter textfile collector. The file is rewritten on
+    flush.
+
+    Args:
+        path (str): .prom file to write
+        prefix (str, optional): prefix of the metric names. Defaults to
+                                "fbref".
+    """
+
+    COUNTER_METRICS = {
+        "calls": "stage_calls_total",
+        "wall_seconds": "stage_duration_seconds_total",
+        "bytes": "stage_bytes_total",
+        "bytes_downloaded": "stage_bytes_downloaded_total",
+        "tables_parsed": "stage_tables_parsed_total",
+        "rows": "stage_rows_total",
+        "columns": "stage_columns_total",
+    }
+
+    def __init__(self, path, prefix="fbref"):
+        self.path = Path(path)
+        self.prefix = prefix
+        self.stage_metrics = {}
+
+    def write(self, event):
+        """Function used to add an event to the aggregated metrics"""
+        stage_metrics = self.stage_metrics.setdefault(
+            event["stage"], {"calls": 0}
+        )
+        stage_metrics["calls"] += 1
+        for metric_name in self.COUNTER_METRICS:
+            if metric_name != "calls" and metric_name in event:
+                stage_metrics[metric_name] = (
+                    stage_metrics.get(metric_name, 0) + event[metric_name]
+                )
+        if "peak_memory_bytes" in event:
+            stage_metrics["peak_memory_bytes"] = max(
+                stage_metrics.get("peak_memory_bytes", 0),
+                event["peak_memory_bytes"],
+            )
+
+    def get_text(self):
+        """Function used to build the textfile in the Prometheus exposition
+        format"""
+        lines = []
+        metric_list = list(self.COUNTER_METRICS.items()) + [
+            ("peak_memory_bytes", "stage_peak_memory_bytes")
+        ]
+        for metric_name, prometheus_name in metric_list:
+            prometheus_name = f"{self.prefix}_{prometheus_name}"
+            metric_type = (
+                "gauge" if metric_name == "peak_memory_bytes" else "counter"
+            )
+            lines.append(f"# TYPE {prometheus_name} {metric_type}")
+            for stage, stage_metrics in sorted(self.stage_metrics.items()):
+                if metric_name in stage_metrics:
+                    lines.append(
+                        f'{prometheus_name}{{stage="{stage}"}} '
+                        f"{stage_metrics[metric_name]}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Function used to write the textfile, moving it in place so the
+        collector never reads half written files"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.get_text(), encoding="utf-8")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,156 @@
+"""Script used to journal the units of work of a crawl on disk so a crawl
+that stopped part way can be restarted without repeating finished units"""
+
+import sqlite3
+import time
+
+import pandas as pd
+
+UNIT_COLUMNS = [
+    "state",
+    "output_location",
+    "content_hash",
+    "error",
+    "attempts",
+    "updated_at",
+]
+
+
+class JobJournal:
+    """Class used to record the state of each (league, season, page) unit of
+    a crawl in a SQLite database along with where its output was stored.
+
+    Like ResponseCache, SQLite runs in WAL mode and a new connection is opened
+    per operation so crawl threads and processes can share the journal.
+
+    Args:
+        path (str): file of the journal database
+        timeout (float, optional): seconds to wait for a locked database.
+                                   Defaults to 30.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = str(path)
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS units (
+                    league_name TEXT NOT NULL,
+                    season_name TEXT NOT NULL,
+                    page TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    output_location TEXT,
+                    content_hash TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (league_name, season_name, page)
+                )
+                """
+            )
+
+    def _connect(self):
+        """Function used to open a connection to the journal database"""
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def get_unit(self, league_name, season_name, page):
+        """Function used to grab the journal entry of a unit.
+
+        Returns:
+            unit (dict): state, output location, content hash, error and
+                         attempts of the unit, None if it was never started
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(UNIT_COLUMNS)} FROM units WHERE "
+                "league_name = ? AND season_name = ? AND page = ?",
+                (league_name, season_name, page),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(UNIT_COLUMNS, row))
+
+    def is_done(self, league_name, season_name, page):
+        """Function used to check whether a unit has been completed"""
+        unit = self.get_unit(league_name, season_name, page)
+        return unit is not None and unit["state"] == "done"
+
+    def mark_started(self, league_name, season_name, page):
+        """Function used to record that a unit is being worked on, counting
+        the attempt"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO units (league_name, season_name, page, state, "
+                "attempts, updated_at) VALUES (?, ?, ?, 'started', 1, ?) "
+                "ON CONFLICT (league_name, season_name, page) DO UPDATE SET "
+                "state = 'started', error = NULL, attempts = attempts + 1, "
+                "updated_at = excluded.updated_at",
+                (league_name, season_name, page, time.time()),
+            )
+
+    def mark_done(
+        self,
+        league_name,
+        season_name,
+        page,
+        output_location,
+        content_hash=None,
+    ):
+        """Function used to record that a unit finished and where its output
+        was stored"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO units (league_name, season_name, page, state, "
+                "output_location, content_hash, attempts, updated_at) "
+                "VALUES (?, ?, ?, 'done', ?, ?, 1, ?) "
+                "ON CONFLICT (league_name, season_name, page) DO UPDATE SET "
+                "state = 'done', output_location = excluded.output_location, "
+                "content_hash = excluded.content_hash, error = NULL, "
+                "updated_at = excluded.updated_at",
+                (
+                    league_name,
+                    season_name,
+                    page,
+                    str(output_location),
+                    content_hash,
+                    time.time(),
+                ),
+            )
+
+    def mark_failed(self, league_name, season_name, page, error):
+        """Function used to record that a unit failed so it is retried when
+        the crawl is restarted"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO units (league_name, season_name, page, state, "
+                "error, attempts, updated_at) "
+                "VALUES (?, ?, ?, 'failed', ?, 1, ?) "
+                "ON CONFLICT (league_name, season_name, page) DO UPDATE SET "
+                "state = 'failed', error = excluded.error, "
+                "updated_at = excluded.updated_at",
+                (league_name, season_name, page, str(error), time.time()),
+            )
+
+    def reset(self, league_name=None, season_name=None):
+        """Function used to forget units so they are crawled again, every unit
+        if no league is given"""
+        query = "DELETE FROM units"
+        params = []
+        if league_name is not None:
+            query += " WHERE league_name = ?"
+            params.append(league_name)
+            if season_name is not None:
+                query += " AND season_name = ?"
+                params.append(season_name)
+        with self._connect() as conn:
+            conn.execute(query, params)
+
+    def get_units_df(self):
+        """Function used to grab every unit of the journal as a dataframe"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT * FROM units ORDER BY league_name, season_name, page",
+                conn,
+            )
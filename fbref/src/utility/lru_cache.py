@@ -0,0 +1,85 @@
+"""Script used to hold an in-memory least recently used cache bounded by bytes"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ByteBoundedLRUCache:
+    """Class used to cache values in memory, evicting the least recently used
+    values once their approximate size goes over max_bytes.
+
+    Args:
+        max_bytes (int): maximum approximate size of the cached values
+        sizeof (callable): function returning the approximate size in bytes of
+                           a value. Sizes are worked out again on every insert
+                           as lazily parsed values grow after being cached.
+    """
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Function used to grab a cached value, None if it is not cached or
+        has expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None:
+                if time.monotonic() >= entry[1]:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        """Function used to cache a value, ttl being the seconds until it
+        expires"""
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        """Function used to drop least recently used values until the cache
+        fits in max_bytes. The newest value is always kept."""
+        entry_sizes = {
+            key: self.sizeof(value) for key, (value, _) in self._entries.items()
+        }
+        total_bytes = sum(entry_sizes.values())
+        while total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, _ = self._entries.popitem(last=False)
+            total_bytes -= entry_sizes[key]
+            self.evictions += 1
+
+    def clear(self):
+        """Function used to remove every cached value"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Function used to grab the cache counters and current size"""
+        with self._lock:
+            total_bytes = sum(
+                self.sizeof(value) for value, _ in self._entries.values()
+            )
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+            }
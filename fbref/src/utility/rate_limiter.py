@@ -0,0 +1,258 @@
+"""Script used to keep requests to the FBref site under its rate limit"""
+
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from src.utility.instrumentation import instrument_stage
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# statuses meaning the site wants us to slow down
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Class used to space out requests with a token bucket so no more than
+    requests_per_minute are sent, allowing bursts of up to burst requests. A
+    single instance can be shared by several threads.
+
+    The limiter is adaptive: backoff() halves the rate and blocks every
+    request for the given delay after a 429 or 5xx response, and each
+    successful request then raises the rate back towards requests_per_minute.
+
+    Args:
+        requests_per_minute (float): maximum number of requests in a minute
+        burst (int, optional): requests that can be sent back to back after
+                               an idle period. Defaults to 1.
+        min_requests_per_minute (float, optional): lowest rate backoff() can
+                                                   go down to. Defaults to 1.
+        backoff_factor (float, optional): rate multiplier on backoff().
+                                          Defaults to 0.5.
+        recovery_per_success (float, optional): requests per minute added
+                                                back after each successful
+                                                request. Defaults to 0.5.
+        clock (callable, optional): returns the current time in seconds.
+                                    Defaults to time.time.
+        sleep (callable, optional): waits for the given seconds. Defaults to
+                                    time.sleep.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute,
+        burst=1,
+        min_requests_per_minute=1,
+        backoff_factor=0.5,
+        recovery_per_success=0.5,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        self.max_requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.min_requests_per_minute = min(
+            min_requests_per_minute, requests_per_minute
+        )
+        self.backoff_factor = backoff_factor
+        self.recovery_per_success = recovery_per_success
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._state = self.get_initial_state()
+
+        # achieved rate of this process
+        self._request_times = deque(maxlen=1000)
+        self._stats = {"requests": 0, "backoffs": 0, "wait_seconds": 0.0}
+
+    @property
+    def interval(self):
+        """Seconds between requests at the current rate"""
+        return 60.0 / self.get_state()["requests_per_minute"]
+
+    def get_initial_state(self):
+        """Function used to create the state of an unused limiter. tat is the
+        theoretical arrival time of the next request in the token bucket
+        (GCRA) form."""
+        return {
+            "tat": 0.0,
+            "blocked_until": 0.0,
+            "requests_per_minute": self.max_requests_per_minute,
+        }
+
+    def update_state(self, update_function):
+        """Function used to read and change the limiter state atomically.
+
+        Args:
+            update_function (callable): called with the state dict, which it
+                                        changes in place, returning a value
+
+        Returns:
+            value: what update_function returned
+        """
+        with self._lock:
+            return update_function(self._state)
+
+    def get_state(self):
+        """Function used to grab a copy of the limiter state"""
+        return self.update_state(dict)
+
+    @instrument_stage("rate_limit_wait")
+    def wait(self):
+        """Function used to block until the next request is allowed"""
+
+        def reserve_request(state):
+            now = self.clock()
+            interval = 60.0 / state["requests_per_minute"]
+            tat = max(state["tat"], now, state["blocked_until"])
+            send_time = max(
+                now, state["blocked_until"], tat - (self.burst - 1) * interval
+            )
+            state["tat"] = tat + interval
+            return send_time - now, send_time
+
+        wait_time, send_time = self.update_state(reserve_request)
+        if wait_time > 0:
+            self.sleep(wait_time)
+
+        with self._lock:
+            self._request_times.append(send_time)
+            self._stats["requests"] += 1
+            self._stats["wait_seconds"] += wait_time
+
+    def backoff(self, delay):
+        """Function used to slow down after the site answered 429 or 5xx,
+        lowering the rate and holding every request for delay seconds"""
+
+        def lower_rate(state):
+            now = self.clock()
+            state["requests_per_minute"] = max(
+                self.min_requests_per_minute,
+                state["requests_per_minute"] * self.backoff_factor,
+            )
+            state["blocked_until"] = max(state["blocked_until"], now + delay)
+            state["tat"] = max(state["tat"], state["blocked_until"])
+
+        self.update_state(lower_rate)
+        with self._lock:
+            self._stats["backoffs"] += 1
+
+    def record_success(self):
+        """Function used to raise the rate back towards the maximum after a
+        successful request"""
+
+        def raise_rate(state):
+            state["requests_per_minute"] = min(
+                self.max_requests_per_minute,
+                state["requests_per_minute"] + self.recovery_per_success,
+            )
+
+        self.update_state(raise_rate)
+
+    def get_stats(self, window_seconds=60):
+        """Function used to grab the achieved and allowed request rates.
+
+        Args:
+            window_seconds (float, optional): period the achieved rate is
+                                              worked out over. Defaults to 60.
+
+        Returns:
+            stats (dict): requests, backoffs and seconds waited by this
+                          process, achieved requests per second over the
+                          window and the current allowed rate
+        """
+        state = self.get_state()
+        now = self.clock()
+        with self._lock:
+            stats = dict(self._stats)
+            recent_times = [
+                request_time
+                for request_time in self._request_times
+                if now - request_time <= window_seconds
+            ]
+        if len(recent_times) > 1:
+            achieved_seconds = max(now - recent_times[0], 1e-9)
+            stats["achieved_requests_per_second"] = (
+                len(recent_times) / achieved_seconds
+            )
+        else:
+            stats["achieved_requests_per_second"] = 0.0
+        stats["allowed_requests_per_minute"] = state["requests_per_minute"]
+        stats["blocked_for_seconds"] = max(0.0, state["blocked_until"] - now)
+        return stats
+
+
+class FileRateLimiter(RateLimiter):
+    """Class used to share one rate limit between several processes, e.g
+    BatchCrawler runs or notebooks, through a state file locked with flock.
+
+    Args:
+        path (str): state file shared by the processes
+        requests_per_minute (float): maximum number of requests in a minute
+                                     across every process
+        **kwargs: other RateLimiter arguments
+    """
+
+    def __init__(self, path, requests_per_minute, **kwargs):
+        if fcntl is None:
+            raise RuntimeError("FileRateLimiter needs fcntl, use RateLimiter.")
+        self.path = str(path)
+        super().__init__(requests_per_minute, **kwargs)
+
+    def update_state(self, update_function):
+        """Function used to read and change the state file while holding an
+        exclusive lock on it"""
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, "r+", encoding="utf-8") as state_file:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+                try:
+                    content = state_file.read()
+                    state = (
+                        json.loads(content)
+                        if content
+                        else self.get_initial_state()
+                    )
+                    # the maximum rate is set by the process, not the file
+                    state["requests_per_minute"] = min(
+                        state["requests_per_minute"],
+                        self.max_requests_per_minute,
+                    )
+                    value = update_function(state)
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(json.dumps(state))
+                    state_file.flush()
+                finally:
+                    fcntl.flock(state_file, fcntl.LOCK_UN)
+        return value
+
+
+def parse_retry_after(retry_after, now=None):
+    """Function used to turn a Retry-After header, either seconds or an HTTP
+    date, into seconds to wait. None if the header is missing or invalid."""
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if now is None:
+        now = time.time()
+    return max(0.0, retry_time.timestamp() - now)
+
+
+def get_backoff_delay(attempt, base_seconds, max_seconds, rng=random):
+    """Function used to get the delay before retrying, exponential in the
+    attempt with full jitter so threads do not retry in lockstep"""
+    return rng.uniform(0, min(max_seconds, base_seconds * 2**attempt))
@@ -0,0 +1,232 @@
+"""Script used to cache http responses fetched from the FBref site on disk"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class CachedResponse:
+    """Class used to hold a single cached page"""
+
+    def __init__(
+        self,
+        url,
+        body,
+        content_hash,
+        fetched_at,
+        expires_at=None,
+        etag=None,
+        last_modified=None,
+    ):
+        self.url = url
+        self.body = body
+        self.content_hash = content_hash
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_expired(self, now=None):
+        """Function used to check whether the cached page has expired. Pages
+        without an expiry time never expire."""
+        if self.expires_at is None:
+            return False
+        if now is None:
+            now = time.time()
+        return now >= self.expires_at
+
+    def get_validator_headers(self):
+        """Function used to build conditional request headers for revalidating
+        the cached page"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Class used to store fetched pages in a SQLite database keyed by url.
+
+    SQLite runs in WAL mode and a new connection is opened per operation so the
+    same cache file can be shared by several threads and processes.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = str(path)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "revalidated": 0,
+            "stores": 0,
+        }
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL,
+                    etag TEXT,
+                    last_modified TEXT
+                )
+                """
+            )
+
+    def _connect(self):
+        """Function used to open a connection to the cache database"""
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def _count(self, stat_name):
+        """Function used to increment one of the cache counters"""
+        with self._lock:
+            self._stats[stat_name] += 1
+
+    def get(self, url):
+        """Function used to grab a cached page, expired or not.
+
+        Args:
+            url (str): url of the page
+
+        Returns:
+            cached_response (CachedResponse): cached page or None if the url
+                                              has not been cached
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, body, content_hash, fetched_at, expires_at, etag, "
+                "last_modified FROM responses WHERE url_key = ?",
+                (get_url_key(url),),
+            ).fetchone()
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        cached_response = CachedResponse(
+            url=row[0],
+            body=zlib.decompress(row[1]).decode("utf-8"),
+            content_hash=row[2],
+            fetched_at=row[3],
+            expires_at=row[4],
+            etag=row[5],
+            last_modified=row[6],
+        )
+        if cached_response.is_expired():
+            self._count("expired")
+        else:
+            self._count("hits")
+        return cached_response
+
+    def set(self, url, body, ttl=None, etag=None, last_modified=None):
+        """Function used to store a fetched page.
+
+        Args:
+            url (str): url of the page
+            body (str): html of the page
+            ttl (float, optional): seconds until the page expires. Defaults to
+                                   None which means the page never expires.
+            etag (str, optional): ETag header of the response.
+            last_modified (str, optional): Last-Modified header of the response.
+
+        Returns:
+            cached_response (CachedResponse): the stored page
+        """
+        fetched_at = time.time()
+        cached_response = CachedResponse(
+            url=url,
+            body=body,
+            content_hash=get_content_hash(body),
+            fetched_at=fetched_at,
+            expires_at=None if ttl is None else fetched_at + ttl,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    get_url_key(url),
+                    url,
+                    zlib.compress(body.encode("utf-8")),
+                    cached_response.content_hash,
+                    cached_response.fetched_at,
+                    cached_response.expires_at,
+                    etag,
+                    last_modified,
+                ),
+            )
+        self._count("stores")
+        return cached_response
+
+    def refresh(self, url, ttl=None):
+        """Function used to extend the life of a cached page after the server
+        confirmed it has not changed (HTTP 304)"""
+        fetched_at = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE responses SET fetched_at = ?, expires_at = ? "
+                "WHERE url_key = ?",
+                (
+                    fetched_at,
+                    None if ttl is None else fetched_at + ttl,
+                    get_url_key(url),
+                ),
+            )
+        self._count("revalidated")
+
+    def invalidate(self, url=None):
+        """Function used to remove a cached page, or every page if no url is
+        given"""
+        with self._connect() as conn:
+            if url is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.execute(
+                    "DELETE FROM responses WHERE url_key = ?",
+                    (get_url_key(url),),
+                )
+
+    def get_stats(self):
+        """Function used to grab cache statistics.
+
+        Returns:
+            stats (dict): hit/miss counters for this process along with the
+                          number of entries and stored bytes in the cache
+        """
+        with self._connect() as conn:
+            entries, stored_bytes, expired_entries = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0), "
+                "COALESCE(SUM(expires_at IS NOT NULL AND expires_at <= ?), 0) "
+                "FROM responses",
+                (time.time(),),
+            ).fetchone()
+
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["expired"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = entries
+        stats["expired_entries"] = expired_entries
+        stats["stored_bytes"] = stored_bytes
+        return stats
+
+
+def get_url_key(url):
+    """Function used to create the cache key for a url"""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def get_content_hash(body):
+    """Function used to create a hash of the page content"""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
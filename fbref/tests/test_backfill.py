@@ -0,0 +1,121 @@
+"""Script used to test that a backfill resumes from the units that failed"""
+
+import pytest
+
+from benchmarks.synthetic_data import get_synthetic_seasons_dict
+from src.etl.backfill import (
+    backfill_seasons,
+    get_unit_output_path,
+)
+from src.utility.job_journal import JobJournal
+
+LEAGUE_NAME = "League-0"
+
+
+class CountingFBref:
+    """Class used to stand in for FBref, serving synthetic seasons and
+    recording every page fetched. The unit in fail_unit raises like an HTTP
+    429 would until it is cleared."""
+
+    def __init__(self, seasons_dict):
+        self.seasons_dict = seasons_dict
+        self.fetched_list = []
+        self.fail_unit = None
+
+    def get_league_stats_url(self, season_name, league_id, league_name):
+        return f"stats/{season_name}"
+
+    def get_fixtures_url(self, season_name, league_id, league_name):
+        return f"fixtures/{season_name}"
+
+    def get_page_html(self, url, season_name):
+        page = url.split("/")[0]
+        self.fetched_list.append((season_name, page))
+        if (season_name, page) == self.fail_unit:
+            raise Exception("429 Client Error: Too Many Requests")
+        return f"<html>{url}</html>"
+
+    def get_team_season_data(
+        self, season_name, league_id, league_name, html=None
+    ):
+        return self.seasons_dict[season_name]["data"]
+
+    def get_fixtures_season_data(
+        self, season_name, league_id, league_name, html=None
+    ):
+        return self.seasons_dict[season_name]["fixtures"]
+
+
+@pytest.fixture
+def fbref():
+    return CountingFBref(get_synthetic_seasons_dict(LEAGUE_NAME, n_seasons=3))
+
+
+def run_backfill(fbref, journal, warehouse_dir):
+    return backfill_seasons(
+        fbref,
+        journal,
+        warehouse_dir,
+        list(fbref.seasons_dict),
+        None,
+        LEAGUE_NAME,
+        cleaned=False,
+    )
+
+
+def test_backfill_resumes_from_failed_unit(fbref, tmp_path):
+    journal = JobJournal(tmp_path / "journal.db")
+    warehouse_dir = tmp_path / "warehouse"
+    fbref.fail_unit = ("2018_2019", "fixtures")
+
+    with pytest.raises(Exception, match="429"):
+        run_backfill(fbref, journal, warehouse_dir)
+    assert fbref.fetched_list == [
+        ("2017_2018", "stats"),
+        ("2017_2018", "fixtures"),
+        ("2018_2019", "stats"),
+        ("2018_2019", "fixtures"),
+    ]
+    failed_unit = journal.get_unit(LEAGUE_NAME, "2018_2019", "fixtures")
+    assert failed_unit["state"] == "failed"
+    assert "429" in failed_unit["error"]
+
+    fbref.fail_unit = None
+    fbref.fetched_list = []
+    unit_state_dict = run_backfill(fbref, journal, warehouse_dir)
+
+    assert fbref.fetched_list == [
+        ("2018_2019", "fixtures"),
+        ("2019_2020", "stats"),
+        ("2019_2020", "fixtures"),
+    ]
+    assert unit_state_dict == {
+        ("2017_2018", "stats"): "skipped",
+        ("2017_2018", "fixtures"): "skipped",
+        ("2018_2019", "stats"): "skipped",
+        ("2018_2019", "fixtures"): "done",
+        ("2019_2020", "stats"): "done",
+        ("2019_2020", "fixtures"): "done",
+    }
+    resumed_unit = journal.get_unit(LEAGUE_NAME, "2018_2019", "fixtures")
+    assert resumed_unit["state"] == "done"
+    assert resumed_unit["attempts"] == 2
+
+
+def test_backfill_recrawls_missing_partition(fbref, tmp_path):
+    journal = JobJournal(tmp_path / "journal.db")
+    warehouse_dir = tmp_path / "warehouse"
+    run_backfill(fbref, journal, warehouse_dir)
+
+    output_path = get_unit_output_path(
+        warehouse_dir, LEAGUE_NAME, "2018_2019", "stats"
+    )
+    assert output_path.exists()
+    output_path.unlink()
+
+    fbref.fetched_list = []
+    unit_state_dict = run_backfill(fbref, journal, warehouse_dir)
+
+    assert fbref.fetched_list == [("2018_2019", "stats")]
+    assert unit_state_dict[("2018_2019", "stats")] == "done"
+    assert output_path.exists()
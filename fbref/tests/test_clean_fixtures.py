@@ -0,0 +1,59 @@
+"""Script used to test the vectorized parsing of fixture scores and kickoffs"""
+
+import numpy as np
+import pandas as pd
+
+from src.config.fbref_config import FIXTURE_SCORE_COLUMNS
+from src.etl.clean import (
+    get_fixture_kickoff,
+    get_fixture_scores_df,
+)
+
+
+def get_score_rows(scores_df):
+    """Function used to turn a scores dataframe into lists of strings and
+    None, whatever string dtype pandas extracted to"""
+    return (
+        scores_df.astype(object).where(scores_df.notna(), None).values.tolist()
+    )
+
+
+def test_fixture_scores():
+    score_series = pd.Series(
+        ["(4) 1–1 (3)", "Match Postponed", np.nan, "2-1", "3–0"],
+        index=[10, 11, 12, 13, 14],
+    )
+    scores_df = get_fixture_scores_df(score_series)
+
+    assert list(scores_df.columns) == FIXTURE_SCORE_COLUMNS
+    assert list(scores_df.index) == [10, 11, 12, 13, 14]
+    assert get_score_rows(scores_df) == [
+        ["1", "1", "4", "3"],
+        [None, None, None, None],
+        [None, None, None, None],
+        ["2", "1", None, None],
+        ["3", "0", None, None],
+    ]
+
+
+def test_fixture_scores_all_missing():
+    scores_df = get_fixture_scores_df(pd.Series([np.nan, np.nan]))
+    assert get_score_rows(scores_df) == [[None] * 4, [None] * 4]
+
+
+def test_fixture_kickoff():
+    date_series = pd.Series(
+        ["2023-08-11", "2023-08-12", np.nan, "2023-08-13", "2023-08-14"]
+    )
+    time_series = pd.Series(["20:00 (21:00)", "15:00", "12:30", np.nan, "TBC"])
+    kickoff = get_fixture_kickoff(date_series, time_series)
+
+    pd.testing.assert_series_equal(
+        kickoff,
+        pd.Series(
+            pd.to_datetime(
+                ["2023-08-11 20:00", "2023-08-12 15:00", None, None, None]
+            )
+        ),
+        check_dtype=False,
+    )
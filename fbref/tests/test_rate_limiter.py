@@ -0,0 +1,123 @@
+"""Script used to test the rate limiters against a fake clock"""
+
+import email.utils
+
+import pytest
+
+from src.utility.rate_limiter import (
+    FileRateLimiter,
+    RateLimiter,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    """Class used to stand in for time.time and time.sleep, sleeping moves
+    the clock forward instead of blocking"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleep_list = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleep_list.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def get_send_times(limiter, clock, n_requests):
+    """Function used to get the times n_requests back to back requests are
+    let through at"""
+    send_times = []
+    for _ in range(n_requests):
+        limiter.wait()
+        send_times.append(clock.now)
+    return send_times
+
+
+def test_burst_then_spaced_requests(clock):
+    limiter = RateLimiter(60, burst=3, clock=clock.time, sleep=clock.sleep)
+
+    assert get_send_times(limiter, clock, 6) == [
+        1000.0,
+        1000.0,
+        1000.0,
+        1001.0,
+        1002.0,
+        1003.0,
+    ]
+
+    # an idle period fills the bucket back up
+    clock.now = 1100.0
+    assert get_send_times(limiter, clock, 4) == [
+        1100.0,
+        1100.0,
+        1100.0,
+        1101.0,
+    ]
+
+
+def test_backoff_halves_rate_and_blocks(clock):
+    limiter = RateLimiter(60, clock=clock.time, sleep=clock.sleep)
+    limiter.wait()
+
+    limiter.backoff(10)
+    assert limiter.get_state()["requests_per_minute"] == 30
+    assert limiter.get_stats()["blocked_for_seconds"] == 10
+
+    # held for the delay, then spaced at the halved rate
+    assert get_send_times(limiter, clock, 2) == [1010.0, 1012.0]
+
+    limiter.record_success()
+    assert limiter.get_state()["requests_per_minute"] == 30.5
+
+
+def test_backoff_stops_at_min_rate(clock):
+    limiter = RateLimiter(
+        60, min_requests_per_minute=10, clock=clock.time, sleep=clock.sleep
+    )
+    for _ in range(5):
+        limiter.backoff(0)
+    assert limiter.get_state()["requests_per_minute"] == 10
+    assert limiter.get_stats()["backoffs"] == 5
+
+
+def test_file_rate_limiter_shares_state(clock, tmp_path):
+    state_path = tmp_path / "rate_limit.json"
+    first_limiter = FileRateLimiter(
+        state_path, 60, clock=clock.time, sleep=clock.sleep
+    )
+    second_limiter = FileRateLimiter(
+        state_path, 60, clock=clock.time, sleep=clock.sleep
+    )
+
+    first_limiter.wait()
+    second_limiter.wait()
+    assert clock.now == 1001.0
+
+    first_limiter.backoff(5)
+    assert second_limiter.get_state()["requests_per_minute"] == 30
+    second_limiter.wait()
+    assert clock.now == 1006.0
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_parse_retry_after_http_date():
+    now = email.utils.parsedate_to_datetime(
+        "Wed, 21 Oct 2015 07:28:00 GMT"
+    ).timestamp()
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now) == 30.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:27:00 GMT", now) == 0.0
@@ -2,20 +2,66 @@
 
 import pandas as pd
 
+# Bet365 home, draw and away odds
+ODDS_COLUMNS = ["b365h", "b365d", "b365a"]
 
-def clean_football_data(football_data_df, season_name):
+# football-data dates are day first, with two digit years in older seasons
+KICKOFF_FORMAT_LIST = ["%d/%m/%Y %H:%M", "%d/%m/%y %H:%M"]
+
+
+def get_kickoff(date_series, time_series):
+    """Function used to parse the kickoff of matches from the day first date
+    and time columns of football-data, NaT when it cannot be parsed.
+
+    Args:
+        date_series (pandas.Series): dates e.g 09/08/2019 or 13/08/11
+        time_series (pandas.Series): kick off times e.g 20:00
+
+    Returns:
+        kickoff (pandas.Series): kick off of each match
+    """
+    kickoff_string = date_series + " " + time_series
+    kickoff = pd.to_datetime(
+        kickoff_string,
+        format=KICKOFF_FORMAT_LIST[0],
+        errors="coerce",
+        cache=True,
+    )
+    for kickoff_format in KICKOFF_FORMAT_LIST[1:]:
+        is_unparsed = kickoff.isna() & kickoff_string.notna()
+        if not is_unparsed.any():
+            break
+        kickoff[is_unparsed] = pd.to_datetime(
+            kickoff_string[is_unparsed],
+            format=kickoff_format,
+            errors="coerce",
+            cache=True,
+        )
+    return kickoff
+
+
+def clean_football_data(football_data_df, season_name, odds_columns=None):
     """Function used to clean football data grabbed from football-data
 
     Args:
         football_data_df (pandas.DataFrame): dataframe of football results from football-data
         season_name (str): season in question
+        odds_columns (list, optional): odds columns to keep e.g b365h, psh.
+                                       Defaults to None which keeps
+                                       ODDS_COLUMNS.
 
     Returns:
         cleaned_football_data_df (pandas.DataFrame): cleaned dataframe of football results
     """
+    if odds_columns is None:
+        odds_columns = ODDS_COLUMNS
+
     football_data_df.columns = [
         col_name.lower() for col_name in football_data_df.columns
     ]
+    # seasons before 2019/20 have no time column, kick off at midnight
+    if "time" not in football_data_df.columns:
+        football_data_df["time"] = "00:00"
 
     cleaned_football_data_df = (
         football_data_df.rename(
@@ -24,9 +70,7 @@ def clean_football_data(football_data_df, season_name):
             }
         )
         .assign(
-            kickoff=pd.to_datetime(
-                football_data_df.date + " " + football_data_df.time
-            ),
+            kickoff=get_kickoff(football_data_df.date, football_data_df.time),
             season_name=season_name,
         )
         .astype(
@@ -55,9 +99,7 @@ def clean_football_data(football_data_df, season_name):
             "hthg",
             "htag",
             "htr",
-            "b365h",
-            "b365d",
-            "b365a",
         ]
+        + [odds_column.lower() for odds_column in odds_columns]
     ]
     return cleaned_football_data_df
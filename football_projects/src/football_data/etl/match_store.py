@@ -0,0 +1,483 @@
+"""Script used to hold football-data results as compact NumPy arrays.
+
+A DataFrame of many seasons and divisions keeps date and time strings and
+float64 goals and odds for every match. MatchStore instead keeps one
+contiguous array per field:
+    league_id, season_id, home_team_id, away_team_id    int16
+    kickoff                                             int64 epoch seconds
+    fthg, ftag, hthg, htag                              int8, -1 if missing
+    ftr, htr                                            int8 index of "HDA"
+    odds                                                float32, one column
+                                                        per odds column
+with the league codes, season names and team names kept once in lists the
+ids index.
+
+Matches are sorted by league, season and kickoff, so the matches of a league
+season are a contiguous block found without scanning, and date ranges are
+found in each block with a binary search. save writes each array to its own
+.npy file so load can memory-map them.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.football_data.etl.clean import ODDS_COLUMNS
+
+# value stored for missing goals, results and kick offs
+MISSING_GOALS = -1
+MISSING_KICKOFF = np.iinfo(np.int64).min
+
+RESULT_LIST = ["H", "D", "A"]
+
+# array name -> dtype
+ARRAY_DTYPE_DICT = {
+    "league_id": np.int16,
+    "season_id": np.int16,
+    "home_team_id": np.int16,
+    "away_team_id": np.int16,
+    "kickoff": np.int64,
+    "fthg": np.int8,
+    "ftag": np.int8,
+    "hthg": np.int8,
+    "htag": np.int8,
+    "ftr": np.int8,
+    "htr": np.int8,
+    "odds": np.float32,
+}
+
+METADATA_FILE_NAME = "metadata.json"
+
+
+def get_codes(values, categories):
+    """Function used to turn values into their position in categories as
+    int16, -1 for missing values or values not in categories"""
+    if len(categories) > np.iinfo(np.int16).max:
+        raise Exception("Invalid number of categories for int16 ids.")
+    return pd.Categorical(values, categories=categories).codes.astype(np.int16)
+
+
+def get_goals_array(goals_series):
+    """Function used to turn a goals column into int8, -1 where missing"""
+    goals_array = goals_series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(goals_array), MISSING_GOALS, goals_array).astype(
+        np.int8
+    )
+
+
+def get_epoch_array(kickoff_series):
+    """Function used to turn a kickoff column into epoch seconds as int64,
+    MISSING_KICKOFF where missing"""
+    return (
+        pd.to_datetime(kickoff_series)
+        .to_numpy(dtype="datetime64[ns]")
+        .astype("datetime64[s]")
+        .view(np.int64)
+    )
+
+
+def get_epoch_seconds(date):
+    """Function used to turn a date e.g "2020-01-01" or a Timestamp into
+    epoch seconds"""
+    return pd.Timestamp(date).value // 10**9
+
+
+class MatchStore:
+    """Class used to hold the matches of any number of football-data leagues
+    and seasons as contiguous NumPy arrays, with the league, season and team
+    dictionaries the ids refer to.
+
+        match_store = MatchStore.from_df(cleaned_football_data_df)
+        arsenal_df = match_store.select(team="Arsenal").to_df()
+
+    Args:
+        array_dict (dict): array of each name in ARRAY_DTYPE_DICT, rows
+                           sorted by league, season and kickoff
+        league_code_list (list): league code of each league id e.g E0
+        season_name_list (list): season name of each season id e.g 2019_2020
+        team_name_list (list): team name of each team id
+        odds_column_list (list): odds column of each column of odds
+    """
+
+    def __init__(
+        self,
+        array_dict,
+        league_code_list,
+        season_name_list,
+        team_name_list,
+        odds_column_list,
+    ):
+        missing_name_list = [
+            array_name
+            for array_name in ARRAY_DTYPE_DICT
+            if array_name not in array_dict
+        ]
+        if missing_name_list:
+            raise Exception(f"Invalid arrays, missing {missing_name_list}.")
+
+        self.array_dict = array_dict
+        self.league_code_list = list(league_code_list)
+        self.season_name_list = list(season_name_list)
+        self.team_name_list = list(team_name_list)
+        self.odds_column_list = list(odds_column_list)
+        self._block_list = None
+
+    @classmethod
+    def from_df(cls, cleaned_football_data_df, odds_columns=None):
+        """Function used to create a store from the output of
+        clean_football_data, or several of them concatenated.
+
+        Args:
+            cleaned_football_data_df (pandas.DataFrame): cleaned matches of
+                                                         any number of leagues
+                                                         and seasons
+            odds_columns (list, optional): odds columns to keep. Defaults to
+                                           None which keeps ODDS_COLUMNS.
+
+        Returns:
+            match_store (MatchStore): store of the matches
+        """
+        if odds_columns is None:
+            odds_columns = ODDS_COLUMNS
+        odds_column_list = [odds_column.lower() for odds_column in odds_columns]
+
+        league_code_list = sorted(
+            cleaned_football_data_df["league_code"].dropna().unique()
+        )
+        season_name_list = sorted(
+            cleaned_football_data_df["season_name"].dropna().unique()
+        )
+        team_name_list = sorted(
+            set(cleaned_football_data_df["hometeam"].dropna())
+            | set(cleaned_football_data_df["awayteam"].dropna())
+        )
+
+        array_dict = {
+            "league_id": get_codes(
+                cleaned_football_data_df["league_code"], league_code_list
+            ),
+            "season_id": get_codes(
+                cleaned_football_data_df["season_name"], season_name_list
+            ),
+            "home_team_id": get_codes(
+                cleaned_football_data_df["hometeam"], team_name_list
+            ),
+            "away_team_id": get_codes(
+                cleaned_football_data_df["awayteam"], team_name_list
+            ),
+            "kickoff": get_epoch_array(cleaned_football_data_df["kickoff"]),
+            "odds": cleaned_football_data_df[odds_column_list].to_numpy(
+                dtype=np.float32, na_value=np.nan
+            ),
+        }
+        for goals_column in ("fthg", "ftag", "hthg", "htag"):
+            array_dict[goals_column] = get_goals_array(
+                cleaned_football_data_df[goals_column]
+            )
+        for result_column in ("ftr", "htr"):
+            array_dict[result_column] = get_codes(
+                cleaned_football_data_df[result_column], RESULT_LIST
+            ).astype(np.int8)
+
+        # sort by league, season and then kickoff, last key first
+        sort_positions = np.lexsort(
+            (
+                array_dict["kickoff"],
+                array_dict["season_id"],
+                array_dict["league_id"],
+            )
+        )
+        array_dict = {
+            array_name: np.ascontiguousarray(array[sort_positions])
+            for array_name, array in array_dict.items()
+        }
+        return cls(
+            array_dict,
+            league_code_list,
+            season_name_list,
+            team_name_list,
+            odds_column_list,
+        )
+
+    def __len__(self):
+        return len(self.array_dict["kickoff"])
+
+    def __getattr__(self, array_name):
+        # arrays can be read as attributes e.g match_store.fthg
+        if array_name in ARRAY_DTYPE_DICT and "array_dict" in self.__dict__:
+            return self.array_dict[array_name]
+        raise AttributeError(array_name)
+
+    @property
+    def nbytes(self):
+        """Bytes taken by the arrays"""
+        return sum(array.nbytes for array in self.array_dict.values())
+
+    def get_league_id(self, league_code):
+        """Function used to grab the id of a league code e.g E0"""
+        try:
+            return self.league_code_list.index(league_code)
+        except ValueError:
+            raise Exception("Invalid league code.")
+
+    def get_season_id(self, season_name):
+        """Function used to grab the id of a season name e.g 2019_2020"""
+        try:
+            return self.season_name_list.index(season_name)
+        except ValueError:
+            raise Exception("Invalid season name.")
+
+    def get_team_id(self, team_name):
+        """Function used to grab the id of a team name e.g Arsenal"""
+        try:
+            return self.team_name_list.index(team_name)
+        except ValueError:
+            raise Exception("Invalid team name.")
+
+    def get_odds(self, odds_column):
+        """Function used to grab the odds of a column e.g b365h, a view of
+        the odds array"""
+        try:
+            odds_position = self.odds_column_list.index(odds_column.lower())
+        except ValueError:
+            raise Exception("Invalid odds column.")
+        return self.array_dict["odds"][:, odds_position]
+
+    def get_block_list(self):
+        """Function used to grab the (league_id, season_id, start, stop) row
+        range of every league season, worked out once from the sorted ids"""
+        if self._block_list is None:
+            league_id_array = self.array_dict["league_id"]
+            season_id_array = self.array_dict["season_id"]
+            start_array = np.concatenate(
+                [
+                    [0],
+                    np.flatnonzero(
+                        (league_id_array[1:] != league_id_array[:-1])
+                        | (season_id_array[1:] != season_id_array[:-1])
+                    )
+                    + 1,
+                ]
+            ).astype(np.int64)
+            if len(self) == 0:
+                start_array = start_array[:0]
+            stop_array = np.append(start_array[1:], len(self))
+            self._block_list = [
+                (
+                    int(league_id_array[start]),
+                    int(season_id_array[start]),
+                    int(start),
+                    int(stop),
+                )
+                for start, stop in zip(start_array, stop_array)
+            ]
+        return self._block_list
+
+    def get_row_range_list(
+        self, league=None, season=None, start=None, end=None
+    ):
+        """Function used to get the row ranges of the matches of a league,
+        season and kickoff range, binary searching the kickoffs of each
+        league season.
+
+        Args:
+            league (str, optional): league code e.g E0. Defaults to None.
+            season (str, optional): season name e.g 2019_2020. Defaults to
+                                    None.
+            start (str, optional): first kickoff date e.g 2020-01-01.
+                                   Defaults to None.
+            end (str, optional): kickoff date the range stops before.
+                                 Defaults to None.
+
+        Returns:
+            row_range_list (list): (start, stop) row ranges in row order
+        """
+        league_id = None if league is None else self.get_league_id(league)
+        season_id = None if season is None else self.get_season_id(season)
+
+        start_seconds = None
+        end_seconds = None
+        if start is not None or end is not None:
+            # matches without a kickoff are left out of date ranges
+            start_seconds = (
+                MISSING_KICKOFF + 1
+                if start is None
+                else get_epoch_seconds(start)
+            )
+        if end is not None:
+            end_seconds = get_epoch_seconds(end)
+
+        kickoff_array = self.array_dict["kickoff"]
+        row_range_list = []
+        for (
+            block_league_id,
+            block_season_id,
+            row_start,
+            row_stop,
+        ) in self.get_block_list():
+            if league_id is not None and block_league_id != league_id:
+                continue
+            if season_id is not None and block_season_id != season_id:
+                continue
+            block_kickoff_array = kickoff_array[row_start:row_stop]
+            block_start = row_start
+            block_stop = row_stop
+            if start_seconds is not None:
+                block_start += int(
+                    np.searchsorted(block_kickoff_array, start_seconds, "left")
+                )
+            if end_seconds is not None:
+                block_stop = row_start + int(
+                    np.searchsorted(block_kickoff_array, end_seconds, "left")
+                )
+            if block_start < block_stop:
+                row_range_list.append((block_start, block_stop))
+        return row_range_list
+
+    def select(self, league=None, season=None, team=None, start=None, end=None):
+        """Function used to grab the matches of a league, season, team and
+        kickoff range as a new store sharing the dictionaries. Arrays are
+        views of this store when the matches are one block of rows e.g a
+        league season, and copies otherwise.
+
+        Args:
+            league (str, optional): league code e.g E0. Defaults to None.
+            season (str, optional): season name e.g 2019_2020. Defaults to
+                                    None.
+            team (str, optional): team playing home or away e.g Arsenal.
+                                  Defaults to None.
+            start (str, optional): first kickoff date e.g 2020-01-01.
+                                   Defaults to None.
+            end (str, optional): kickoff date the range stops before e.g
+                                 2020-02-01. Defaults to None.
+
+        Returns:
+            match_store (MatchStore): store of the selected matches
+        """
+        row_range_list = self.get_row_range_list(league, season, start, end)
+
+        if team is None and len(row_range_list) == 1:
+            row_start, row_stop = row_range_list[0]
+            rows = slice(row_start, row_stop)
+        else:
+            if row_range_list:
+                rows = np.concatenate(
+                    [
+                        np.arange(row_start, row_stop)
+                        for row_start, row_stop in row_range_list
+                    ]
+                )
+            else:
+                rows = np.arange(0)
+            if team is not None:
+                team_id = self.get_team_id(team)
+                rows = rows[
+                    (self.array_dict["home_team_id"][rows] == team_id)
+                    | (self.array_dict["away_team_id"][rows] == team_id)
+                ]
+
+        return MatchStore(
+            {
+                array_name: array[rows]
+                for array_name, array in self.array_dict.items()
+            },
+            self.league_code_list,
+            self.season_name_list,
+            self.team_name_list,
+            self.odds_column_list,
+        )
+
+    def to_df(self):
+        """Function used to turn the store back into a dataframe, with
+        categorical names, nullable int goals and float32 odds.
+
+        Returns:
+            match_df (pandas.DataFrame): one row per match
+        """
+        match_df = pd.DataFrame(
+            {
+                "league_code": pd.Categorical.from_codes(
+                    self.array_dict["league_id"], self.league_code_list
+                ),
+                "season_name": pd.Categorical.from_codes(
+                    self.array_dict["season_id"], self.season_name_list
+                ),
+                # MISSING_KICKOFF is how NaT is stored
+                "kickoff": pd.to_datetime(
+                    self.array_dict["kickoff"].astype("datetime64[s]")
+                ),
+                "hometeam": pd.Categorical.from_codes(
+                    self.array_dict["home_team_id"], self.team_name_list
+                ),
+                "awayteam": pd.Categorical.from_codes(
+                    self.array_dict["away_team_id"], self.team_name_list
+                ),
+            }
+        )
+        for column in ("fthg", "ftag", "hthg", "htag", "ftr", "htr"):
+            array = self.array_dict[column]
+            if column in ("ftr", "htr"):
+                match_df[column] = pd.Categorical.from_codes(array, RESULT_LIST)
+            else:
+                match_df[column] = pd.arrays.IntegerArray(
+                    np.array(array), array == MISSING_GOALS
+                )
+        for odds_position, odds_column in enumerate(self.odds_column_list):
+            match_df[odds_column] = self.array_dict["odds"][:, odds_position]
+        return match_df
+
+    def save(self, store_dir):
+        """Function used to write each array to a .npy file in store_dir,
+        along with the dictionaries in a metadata file"""
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        for array_name, array in self.array_dict.items():
+            np.save(
+                store_dir / f"{array_name}.npy",
+                np.ascontiguousarray(array, dtype=ARRAY_DTYPE_DICT[array_name]),
+            )
+        metadata_path = store_dir / METADATA_FILE_NAME
+        with open(metadata_path, "w", encoding="utf-8") as metadata_file:
+            json.dump(
+                {
+                    "league_code_list": self.league_code_list,
+                    "season_name_list": self.season_name_list,
+                    "team_name_list": self.team_name_list,
+                    "odds_column_list": self.odds_column_list,
+                },
+                metadata_file,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, store_dir, mmap_mode="r"):
+        """Function used to read a store written by save.
+
+        Args:
+            store_dir (str): folder the store was saved to
+            mmap_mode (str, optional): mode the arrays are memory-mapped
+                                       with, None reads them into memory.
+                                       Defaults to "r".
+
+        Returns:
+            match_store (MatchStore): store of the saved matches
+        """
+        store_dir = Path(store_dir)
+        metadata_path = store_dir / METADATA_FILE_NAME
+        with open(metadata_path, encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+        array_dict = {
+            array_name: np.load(
+                store_dir / f"{array_name}.npy", mmap_mode=mmap_mode
+            )
+            for array_name in ARRAY_DTYPE_DICT
+        }
+        return cls(
+            array_dict,
+            metadata["league_code_list"],
+            metadata["season_name_list"],
+            metadata["team_name_list"],
+            metadata["odds_column_list"],
+        )